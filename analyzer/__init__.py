@@ -0,0 +1,13 @@
+# ============================================================
+# Analyzer – camada de dados compartilhada pelas páginas
+# ============================================================
+from analyzer.config import PROJECT_ID, TZ
+from analyzer.client import get_client, get_auth_mode
+from analyzer.dimensions import dim_labels
+from analyzer.loader import fetched_at, filter_options, load_filtered, load_table, load_tables, sort_rows
+from analyzer.versions import refresh_stats, refresh_versions
+from analyzer.flight import flight_stats
+from analyzer.prewarm import prewarm_caption, prewarm_status, start_prewarm
+from analyzer.telemetry import job_stats
+from analyzer.budget import BudgetExceeded
+from analyzer.jobs import DeadlineExceeded
@@ -0,0 +1,73 @@
+# ============================================================
+# Analyzer – estimativa de custo (dry-run) e orçamento por página
+# ============================================================
+# Antes de cada job (analyzer/query.py) a query passa por um dry-run do
+# BigQuery, que devolve os bytes que ela processaria sem executar nem
+# cobrar nada. A estimativa fica em cache por formato de query (o SQL; os
+# valores dos parâmetros não mudam o formato) por estimate_ttl segundos,
+# então cada formato novo paga um dry-run e os demais acessos, nenhum.
+#
+# Cada página tem um orçamento (config.PAGE_BUDGETS / [analyzer.budgets])
+# sobre os bytes cobrados na janela da telemetria. Se o que já foi gasto +
+# a estimativa passar do orçamento, budget_action decide:
+#   "warn"     roda mesmo assim e marca o job como over_budget
+#   "snapshot" não roda; a carga da tabela, o recorte filtrado e as opções
+#              de filtro saem da última versão (em memória ou do snapshot
+#              local) e os KPIs voltam para o cálculo em pandas; sem versão
+#              anterior, recusa
+#   "refuse"   não roda e levanta BudgetExceeded
+# A estimativa e a decisão entram no registro de telemetria do job.
+import logging
+
+import streamlit as st
+from google.cloud import bigquery
+
+from analyzer.client import get_client
+from analyzer.config import ESTIMATE_TTL, budget_action, page_budget, setting
+from analyzer.telemetry import current_page, job_stats, record_refused
+
+log = logging.getLogger(__name__)
+
+
+class BudgetExceeded(RuntimeError):
+    def __init__(self, page: str, table: str | None, estimate: int, spent: int, budget: int, action: str):
+        super().__init__(
+            f"página {page}: job em {table or '-'} estimado em {estimate / 2**30:.2f} GiB "
+            f"(já gastos {spent / 2**30:.2f} GiB) passa do orçamento de {budget / 2**30:.2f} GiB"
+        )
+        self.page, self.table, self.estimate, self.spent, self.budget, self.action = page, table, estimate, spent, budget, action
+
+
+@st.cache_data(ttl=setting("estimate_ttl", ESTIMATE_TTL), show_spinner=False, max_entries=1024)
+def estimate_bytes(sql: str, _params=None) -> int | None:
+    # _params fora da chave do cache: só o formato da query importa
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, query_parameters=_params or [])
+    try:
+        return get_client().query(sql, job_config=job_config).total_bytes_processed
+    except Exception:
+        # sem dry-run (permissão/rede): o job segue sem estimativa
+        return None
+
+
+def serves_snapshot(exc: Exception) -> bool:
+    # job barrado com budget_action="snapshot": quem chamou serve a última versão boa
+    return isinstance(exc, BudgetExceeded) and exc.action == "snapshot"
+
+
+def check_budget(sql: str, params=None, table: str | None = None, kind: str = "query") -> dict:
+    # {"estimated_bytes", "over_budget"} para a telemetria; levanta
+    # BudgetExceeded quando a ação configurada não deixa o job rodar
+    estimate = estimate_bytes(sql, params)
+    page = current_page()
+    budget = page_budget(page)
+    if estimate is None or budget is None:
+        return {"estimated_bytes": estimate, "over_budget": False}
+    spent = job_stats(by=("page",)).get((page,), {}).get("bytes_billed", 0)
+    if spent + estimate <= budget:
+        return {"estimated_bytes": estimate, "over_budget": False}
+    action = budget_action()
+    if action == "warn":
+        log.warning("orçamento: página %s, %s (%s) estimado em %d bytes, gasto %d de %d", page, table, kind, estimate, spent, budget)
+        return {"estimated_bytes": estimate, "over_budget": True}
+    record_refused(table, kind, estimate, action)
+    raise BudgetExceeded(page, table, estimate, spent, budget, action)
@@ -0,0 +1,73 @@
+# ============================================================
+# Analyzer – client único por processo (BigQuery ou local)
+# ============================================================
+import os
+import google.auth
+import requests
+import streamlit as st
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+from analyzer.config import HTTP_POOL_SIZE, LOCAL_SA_PATH, PROJECT_ID, backend, secrets_get, setting
+
+
+@st.cache_resource(show_spinner=False)
+def _load_credentials():
+    sa_info = secrets_get("gcp_service_account")
+    if sa_info:
+        creds = service_account.Credentials.from_service_account_info(
+            dict(sa_info), scopes=bigquery.Client.SCOPE
+        )
+        return creds, secrets_get("gcp_project_id", PROJECT_ID)
+
+    if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = LOCAL_SA_PATH
+    creds, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+    return creds, PROJECT_ID
+
+
+@st.cache_resource(show_spinner=False)
+def get_client():
+    # backend "duckdb": mesma interface (query/get_table) sobre Parquet locais
+    if backend() == "duckdb":
+        from analyzer.local import LocalClient, local_dir
+
+        return LocalClient(local_dir())
+    return bigquery_client()
+
+
+@st.cache_resource(show_spinner=False)
+def bigquery_client() -> bigquery.Client:
+    # Credenciais lidas uma vez; a sessão HTTP (e o TLS) é reaproveitada por todas as sessões
+    creds, project = _load_credentials()
+    pool_size = int(setting("http_pool_size", HTTP_POOL_SIZE))
+
+    http = AuthorizedSession(creds)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http.mount("https://", adapter)
+
+    return bigquery.Client(project=project, credentials=creds, _http=http)
+
+
+def get_auth_mode() -> str:
+    if backend() == "duckdb":
+        return "local (DuckDB, sem BigQuery)"
+    if secrets_get("gcp_service_account"):
+        return "secrets"
+    if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        return "arquivo local"
+    return "desconhecido"
+
+
+@st.cache_resource(show_spinner=False)
+def get_bqstorage_client():
+    # Storage Read API é opcional: sem a lib instalada o fetch volta para REST
+    if backend() == "duckdb":
+        return None
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+    creds, _ = _load_credentials()
+    return bigquery_storage.BigQueryReadClient(credentials=creds)
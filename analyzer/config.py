@@ -0,0 +1,283 @@
+# ============================================================
+# Analyzer – configuração da camada de dados
+# ============================================================
+# Ajustes opcionais ficam no .streamlit/secrets.toml:
+#
+#   [analyzer]
+#   backend        = "bigquery" # "duckdb" = Parquet locais, sem rede (analyzer/local.py)
+#   local_dir      = ".cache/local"     # Parquet do backend duckdb
+#   http_pool_size = 32
+#   version_ttl    = 60         # segundos entre sondagens de versão
+#   refresh_debounce = 5        # cliques em "Atualizar agora" nessa janela contam como um
+#   refresh_interval = 60       # atualização em segundo plano (s); 0 = só sob demanda
+#   snapshot_dir   = ".cache/snapshots"   # "" desliga os snapshots locais
+#   load_workers   = 8          # tabelas carregadas em paralelo por página
+#   remote_filter_rows = 500000 # acima disso os filtros vão para o BigQuery
+#   delta_verify_every = 10     # sync incremental com dedup: conferência a cada N deltas
+#   prewarm        = true       # aquece tabelas, opções e KPIs do estado padrão em segundo
+#                               # plano na 1ª página aberta; para subir quente, o start
+#                               # roda antes: python -m analyzer.prewarm (ver prewarm.py)
+#   telemetry_log  = ".cache/telemetry/jobs.jsonl"   # "" desliga o log dos jobs
+#   telemetry_window = 3600     # janela (s) dos agregados em memória
+#   estimate_ttl   = 3600       # validade (s) da estimativa (dry-run) de cada query
+#   budget_action  = "warn"     # página acima do orçamento: "warn" | "snapshot" | "refuse"
+#   query_deadline = 180        # prazo (s) de cada job; estourou, cancela
+#   query_retries  = 2          # novas tentativas em erro transitório
+#   retry_backoff  = 1.0        # base (s) do backoff exponencial com jitter
+#   hedge          = false      # job duplicado quando passa do p95 de espera
+#   hedge_quantile = 0.95
+#
+#   [analyzer.budgets]          # GiB por página na janela telemetry_window
+#   default = 100
+#   Atrasados-aldeia = 5
+#
+#   [analyzer.tables.membros]
+#   fetch_mode     = "arrow"    # "rest" (padrão) | "arrow"
+#   version_column = "ingestion_time"   # versão = MAX(coluna) em vez do metadado
+#   sync           = "full"     # "incremental" (padrão nas bases) | "full"
+#   dedup          = "local"    # "sql" (padrão nas bases) | "local" | "off"
+#   kpi_pushdown   = true       # cards de KPI via COUNTIF no BigQuery (e no pré-aquecimento)
+#
+# Sem secrets.toml (benchmarks, máquina offline) o backend também pode vir
+# da variável de ambiente ANALYZER_BACKEND.
+# ============================================================
+import os
+
+import streamlit as st
+
+PROJECT_ID = "leads-ts"
+DATASET    = "Analyzer"
+TZ         = "America/Sao_Paulo"
+
+# JSON da service account usado quando não há secrets (máquina local)
+LOCAL_SA_PATH = r"C:\Users\mateu\StreamLit\OtavioPermissao.json"
+
+# De onde vêm os dados: "bigquery" ou "duckdb" (Parquet em LOCAL_DIR,
+# relativo à raiz do repo)
+BACKEND = os.getenv("ANALYZER_BACKEND", "bigquery")
+LOCAL_DIR = ".cache/local"
+
+# Conexões HTTP mantidas no pool do client (≈ sessões simultâneas)
+HTTP_POOL_SIZE = 32
+
+# Intervalo (s) em que a versão de cada tabela é reconsultada no BigQuery
+VERSION_TTL = 60
+
+# Snapshots Arrow das tabelas (relativo à raiz do repo) para restart quente
+SNAPSHOT_DIR = ".cache/snapshots"
+
+# Janela (s) em que vários "Atualizar agora" descartam as sondagens uma vez só
+REFRESH_DEBOUNCE = 5
+
+# Intervalo (s) do refresher em segundo plano; 0 volta a sondar a cada acesso
+REFRESH_INTERVAL = 60
+
+# Threads para carregar em paralelo as tabelas de uma mesma página
+LOAD_WORKERS = 8
+
+# Tamanho (linhas) a partir do qual os filtros das páginas rodam no BigQuery
+REMOTE_FILTER_ROWS = 500_000
+
+# Sync incremental com dedup: a contagem de conferência (COUNT na subquery
+# deduplicada, relê a tabela) roda a cada N deltas ou quando o num_rows encolhe
+DELTA_VERIFY_EVERY = 10
+
+# Pré-aquecimento (tabelas + opções + KPIs padrão) ao subir o processo
+PREWARM = True
+
+# Log (JSONL, relativo à raiz do repo) com custo/latência de cada job e
+# janela (s) dos agregados em memória
+TELEMETRY_LOG = ".cache/telemetry/jobs.jsonl"
+TELEMETRY_WINDOW = 3600
+
+# Orçamento de bytes (GiB) por página — nome do arquivo da página, ou
+# "refresher"/"prewarm"/"revalidate" — somando os bytes cobrados na janela
+# telemetry_window e a estimativa (dry-run) do job que vai rodar.
+# "default" vale para quem não tem entrada; None desliga.
+PAGE_BUDGETS = {"default": 100}
+BUDGET_ACTION = "warn"
+ESTIMATE_TTL = 3600
+
+# Espera dos jobs (analyzer/jobs.py): prazo (s), retentativas em erro
+# transitório, base do backoff (s) e hedge no quantil de espera
+QUERY_DEADLINE = 180
+QUERY_RETRIES = 2
+RETRY_BACKOFF = 1.0
+HEDGE = False
+HEDGE_QUANTILE = 0.95
+
+# Texto que conta como vazio (sem espaços nas pontas, em minúsculas): vira
+# NULL nas colunas "filled" e "dimensions" do loader e no "preenchido" dos
+# KPIs em SQL
+SENTINELS = ("", "nan", "none", "null", "nat", "#ref!", "ref!")
+
+# Tabelas consumidas pelas páginas. "columns" é a UNIÃO do que as páginas
+# de cada base realmente leem: a tabela é baixada uma vez só e cada página
+# recebe apenas a projeção das colunas que usa.
+#
+# sync="incremental": a cada versão nova só as linhas com watermark >= o
+# maior já carregado são baixadas e sobrepostas (upsert) pela upsert_key.
+# Sem dedup ("off") a carga completa guarda todas as linhas, então o delta
+# só troca a fatia com watermark >= o maior já carregado (sem upsert).
+#
+# types: colunas tipadas no próprio SELECT (SAFE_CAST(col AS tipo) AS col).
+# Texto inválido/sentinela ("", "nan", "None"...) vira NULL no BigQuery e
+# a coluna chega como datetime64, sem pd.to_datetime elemento a elemento.
+#
+# order_by: ordem de exibição. Não vai para o SQL (sort global no BigQuery
+# à toa); quem renderiza a tabela na ordem pede loader.sort_rows.
+#
+# filled: colunas de texto em que as sentinelas (SENTINELS) viram NULL no
+# loader, que grava também <coluna>_ok (bool, "preenchida") para as páginas.
+#
+# dimensions: colunas com poucos valores distintos (gestor, turma...) que o
+# loader guarda como categóricas (texto sem espaços nas pontas, sentinela
+# como NULL); filtros e agrupamentos rodam nos códigos. As colunas dos
+# papéis (equipe/broker...) entram sempre.
+#
+# derived: colunas calculadas no loader a partir das baixadas (hash_id,
+# tipo_titularidade, dia/mês do primeiro contato), depois da normalização
+# das datas; ficam no frame da versão e as páginas pedem pelo nome.
+#
+# dedup: a tabela guarda uma linha por ingestão; só a mais recente de cada
+# upsert_key (pelo watermark) vale. "sql" faz QUALIFY ROW_NUMBER() no
+# BigQuery, "local" baixa tudo e deduplica no pandas, "off" não mexe.
+_FUNIL_COLUMNS = [
+    "id", "turma", "titularidade", "email",
+    "data_primeiro_contato", "target_sup", "finalizacao_primeira", "finalizado_final",
+    "status_atraso",
+]
+_FUNIL_TYPES = {
+    "data_primeiro_contato": "DATETIME", "target_sup": "DATETIME",
+    "finalizacao_primeira": "DATETIME", "finalizado_final": "DATETIME",
+}
+# Pagante/Adicional e dia/mês do primeiro contato, calculados no loader
+_FUNIL_DERIVED = ["tipo_titularidade", "dia_primeiro_contato", "mes_primeiro_contato"]
+
+TABLES = {
+    "membros": {
+        "table": "membros_2026_s",
+        "columns": _FUNIL_COLUMNS + ["gestor", "late_sup_atraso", "updated_at", "ingestion_time"],
+        "types": _FUNIL_TYPES,
+        "filled": ["email", "gestor"],
+        "dimensions": ["gestor", "turma", "status_atraso", "titularidade"],
+        "derived": _FUNIL_DERIVED,
+        "order_by": "ingestion_time DESC",
+        "sync": "incremental", "watermark": "ingestion_time", "upsert_key": "id",
+        "dedup": "sql",
+    },
+    "aldeia": {
+        "table": "aldeia_2026_s",
+        "columns": _FUNIL_COLUMNS + ["broker", "updated_at", "ingestion_time"],
+        "types": _FUNIL_TYPES,
+        "filled": ["email"],
+        "dimensions": ["turma", "status_atraso", "titularidade"],
+        # coluna de equipe: primeiro candidato presente no schema (planner.py)
+        "roles": {
+            "equipe": ["equipe", "broker", "brokers", "corretora", "empresa", "gestor"],
+            "broker": ["broker", "brokers", "corretora", "empresa"],
+        },
+        "derived": _FUNIL_DERIVED,
+        "order_by": "ingestion_time DESC",
+        "sync": "incremental", "watermark": "ingestion_time", "upsert_key": "id",
+        "dedup": "sql",
+    },
+    "presenciais": {
+        "table": "aldeia_presenciais_s",
+        "columns": [
+            "nome", "email", "telefone", "dias_na_aldeia", "data_primeiro_contato", "turma",
+            "conta_titular", "validacao_titular", "mt5_titular", "nome_adicional",
+            "finalizacao_1_etapa", "cancelamento", "broker", "ingestion_time",
+        ],
+        "types": {"data_primeiro_contato": "DATETIME"},
+        "filled": ["telefone", "broker", "nome_adicional", "finalizacao_1_etapa", "cancelamento"],
+        "dimensions": ["turma", "conta_titular", "validacao_titular", "mt5_titular", "broker"],
+        "derived": ["hash_id", "dia_primeiro_contato", "mes_primeiro_contato"],   # hash_id: email + telefone
+        "order_by": "ingestion_time DESC",
+        "sync": "incremental", "watermark": "ingestion_time", "upsert_key": "hash_id",
+    },
+    "metas": {
+        "table": "metas_forecast_finalizados",
+        "columns": ["Data", "FinalizadoAcumulado", "MetaAcumulado"],
+        "where": f'Data <= CURRENT_DATE("{TZ}")',
+        "order_by": "Data",
+        "daily": True,   # resultado muda com a data, mesmo sem escrita na tabela
+    },
+    "metas_aldeia": {
+        "table": "metas_aldeia_forecast_finalizados",
+        "columns": ["Data", "FinalizadoAcumulado", "MetaAcumulado"],
+        "where": f'Data <= CURRENT_DATE("{TZ}")',
+        "order_by": "Data",
+        "daily": True,   # resultado muda com a data, mesmo sem escrita na tabela
+    },
+}
+
+FETCH_MODES = ("rest", "arrow")
+SYNC_MODES  = ("full", "incremental")
+DEDUP_MODES = ("off", "sql", "local")
+BUDGET_ACTIONS = ("warn", "snapshot", "refuse")
+BACKENDS = ("bigquery", "duckdb")
+
+
+def secrets_get(name: str, default=None):
+    # st.secrets levanta exceção quando não existe secrets.toml
+    try:
+        return st.secrets[name] if name in st.secrets else default
+    except Exception:
+        return default
+
+
+def setting(name: str, default=None):
+    section = secrets_get("analyzer", {}) or {}
+    return section.get(name, default)
+
+
+def table_option(key: str, name: str, default=None):
+    overrides = (setting("tables", {}) or {}).get(key, {}) or {}
+    if name in overrides:
+        return overrides[name]
+    return TABLES[key].get(name, default)
+
+
+def table_id(key: str) -> str:
+    return f"{PROJECT_ID}.{DATASET}.{TABLES[key]['table']}"
+
+
+def table_fqn(key: str) -> str:
+    return f"`{table_id(key)}`"
+
+
+def backend() -> str:
+    name = setting("backend", BACKEND)
+    return name if name in BACKENDS else "bigquery"
+
+
+def fetch_mode(key: str | None) -> str:
+    mode = table_option(key, "fetch_mode", "rest") if key else "rest"
+    return mode if mode in FETCH_MODES else "rest"
+
+
+def sync_mode(key: str) -> str:
+    mode = table_option(key, "sync", "full")
+    return mode if mode in SYNC_MODES else "full"
+
+
+def dedup_mode(key: str) -> str:
+    mode = table_option(key, "dedup", "off")
+    if mode not in DEDUP_MODES or not table_option(key, "watermark"):
+        return "off"
+    # chave derivada (ex.: hash_id) só existe no pandas
+    if mode == "sql" and table_option(key, "upsert_key", "id") in TABLES[key].get("derived", []):
+        return "local"
+    return mode
+
+
+def budget_action() -> str:
+    action = setting("budget_action", BUDGET_ACTION)
+    return action if action in BUDGET_ACTIONS else BUDGET_ACTION
+
+
+def page_budget(page: str) -> int | None:
+    budgets = {**PAGE_BUDGETS, **(setting("budgets", {}) or {})}
+    gib = budgets.get(page, budgets.get("default"))
+    return int(gib * 2**30) if gib else None
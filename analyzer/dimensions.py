@@ -0,0 +1,98 @@
+# ============================================================
+# Analyzer – colunas de dimensão como categóricas (dicionário)
+# ============================================================
+# gestor, turma, equipe/broker, status_atraso, titularidade... têm poucos
+# valores distintos repetidos em todas as linhas. Como object, cada
+# filtro/gráfico das páginas refazia .astype(str).str.strip() na coluna
+# inteira antes do isin/groupby/value_counts. O loader codifica essas
+# colunas uma vez por versão ("dimensions" do registro + colunas dos
+# papéis): texto sem espaços nas pontas, sentinelas ("", "nan"...) como
+# NULL e categorias sempre str. Filtro (isin) e agrupamento passam a
+# rodar nos códigos inteiros; só as categorias (poucas) são texto.
+#
+# Comparação de memória e tempo: python benchmarks/bench_dimensions.py
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analyzer.config import SENTINELS
+
+
+def _text(values: pd.Series):
+    # coluna -> array de texto do pyarrow (os kernels utf8_* só aceitam string)
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # object com tipos misturados
+        array = pa.array(values.astype("string"), from_pandas=True)
+    if isinstance(array, pa.ChunkedArray):
+        # coluna Arrow (fetch_mode="arrow" / snapshot) chega em vários lotes
+        array = array.combine_chunks()
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        array = array.cast(pa.string())
+    return array
+
+
+def _is_sentinel(text):
+    return pc.is_in(pc.utf8_lower(text), value_set=pa.array(SENTINELS, type=text.type))
+
+
+def sentinel_mask(values: pd.Series) -> np.ndarray:
+    # trim + lower + is_in nos kernels do pyarrow, sem as cópias de string do pandas
+    found = _is_sentinel(pc.utf8_trim_whitespace(_text(values)))
+    return pc.fill_null(found, False).to_numpy(zero_copy_only=False)
+
+
+def encode(values: pd.Series) -> pd.Series:
+    # já codificada (ex.: snapshot lido no modo rest): nada a fazer
+    if isinstance(values.dtype, pd.CategoricalDtype) and all(isinstance(c, str) for c in values.cat.categories):
+        return values
+    # trim + sentinela -> NULL e códigos/categorias direto do dictionary_encode
+    text = pc.utf8_trim_whitespace(_text(values))
+    text = pc.if_else(_is_sentinel(text), None, text)
+    encoded = pc.dictionary_encode(text)
+    codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+    categories = encoded.dictionary.to_pylist()
+    categorical = pd.Categorical.from_codes(codes, categories=categories)
+    # categorias em ordem alfabética: groupby sai na mesma ordem do sort de texto
+    categorical = categorical.reorder_categories(sorted(categories))
+    return pd.Series(categorical, index=values.index, name=values.name)
+
+
+def align(left: pd.Series, right: pd.Series) -> tuple[pd.Series, pd.Series]:
+    # mesmas categorias dos dois lados: o concat do upsert continua categórico
+    # (com categorias diferentes o pandas volta para object)
+    categories = left.cat.categories.union(right.cat.categories)
+    return left.cat.set_categories(categories), right.cat.set_categories(categories)
+
+
+def present(values: pd.Series) -> list:
+    # valores distintos presentes (sem NULL), ordenados, como texto
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return sorted(str(c) for c in values.cat.categories[np.unique(codes[codes >= 0])])
+    return sorted(values.dropna().astype(str).unique())
+
+
+def dim_labels(values: pd.Series, missing: str) -> pd.Series:
+    # rótulo para NULL (ex.: "Sem gestor") sem sair da categórica; sem as
+    # categorias ausentes no recorte (value_counts não lista zeros)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = encode(values)
+    # tudo nos códigos: contagem por código (NULL = -1 vira a posição 0)
+    codes = values.cat.codes.to_numpy()
+    categories = values.cat.categories
+    counts = np.bincount(codes + 1, minlength=len(categories) + 1)
+    labels = [str(c) for c, n in zip(categories, counts[1:]) if n]
+    if counts[0] and missing not in labels:
+        labels = sorted(labels + [missing])
+    lookup = np.full(len(categories) + 1, -1, dtype=np.int32)
+    position = {label: i for i, label in enumerate(labels)}
+    lookup[0] = position.get(missing, -1)
+    for i, c in enumerate(categories, start=1):
+        lookup[i] = position.get(str(c), -1)
+    categorical = pd.Categorical.from_codes(lookup[codes + 1], categories=labels)
+    return pd.Series(categorical, index=values.index, name=values.name)
@@ -0,0 +1,144 @@
+# ============================================================
+# Analyzer – filtros das páginas (local x BigQuery)
+# ============================================================
+# Um estado de filtro é {coluna: [valores], "meses": ["AAAA-MM", ...]}.
+# O mesmo estado vira seleção de linhas no índice da versão em cache
+# (tabela pequena, analyzer/selection.py) ou WHERE parametrizado (tabela
+# grande, filtra no BigQuery): as duas formas seguem a regra das páginas —
+# valor como texto em uma lista e mês da data_primeiro_contato.
+import pandas as pd
+from google.cloud import bigquery
+
+from analyzer import selection
+from analyzer.config import SENTINELS
+from analyzer.sql import datetime_sql
+
+MONTH_KEY = "meses"
+MONTH_COL = "data_primeiro_contato"
+# coluna derivada pelo loader com o mês (dia 1º) de cada coluna de data
+MONTH_OF = {MONTH_COL: "mes_primeiro_contato"}
+
+_PARAM_NAMES = {"gestor": "gestores", "turma": "turmas", "broker": "brokers", "tipo_titularidade": "titularidades"}
+
+# regra do loader (classify_titularidade) em SQL: "adicional" no texto -> Adicional
+ADICIONAL_SQL = "IFNULL(STRPOS(LOWER(CAST(titularidade AS STRING)), 'adicional') > 0, FALSE)"
+# filtros em colunas calculadas no loader: expressão equivalente no BigQuery
+_EXPRESSIONS = {"tipo_titularidade": f"IF({ADICIONAL_SQL}, 'Adicional', 'Pagante')"}
+_SENTINELS_SQL = ", ".join(f"'{s}'" for s in SENTINELS)
+
+
+def active(filters: dict) -> dict:
+    return {name: list(values) for name, values in (filters or {}).items() if values}
+
+
+def month_ranges(meses) -> list:
+    # meses contíguos viram um intervalo só: [início, fim)
+    periods = sorted({pd.Period(m, "M") for m in meses})
+    ranges = []
+    for p in periods:
+        if ranges and ranges[-1][1] == p:
+            ranges[-1][1] = p + 1
+        else:
+            ranges.append([p, p + 1])
+    return [(start.start_time.to_pydatetime(), end.start_time.to_pydatetime()) for start, end in ranges]
+
+
+# ========= Local (pandas) =========
+def month_column(columns, month_col: str = MONTH_COL) -> str:
+    # o mês já derivado no frame da versão, se houver; senão a própria data
+    derived = MONTH_OF.get(month_col)
+    return derived if derived in columns else month_col
+
+
+def _month_start(frame: pd.DataFrame, month_col: str) -> pd.Series:
+    column = month_column(frame.columns, month_col)
+    if column != month_col:
+        return frame[column]
+    return pd.to_datetime(frame[month_col], errors="coerce").dt.to_period("M").dt.start_time
+
+
+def local_index(frame: pd.DataFrame, name: str, month_col: str = MONTH_COL) -> dict:
+    # índice da dimensão de filtro "name" (o mês vira rótulo "AAAA-MM")
+    if name == MONTH_KEY:
+        return selection.build(_month_start(frame, month_col), label=lambda ts: ts.strftime("%Y-%m"))
+    return selection.build(frame[name])
+
+
+def local_rows(index_of, filters: dict):
+    # index_of(nome) -> índice da versão (cache do loader); None = todas as linhas
+    parts = []
+    for name, values in active(filters).items():
+        if name == MONTH_KEY:
+            values = [str(pd.Period(m, "M")) for m in values]
+        parts.append((index_of(name), values))
+    return selection.select(parts)
+
+
+def local_options(index_of, dims, rows: int) -> dict:
+    options = {"rows": rows}
+    for dim in dims:
+        # None = coluna/papel ausente no schema (a página esconde o filtro)
+        index = index_of(dim)
+        options[dim] = selection.present(index) if index is not None else None
+    options[MONTH_KEY] = [pd.Period(m, "M") for m in selection.present(index_of(MONTH_KEY))]
+    return options
+
+
+# ========= BigQuery (WHERE + parâmetros) =========
+def _month_expr(month_col: str) -> str:
+    return f"({datetime_sql(month_col)})"
+
+
+def _text_expr(column: str) -> str:
+    # mesmo texto das dimensões no loader (analyzer/dimensions.py): sem espaços nas pontas
+    return f"TRIM(CAST({column} AS STRING))"
+
+
+def where_sql(filters: dict, month_col: str = MONTH_COL, columns=None) -> tuple[list, list]:
+    # columns: nome na página -> coluna real (papéis resolvidos pelo planner)
+    columns = columns or {}
+    conditions, params = [], []
+    for name, values in active(filters).items():
+        if name == MONTH_KEY:
+            ranges = []
+            for i, (start, end) in enumerate(month_ranges(values)):
+                ranges.append(f"({_month_expr(month_col)} >= @mes_ini_{i} AND {_month_expr(month_col)} < @mes_fim_{i})")
+                params += [
+                    bigquery.ScalarQueryParameter(f"mes_ini_{i}", "DATETIME", start),
+                    bigquery.ScalarQueryParameter(f"mes_fim_{i}", "DATETIME", end),
+                ]
+            conditions.append("(" + " OR ".join(ranges) + ")" if len(ranges) > 1 else ranges[0])
+        else:
+            param = _PARAM_NAMES.get(name, f"{name}_valores")
+            column = columns.get(name) or _EXPRESSIONS.get(name, name)
+            conditions.append(f"{_text_expr(column)} IN UNNEST(@{param})")
+            params.append(bigquery.ArrayQueryParameter(param, "STRING", [str(v) for v in values]))
+    return conditions, params
+
+
+def options_sql(fqn: str, dims, month_col: str = MONTH_COL, columns=None) -> str:
+    columns = columns or {}
+    parts = [f"SELECT 'rows' AS dim, CAST(COUNT(*) AS STRING) AS v FROM {fqn}"]
+    for dim in dims:
+        col = columns.get(dim, dim)
+        # sentinela ("", "nan", "#REF!"...) é NULL no loader: não vira opção
+        text = _text_expr(col)
+        parts.append(f"SELECT DISTINCT '{dim}' AS dim, {text} AS v FROM {fqn} WHERE LOWER({text}) NOT IN ({_SENTINELS_SQL})")
+    month = f"FORMAT_DATETIME('%Y-%m', {_month_expr(month_col)})"
+    parts.append(f"SELECT DISTINCT '{MONTH_KEY}' AS dim, {month} AS v FROM {fqn} WHERE {month} IS NOT NULL")
+    return "\nUNION ALL\n".join(parts)
+
+
+def options_from_rows(rows, dims) -> dict:
+    options = {"rows": 0, MONTH_KEY: [], **{dim: [] for dim in dims}}
+    for dim, value in rows:
+        if dim == "rows":
+            options["rows"] = int(value)
+        elif dim == MONTH_KEY:
+            options[MONTH_KEY].append(pd.Period(value, "M"))
+        else:
+            options[dim].append(value)
+    for dim in dims:
+        options[dim] = sorted(options[dim])
+    options[MONTH_KEY] = sorted(options[MONTH_KEY], key=lambda p: (p.year, p.month))
+    return options
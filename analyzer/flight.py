@@ -0,0 +1,79 @@
+# ============================================================
+# Analyzer – single-flight (uma execução por pedido em andamento)
+# ============================================================
+# Cache frio ou várias pessoas no "Atualizar agora" ao mesmo tempo: cada
+# sessão pediria o mesmo job ao BigQuery. Aqui o primeiro pedido de uma
+# chave executa e os que chegam enquanto ele roda esperam e recebem o
+# mesmo resultado (ou a mesma exceção). Os contadores por tabela contam
+# jobs executados e jobs evitados; ficam no processo (cache_resource),
+# somando todas as sessões. Só conta o pedido que de fato disparou job no
+# BigQuery (query.py avisa via job_started): versão já em dia, sondagem
+# só de metadado ou recorte servido da última versão não entram.
+import threading
+import time
+
+import streamlit as st
+
+
+@st.cache_resource(show_spinner=False)
+def _flights() -> dict:
+    return {"lock": threading.Lock(), "calls": {}, "stats": {}}
+
+
+# pedidos líderes em andamento nesta thread (o mais interno no fim)
+_local = threading.local()
+
+
+def job_started() -> None:
+    # chamado a cada job disparado (analyzer/query.py): marca o pedido líder atual
+    active = getattr(_local, "active", None)
+    if active:
+        active[-1]["ran_job"] = True
+
+
+def _count(state: dict, table: str, name: str) -> None:
+    stats = state["stats"].setdefault(table, {"jobs": 0, "avoided": 0, "last_job": None})
+    stats[name] += 1
+    if name == "jobs":
+        stats["last_job"] = time.time()
+
+
+def single_flight(table: str, key, fn):
+    state = _flights()
+    with state["lock"]:
+        call = state["calls"].get((table, key))
+        leader = call is None
+        if leader:
+            call = state["calls"][(table, key)] = {
+                "done": threading.Event(), "result": None, "error": None, "ran_job": False,
+            }
+    if not leader:
+        call["done"].wait()
+        if call["ran_job"]:
+            with state["lock"]:
+                _count(state, table, "avoided")
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+    active = _local.__dict__.setdefault("active", [])
+    active.append(call)
+    try:
+        call["result"] = fn()
+    except BaseException as exc:
+        call["error"] = exc
+        raise
+    finally:
+        active.pop()
+        with state["lock"]:
+            state["calls"].pop((table, key), None)
+            if call["ran_job"]:
+                _count(state, table, "jobs")
+        call["done"].set()
+    return call["result"]
+
+
+def flight_stats() -> dict:
+    # {tabela: {"jobs", "avoided", "last_job"}} desde o início do processo
+    state = _flights()
+    with state["lock"]:
+        return {table: dict(stats) for table, stats in state["stats"].items()}
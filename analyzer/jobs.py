@@ -0,0 +1,178 @@
+# ============================================================
+# Analyzer – espera dos jobs: prazo, retentativas e hedge
+# ============================================================
+# Um job.result() lento ou com erro transitório travava a página. Aqui:
+#   - prazo (query_deadline): vale da criação do job até o fim do download
+#     (client.query, done, result e cada página com timeout = o que sobrou;
+#     o download espera no máximo isso, ver bounded). Passou disso, os jobs
+#     em andamento são cancelados e sobe DeadlineExceeded
+#   - retentativa (query_retries): erro transitório do BigQuery/rede
+#     (5xx, 429, backendError, rateLimitExceeded, conexão) dispara um job
+#     novo depois de um backoff exponencial com jitter, dentro do prazo.
+#     Todo job da camada de dados é leitura (SELECT), então repetir é seguro
+#   - hedge (hedge = true): se o job passa do p95 de espera daquela
+#     tabela/tipo (telemetria), um job duplicado é disparado e vale o que
+#     terminar primeiro; o outro é cancelado. Custa bytes em dobro nos
+#     casos de cauda, por isso vem desligado
+# Se mesmo assim falhar, o loader segue na última versão boa (memória ou
+# snapshot): na carga da tabela, no recorte filtrado e nas opções de
+# filtro remotas; os KPIs do pushdown voltam para o cálculo em pandas
+# (fallback_ok diz quais erros permitem isso). O client e a política são injetáveis (run_job(..., client=,
+# policy=)) para testar com latência/erros simulados — ver tests/test_jobs.py e
+# benchmarks/bench_tail.py.
+import random
+import threading
+import time
+
+from google.api_core import exceptions as api_exceptions
+from requests import exceptions as http_exceptions
+
+from analyzer.budget import serves_snapshot
+from analyzer.client import get_client
+from analyzer.config import HEDGE, HEDGE_QUANTILE, QUERY_DEADLINE, QUERY_RETRIES, RETRY_BACKOFF, setting
+from analyzer.telemetry import wait_quantile
+
+_TRANSIENT = (
+    api_exceptions.InternalServerError, api_exceptions.BadGateway, api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout, api_exceptions.TooManyRequests,
+    http_exceptions.ConnectionError, http_exceptions.Timeout, ConnectionError,
+)
+_TRANSIENT_REASONS = {"backendError", "internalError", "rateLimitExceeded", "jobBackendError"}
+
+# amostras mínimas na janela da telemetria antes de confiar no p95
+HEDGE_MIN_SAMPLES = 20
+# backoff máximo (s) entre tentativas
+RETRY_BACKOFF_CAP = 8.0
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def transient(exc: Exception) -> bool:
+    if isinstance(exc, _TRANSIENT):
+        return True
+    errors = getattr(exc, "errors", None) or []
+    return any(isinstance(e, dict) and e.get("reason") in _TRANSIENT_REASONS for e in errors)
+
+
+def fallback_ok(exc: Exception) -> bool:
+    # prazo, erro que sobrou das retentativas ou orçamento com "snapshot":
+    # quem chamou serve a última versão boa em vez de levar o erro à página
+    if serves_snapshot(exc) or isinstance(exc, DeadlineExceeded) or transient(exc):
+        return True
+    return isinstance(exc, (api_exceptions.GoogleAPICallError, http_exceptions.RequestException))
+
+
+def _cancel(job) -> None:
+    try:
+        job.cancel()
+    except Exception:
+        pass
+
+
+def remaining(deadline: float) -> float:
+    # timeout das chamadas do client: o que sobrou do prazo (> 0, o requests recusa 0)
+    return max(deadline - time.monotonic(), 0.01)
+
+
+def _wait(client, sql: str, job_config, deadline: float, hedge_after: float | None):
+    # espera o 1º job que terminar bem; devolve (job, linhas, hedged). Saiu
+    # daqui por erro (done() com falha de rede, prazo), nenhum job fica rodando
+    started = time.monotonic()
+    pending = [client.query(sql, job_config=job_config, timeout=remaining(deadline))]
+    hedged, error, poll = False, None, 0.05
+    try:
+        while pending:
+            for job in list(pending):
+                if not job.done(timeout=remaining(deadline)):
+                    continue
+                pending.remove(job)
+                try:
+                    # o timeout vale também para cada página do download (list_rows)
+                    rows = job.result(timeout=remaining(deadline))
+                except Exception as exc:
+                    _cancel(job)
+                    error = exc   # o duplicado (se houver) ainda pode terminar bem
+                    continue
+                for other in pending:
+                    _cancel(other)
+                return job, rows, hedged
+            if not pending:
+                break
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded(f"job passou do prazo ({now - started:.1f}s de espera)")
+            if hedge_after is not None and not hedged and now - started >= hedge_after:
+                pending.append(client.query(sql, job_config=job_config, timeout=remaining(deadline)))
+                hedged = True
+            time.sleep(min(poll, remaining(deadline)))
+            poll = min(poll * 1.5, 1.0)
+    except BaseException:
+        for job in pending:
+            _cancel(job)
+        raise
+    raise error
+
+
+def bounded(fn, deadline: float):
+    # download (to_dataframe/to_arrow/iteração) dentro do que sobrou do prazo;
+    # passou disso a página segue (DeadlineExceeded) e a thread termina sozinha
+    box = {}
+
+    def target():
+        try:
+            box["result"] = fn()
+        except BaseException as exc:
+            box["error"] = exc
+
+    thread = threading.Thread(target=target, name="analyzer-download", daemon=True)
+    thread.start()
+    thread.join(remaining(deadline))
+    if thread.is_alive():
+        raise DeadlineExceeded("download passou do prazo")
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+def job_policy(table: str | None, kind: str) -> dict:
+    # "hedge_after": segundos de espera até o duplicado (None = sem hedge)
+    hedge_after = None
+    if setting("hedge", HEDGE):
+        hedge_after = wait_quantile(table, kind, setting("hedge_quantile", HEDGE_QUANTILE), HEDGE_MIN_SAMPLES)
+    return {
+        "deadline": setting("query_deadline", QUERY_DEADLINE),
+        "retries": setting("query_retries", QUERY_RETRIES),
+        "backoff": setting("retry_backoff", RETRY_BACKOFF),
+        "hedge_after": hedge_after,
+    }
+
+
+def run_job(
+    sql: str, job_config=None, table: str | None = None, kind: str = "query", client=None, policy=None,
+    deadline: float | None = None,
+):
+    # devolve (job concluído, linhas do job.result(), {"attempts", "hedged", "wait_s"})
+    # deadline: instante (time.monotonic) limite; padrão = agora + policy["deadline"]
+    client = client or get_client()
+    policy = policy or job_policy(table, kind)
+    t0 = time.monotonic()
+    if deadline is None:
+        deadline = t0 + policy["deadline"]
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            job, rows, hedged = _wait(client, sql, job_config, deadline, policy["hedge_after"])
+            return job, rows, {"attempts": attempt, "hedged": hedged, "wait_s": round(time.monotonic() - t0, 4)}
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            if attempt > policy["retries"] or not transient(exc):
+                raise
+            # full jitter: espera aleatória até o teto exponencial
+            delay = random.uniform(0, min(RETRY_BACKOFF_CAP, policy["backoff"] * 2 ** (attempt - 1)))
+            if time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
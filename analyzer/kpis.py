@@ -0,0 +1,160 @@
+# ============================================================
+# Analyzer – KPIs calculados no BigQuery (pushdown)
+# ============================================================
+# Os cards de KPI só precisam de contagens. Com kpi_pushdown ligado na
+# tabela, as regras do funil (email preenchido, corte target_sup - 5 dias,
+# 1ª/2ª etapa, faixas de atraso) viram UM SELECT com COUNTIF por estado
+# de filtro e a resposta tem poucos bytes. Cada conjunto abaixo espelha
+# as máscaras pandas da página correspondente; o caminho pandas continua
+# valendo para tabelas de detalhe, para quando o pushdown está desligado e
+# para quando o job não pôde rodar (pushdown_counts devolve None).
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from google.cloud import bigquery
+
+from analyzer.config import SENTINELS, TZ, table_option
+from analyzer.filters import ADICIONAL_SQL, MONTH_KEY, where_sql
+from analyzer.flight import single_flight
+from analyzer.jobs import fallback_ok
+from analyzer.loader import known_info
+from analyzer.query import query_rows
+from analyzer.sql import datetime_sql, source_sql
+from analyzer.versions import versioned
+
+# mesmas sentinelas que o loader transforma em NULL nas colunas "filled"
+_EMPTY = "(" + ", ".join(f"'{v}'" for v in SENTINELS) + ")"
+
+
+def _filled(col: str) -> str:
+    return f"IFNULL(LOWER(TRIM(CAST({col} AS STRING))) NOT IN {_EMPTY}, FALSE)"
+
+
+def _dt(col: str) -> str:
+    # equivalente ao pd.to_datetime(..., errors="coerce") (ver sql.datetime_sql)
+    return f"({datetime_sql(col)})"
+
+
+# ========= Conjuntos de KPIs =========
+# "columns": expressões calculadas uma vez por linha (subquery)
+# "counts":  predicados sobre essas colunas -> COUNTIF(...) AS nome
+KPI_SETS = {
+    # main.py – seção 6
+    "funil": {
+        "columns": {
+            "email_ok": _filled("email"),
+            "gestor_ok": _filled("gestor"),
+            "t": _dt("target_sup"),
+            "cutoff": f"DATETIME_SUB({_dt('target_sup')}, INTERVAL 5 DAY)",
+            "fin1": f"{_dt('finalizacao_primeira')} IS NOT NULL",
+            "fin2": f"{_dt('finalizado_final')} IS NOT NULL",
+        },
+        "counts": {
+            "membros_total": "email_ok",
+            "membros_com_gestor": "email_ok AND gestor_ok",
+            "finalizados_primeira": "email_ok AND fin1",
+            "finalizados_geral": "email_ok AND fin2",
+            "nao_finalizados_geral": "email_ok AND NOT fin2",
+            "pendentes_primeira": "email_ok AND NOT fin1 AND cutoff IS NOT NULL",
+            "pendentes_primeira_janela": "email_ok AND NOT fin1 AND cutoff >= @hoje",
+            "atrasados_primeira": "email_ok AND NOT fin1 AND cutoff < @hoje",
+            "pendentes_segunda": "email_ok AND fin1 AND NOT fin2 AND t >= @hoje",
+            "atrasados_segunda": "email_ok AND fin1 AND NOT fin2 AND t < @hoje",
+        },
+    },
+    # pages/Atrasados.py – etapas com faixas de atraso
+    "atrasos": {
+        "columns": {
+            "email_ok": _filled("email"),
+            # colunas tipadas no registro: "preenchida" = data válida
+            "fin1_ok": f"{_dt('finalizacao_primeira')} IS NOT NULL",
+            "fin2_ok": f"{_dt('finalizado_final')} IS NOT NULL",
+            "t": _dt("target_sup"),
+            "cutoff": f"DATETIME_SUB({_dt('target_sup')}, INTERVAL 5 DAY)",
+            "fin1_dia": f"DATETIME_TRUNC({_dt('finalizacao_primeira')}, DAY)",
+            "fin2_dia": f"DATETIME_TRUNC({_dt('finalizado_final')}, DAY)",
+            # dias inteiros de atraso (floor, como Timedelta.days)
+            "over1": f"DIV(DATETIME_DIFF(@hoje, DATETIME_SUB({_dt('target_sup')}, INTERVAL 5 DAY), SECOND), 86400)",
+            "over2": f"DIV(DATETIME_DIFF(@hoje, {_dt('target_sup')}, SECOND), 86400)",
+        },
+        "counts": {
+            "membros_com_gestor": "email_ok",
+            "atrasados_primeira": "email_ok AND NOT fin1_ok AND cutoff < @hoje",
+            "resolvidos_atraso_1": "email_ok AND fin1_dia > cutoff",
+            "ate7_1": "email_ok AND NOT fin1_ok AND cutoff < @hoje AND over1 BETWEEN 1 AND 7",
+            "de8a14_1": "email_ok AND NOT fin1_ok AND cutoff < @hoje AND over1 BETWEEN 8 AND 14",
+            "acima15_1": "email_ok AND NOT fin1_ok AND cutoff < @hoje AND over1 >= 15",
+            "atrasados_segunda": "email_ok AND fin1_ok AND NOT fin2_ok AND t < @hoje",
+            "resolvidos_atraso_2": "email_ok AND fin1_ok AND fin2_dia > t",
+            "ate7_2": "email_ok AND fin1_ok AND NOT fin2_ok AND t < @hoje AND over2 BETWEEN 1 AND 7",
+            "de8a14_2": "email_ok AND fin1_ok AND NOT fin2_ok AND t < @hoje AND over2 BETWEEN 8 AND 14",
+            "acima15_2": "email_ok AND fin1_ok AND NOT fin2_ok AND t < @hoje AND over2 >= 15",
+        },
+    },
+    # pages/Analise.py – 2ª etapa "geral" pela data de primeiro contato
+    "geral": {
+        "columns": {
+            "fin2": f"{_dt('finalizado_final')} IS NOT NULL",
+            "dias": f"GREATEST(DATE_DIFF(DATE(@hoje), DATE({_dt('data_primeiro_contato')}), DAY), 0)",
+        },
+        "counts": {
+            "membros_com_gestor": "TRUE",
+            "finalizados_geral": "fin2",
+            "pendentes_segunda": "NOT fin2 AND dias <= 7",
+            "atrasados_segunda": "NOT fin2 AND dias > 7",
+        },
+    },
+}
+
+
+# ========= Filtros da página -> WHERE =========
+def _filters_sql(tit_choice, gestor, turma, meses):
+    conditions, params = where_sql({"gestor": gestor, "turma": turma, MONTH_KEY: meses})
+    if tit_choice == "Adicional":
+        conditions.append(ADICIONAL_SQL)
+    elif tit_choice == "Pagante":
+        conditions.append(f"NOT {ADICIONAL_SQL}")
+    return conditions, params
+
+
+def counts_sql(key: str, kpi_set: str, conditions=()) -> str:
+    spec = KPI_SETS[kpi_set]
+    columns = ",\n    ".join(f"{expr} AS {alias}" for alias, expr in spec["columns"].items())
+    counts = ",\n  ".join(f"COUNTIF({pred}) AS {name}" for name, pred in spec["counts"].items())
+    where = ("\n  WHERE " + "\n    AND ".join(conditions)) if conditions else ""
+    return f"SELECT\n  {counts}\nFROM (\n  SELECT\n    {columns}\n  FROM {source_sql(key)}{where}\n)"
+
+
+def _counts(key, kpi_set, version, hoje, tit_choice, gestor, turma, meses) -> dict:
+    # cache por versão da tabela (versions.versioned): versão superada sai inteira
+    conditions, params = _filters_sql(tit_choice, gestor, turma, meses)
+    params.append(bigquery.ScalarQueryParameter("hoje", "DATETIME", datetime.fromisoformat(hoje)))
+    sql = counts_sql(key, kpi_set, conditions)
+    args = (kpi_set, hoje, tit_choice, gestor, turma, meses)
+
+    def run():
+        row = single_flight(key, ("kpis", version, *args), lambda: query_rows(sql, params, table=key, kind="kpis")[0])
+        return {name: int(row[name] or 0) for name in KPI_SETS[kpi_set]["counts"]}
+
+    return dict(versioned(key, version, "kpis", args, run))
+
+
+def kpi_pushdown(key: str) -> bool:
+    return bool(table_option(key, "kpi_pushdown", False))
+
+
+def pushdown_counts(key: str, kpi_set: str, tit_choice=None, gestor=(), turma=(), meses=()) -> dict | None:
+    # None = job não rodou (orçamento com budget_action="snapshot", prazo ou
+    # falha que sobrou das retentativas; ver jobs.fallback_ok): a página
+    # calcula os KPIs em pandas sobre o frame que já tem
+    # "hoje" entra na chave do cache: os cortes por data mudam à meia-noite
+    hoje = datetime.now(ZoneInfo(TZ)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    try:
+        return _counts(
+            key, kpi_set, known_info(key)["version"], hoje.isoformat(),
+            tit_choice, tuple(sorted(gestor)), tuple(sorted(turma)), tuple(sorted(meses)),
+        )
+    except Exception as exc:
+        if fallback_ok(exc):
+            return None
+        raise
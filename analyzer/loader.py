@@ -0,0 +1,701 @@
+# ============================================================
+# Analyzer – loader único por tabela
+# ============================================================
+# Cada tabela registrada em config.TABLES é baixada UMA vez por versão
+# (união das colunas de todas as páginas) e guardada com cache_resource:
+# o mesmo DataFrame é compartilhado por todas as sessões, sem o
+# pickle/cópia que o cache_data faz a cada acesso. As páginas recebem uma
+# projeção das colunas que usam; com Copy-on-Write a projeção não copia
+# os dados e alterações na página não vazam para o cache.
+#
+# O store guarda UMA versão por tabela (ver analyzer/versions.py): quando
+# a versão muda, o frame novo substitui o antigo e a versão superada é
+# liberada na hora, em vez de esperar despejo por max_entries. A troca
+# também descarta os recortes/opções/KPIs remotos da versão anterior
+# (versions.versioned).
+#
+# Tabelas com sync="incremental" só baixam o delta (watermark >= maior
+# valor já carregado) e fazem upsert pela upsert_key (sem dedup, o delta só
+# troca a fatia a partir do watermark: a carga completa guarda as chaves
+# repetidas e o incremental precisa dar o mesmo resultado). Volta para carga
+# completa quando o schema muda ou quando a contagem não bate com o
+# num_rows do metadado (linhas apagadas/tabela reescrita).
+#
+# Com dedup (config "dedup") o cache guarda só a ingestão mais recente de
+# cada chave: a carga completa deduplica no BigQuery (QUALIFY) ou aqui, e
+# a contagem de conferência do delta passa a ser a de chaves distintas.
+# Essa contagem relê a tabela inteira, então só roda a cada
+# delta_verify_every deltas ou quando o num_rows do metadado encolhe.
+#
+# As colunas baixadas vêm do planner (config + papéis resolvidos pelo
+# schema); a página pede um papel (ex.: "equipe") e recebe a coluna real
+# com esse nome, sem precisar saber qual candidato existe na base.
+#
+# Cada versão nova também vira snapshot local (analyzer/snapshots.py). No
+# primeiro acesso depois de um restart o snapshot é servido na hora e a
+# revalidação contra o BigQuery roda em uma thread em segundo plano.
+#
+# Com refresh_interval > 0 um refresher (uma thread por processo) sonda e
+# atualiza todas as tabelas registradas no intervalo e troca a entrada do
+# store de uma vez; as sessões leem a última versão completa sem esperar.
+# Tabela em filtro remoto que nenhuma página carregou inteira não é baixada:
+# o refresher só mantém a versão dela. Refresher e revalidação rodam sem o
+# contexto de sessão (a que disparou pode já ter acabado).
+# A sondagem que ele faz fica no store ("info"): filter_mode e as versões
+# dos caminhos remotos leem dali (known_info) em vez de sondar a cada rerun.
+# Só tabela fria ou "Atualizar agora" (entrada conferida antes do clique)
+# fazem a sessão esperar o BigQuery.
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from google.cloud import bigquery
+
+from analyzer import dimensions
+from analyzer.budget import BudgetExceeded, serves_snapshot
+from analyzer.config import (
+    DELTA_VERIFY_EVERY, LOAD_WORKERS, REFRESH_INTERVAL, REMOTE_FILTER_ROWS, TABLES, TZ, dedup_mode, fetch_mode,
+    setting, sync_mode, table_fqn, table_option,
+)
+from analyzer.filters import (
+    MONTH_COL, MONTH_KEY, active, local_index, local_options, local_rows, options_from_rows, options_sql, where_sql,
+)
+from analyzer.flight import single_flight
+from analyzer.jobs import fallback_ok
+from analyzer.planner import column_types, plan_columns, resolve_roles
+from analyzer.snapshots import read_snapshot, write_snapshot_async
+from analyzer.query import fetch_dataframe, query_rows
+from analyzer.sql import select_sql, source_sql
+from analyzer.telemetry import current_page, on_behalf_of
+from analyzer.versions import refresh_requested_at, retire_version, table_info, versioned
+
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+@st.cache_resource(show_spinner=False)
+def _store() -> dict:
+    # key -> {"version", "schema", "columns", "roles", "types", "frame",
+    # "fetched_at", "checked_at", "index", "num_rows", "syncs"} + um lock por
+    # tabela para baixar uma vez só; "index" guarda os índices de filtro
+    # daquela versão; "syncs" conta os deltas desde a última conferência.
+    # "info": key -> última sondagem (versão, schema, num_rows, checked_at),
+    # mantida por _refresh e pelo refresher, inclusive para tabela remota
+    return {
+        "frames": {}, "locks": {key: threading.Lock() for key in TABLES}, "revalidating": set(),
+        "index_lock": threading.Lock(), "info": {},
+    }
+
+
+# ========= Colunas derivadas =========
+def make_hash(email, phone):
+    e = str(email or "").strip().lower()
+    p = "".join([c for c in str(phone or "") if c.isdigit()])
+    raw = f"{e}_{p}"
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:12] if raw != "_" else None
+
+
+def _add_hash_id(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["hash_id"] = [make_hash(e, p) for e, p in zip(frame.get("email"), frame.get("telefone"))]
+    return frame
+
+
+# regra das páginas: "adicional" no texto -> Adicional; o resto (inclusive
+# NULL) é Pagante. Avaliada uma vez por valor distinto e espalhada pelos
+# códigos do factorize; o resultado fica no frame da versão, no store.
+TIPOS_TITULARIDADE = ["Pagante", "Adicional"]
+
+
+def classify_titularidade(values: pd.Series) -> pd.Series:
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    labels = [int(isinstance(v, str) and "adicional" in v.lower()) for v in uniques]
+    # código -1 (NULL) cai no último elemento: Pagante
+    labels = np.array(labels + [0], dtype=np.int8)
+    categorical = pd.Categorical.from_codes(labels[codes], categories=TIPOS_TITULARIDADE)
+    return pd.Series(categorical, index=values.index, name="tipo_titularidade")
+
+
+def _add_tipo_titularidade(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["tipo_titularidade"] = classify_titularidade(frame["titularidade"])
+    return frame
+
+
+# dia (00:00) e mês (dia 1º) do primeiro contato: gráficos por dia,
+# calendário e filtro de meses leem estas em vez de normalizar a data
+def _add_dia_primeiro_contato(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["dia_primeiro_contato"] = frame["data_primeiro_contato"].dt.normalize()
+    return frame
+
+
+def _add_mes_primeiro_contato(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["mes_primeiro_contato"] = frame["data_primeiro_contato"].dt.to_period("M").dt.start_time
+    return frame
+
+
+_DERIVED = {
+    "hash_id": _add_hash_id,
+    "tipo_titularidade": _add_tipo_titularidade,
+    "dia_primeiro_contato": _add_dia_primeiro_contato,
+    "mes_primeiro_contato": _add_mes_primeiro_contato,
+}
+# colunas do SELECT de que cada derivada depende (filtro remoto)
+_DERIVED_FROM = {
+    "hash_id": ["email", "telefone"],
+    "tipo_titularidade": ["titularidade"],
+    "dia_primeiro_contato": ["data_primeiro_contato"],
+    "mes_primeiro_contato": ["data_primeiro_contato"],
+}
+
+
+def _computed(key: str) -> dict:
+    # coluna calculada no loader (derivada ou <col>_ok) -> colunas baixadas de que depende
+    computed = {c: _DERIVED_FROM[c] for c in TABLES[key].get("derived", [])}
+    computed.update({f"{c}_ok": [c] for c in TABLES[key].get("filled", [])})
+    return computed
+
+
+# ========= Normalização (uma vez por versão) =========
+# As colunas de "types" já chegam tipadas do SELECT, mas o modo arrow (e o
+# snapshot lido nesse modo) devolve timestamp Arrow, sem .dt.tz_localize/
+# .dt.days como as páginas usam. Tudo que é data vira datetime64 aqui, uma
+# vez por versão baixada, e as páginas não chamam mais pd.to_datetime.
+#
+# Nas colunas "filled" as sentinelas ("", "nan", "#ref!"...) viram NULL e
+# <col>_ok (bool) guarda o "preenchido": as páginas leem a flag em vez de
+# refazer astype(str).str.strip().str.lower().isin(...) a cada rerun.
+#
+# Por último as colunas de dimensão ("dimensions" + candidatos dos papéis)
+# viram categóricas (analyzer/dimensions.py).
+_DATE_TYPES = {"DATETIME", "TIMESTAMP", "DATE"}
+
+
+def _normalize(key: str, frame: pd.DataFrame) -> pd.DataFrame:
+    typed = {c for c, t in column_types(key, frame.columns).items() if t in _DATE_TYPES}
+    for column in frame.columns:
+        dtype = frame[column].dtype
+        arrow_date = isinstance(dtype, pd.ArrowDtype) and dtype.kind == "M"
+        if arrow_date or (column in typed and dtype.kind != "M"):
+            frame[column] = pd.to_datetime(frame[column], errors="coerce")
+    for column in TABLES[key].get("filled", []):
+        if column in frame.columns:
+            mask = dimensions.sentinel_mask(frame[column])
+            if mask.any():
+                frame[column] = frame[column].mask(mask)
+            frame[f"{column}_ok"] = frame[column].notna().to_numpy(dtype=bool)
+    for column in dimension_columns(key):
+        if column in frame.columns:
+            frame[column] = dimensions.encode(frame[column])
+    return frame
+
+
+def dimension_columns(key: str) -> list:
+    # "dimensions" do registro + todos os candidatos dos papéis (equipe/broker...)
+    spec = TABLES[key]
+    candidates = [c for names in spec.get("roles", {}).values() for c in names]
+    return list(dict.fromkeys(spec.get("dimensions", []) + candidates))
+
+
+def _derive(frame: pd.DataFrame, derived) -> pd.DataFrame:
+    for column in derived:
+        frame = _DERIVED[column](frame)
+    return frame
+
+
+def _fetch(key: str, columns: list, where: str | None = None, params=None, latest: bool = True) -> pd.DataFrame:
+    sql = select_sql(key, where, columns, latest)
+    frame = fetch_dataframe(sql, fetch_mode(key), params, table=key, kind="delta" if where else "full")
+    return _derive(_normalize(key, frame), TABLES[key].get("derived", []))
+
+
+# ========= Dedup (última ingestão de cada chave) =========
+def _first_per_key(frame: pd.DataFrame, key_col: str) -> pd.DataFrame:
+    # frame já vem do mais recente para o mais antigo: a 1ª ocorrência vence;
+    # linhas sem chave não têm como ser casadas e ficam todas
+    keyed = frame[key_col].notna()
+    return pd.concat([frame[keyed].drop_duplicates(key_col, keep="first"), frame[~keyed]])
+
+
+def latest_rows(frame: pd.DataFrame, key_col: str, wm_col: str) -> pd.DataFrame:
+    frame = frame.sort_values(wm_col, ascending=False, kind="stable", na_position="last")
+    return _first_per_key(frame, key_col).reset_index(drop=True)
+
+
+def _fetch_full(key: str, columns: list) -> pd.DataFrame:
+    mode = dedup_mode(key)
+    frame = _fetch(key, columns, latest=mode == "sql")
+    key_col, wm_col = table_option(key, "upsert_key", "id"), table_option(key, "watermark")
+    if mode == "local" and key_col in frame.columns and wm_col in frame.columns:
+        frame = latest_rows(frame, key_col, wm_col)
+    return frame
+
+
+def _expected_rows(key: str, info: dict) -> int | None:
+    # o metadado conta todas as ingestões; com dedup quem diz quantas
+    # chaves existem é o próprio BigQuery (COUNT na subquery deduplicada)
+    if dedup_mode(key) == "off":
+        return info.get("num_rows")
+    row = query_rows(f"SELECT COUNT(*) AS n FROM {source_sql(key)}", table=key, kind="count")[0]
+    return int(row["n"])
+
+
+def _verify_due(key: str, current: dict, info: dict) -> bool:
+    # sem dedup a conferência é o metadado (sem job): sempre
+    if dedup_mode(key) == "off":
+        return True
+    shrank = (info.get("num_rows") or 0) < (current.get("num_rows") or 0)
+    return shrank or current.get("syncs", 0) + 1 >= setting("delta_verify_every", DELTA_VERIFY_EVERY)
+
+
+# ========= Sync incremental =========
+_PARAM_TYPES = {"TIMESTAMP": "TIMESTAMP", "DATETIME": "DATETIME", "DATE": "DATE", "INTEGER": "INT64"}
+
+
+def upsert(base: pd.DataFrame, delta: pd.DataFrame, key_col: str, wm_col: str, watermark) -> pd.DataFrame:
+    # delta já vem do mais recente para o mais antigo. Linha sem chave não
+    # casa com nada: as da base a partir do watermark voltam no delta e saem
+    # dela (como em append_delta), senão ficariam em dobro
+    if delta.empty:
+        return base
+    delta = _first_per_key(delta, key_col)
+    keyed = delta[key_col].notna()
+    base_keyed = base[key_col].notna()
+    replaced = base_keyed & base[key_col].isin(delta.loc[keyed, key_col])
+    replaced |= ~base_keyed & (base[wm_col] >= watermark)
+    return _prepend(delta, base[~replaced])
+
+
+def append_delta(base: pd.DataFrame, delta: pd.DataFrame, wm_col: str, watermark) -> pd.DataFrame:
+    # sem dedup a carga completa guarda todas as linhas, inclusive as que
+    # repetem a upsert_key: o delta (watermark >= o da última leitura) relê
+    # inteira a fatia da base a partir dali, que sai no lugar dele
+    return _prepend(delta, base[~(base[wm_col] >= watermark)])
+
+
+def _prepend(delta: pd.DataFrame, base: pd.DataFrame) -> pd.DataFrame:
+    for column in delta.columns:
+        if column in base.columns and isinstance(delta[column].dtype, pd.CategoricalDtype) and isinstance(base[column].dtype, pd.CategoricalDtype):
+            delta[column], base[column] = dimensions.align(delta[column], base[column])
+    return pd.concat([delta, base], ignore_index=True)
+
+
+def _sync_delta(key: str, current: dict, info: dict) -> pd.DataFrame | None:
+    wm_col = table_option(key, "watermark")
+    key_col = table_option(key, "upsert_key", "id")
+    frame = current["frame"]
+    wm_type = info["schema"].get(wm_col)
+    if not wm_col or wm_type not in _PARAM_TYPES or frame.empty or frame[wm_col].isna().all():
+        return None
+    # dedup por chave derivada: não dá para contar as chaves no BigQuery
+    if dedup_mode(key) != "off" and source_sql(key) == table_fqn(key):
+        return None
+    watermark = frame[wm_col].max()
+    if wm_type == "INTEGER":
+        value = int(watermark)
+    elif wm_type == "DATE":
+        value = pd.Timestamp(watermark).date()
+    else:
+        value = pd.Timestamp(watermark).to_pydatetime()
+    # ">=" torna o delta idempotente: linhas com o mesmo instante que
+    # chegaram depois da última leitura também entram (o upsert deduplica)
+    params = [bigquery.ScalarQueryParameter("wm", _PARAM_TYPES[wm_type], value)]
+    # delta cru (sem a subquery de dedup): o upsert já fica com a mais recente
+    delta = _fetch(key, current["columns"], f"{wm_col} >= @wm", params, latest=False)
+    delta = delta.sort_values(wm_col, ascending=False, kind="stable")
+    if dedup_mode(key) == "off":
+        # mesma semântica da carga completa: todas as linhas, sem colapsar chaves
+        merged = append_delta(frame, delta, wm_col, watermark)
+    else:
+        merged = upsert(frame, delta, key_col, wm_col, watermark)
+    # linhas apagadas ou tabela reescrita: o delta não enxerga, recarrega
+    # (linhas ainda no streaming buffer também caem aqui, por segurança)
+    if _verify_due(key, current, info):
+        expected = _expected_rows(key, info)
+        if expected is not None and len(merged) != expected:
+            return None
+    return merged
+
+
+def _needs_full(key: str, current: dict | None, info: dict) -> bool:
+    if current is None or sync_mode(key) != "incremental":
+        return True
+    # schema mudou (coluna nova/removida/tipo alterado) -> recarrega tudo
+    return current["schema"] != info["schema"]
+
+
+def _revalidate(key: str) -> None:
+    try:
+        _refresh(key)
+    except Exception:
+        # sem BigQuery: segue servindo o snapshot; a próxima sessão tenta de novo
+        pass
+    finally:
+        _store()["revalidating"].discard(key)
+
+
+def _revalidate_async(key: str) -> None:
+    store = _store()
+    if key in store["revalidating"]:
+        return
+    store["revalidating"].add(key)
+    # sem o contexto da sessão que disparou: ela pode acabar antes da thread
+    thread = threading.Thread(target=_revalidate, args=(key,), daemon=True, name=f"revalidate-{key}")
+    thread.start()
+
+
+def _valid_snapshot(key: str) -> dict | None:
+    snapshot = read_snapshot(key)
+    if snapshot is None:
+        return None
+    # snapshot de antes de uma mudança no registro (colunas/tipos/derivadas) não serve
+    planned = plan_columns(key, snapshot["schema"])[0]
+    if (snapshot["columns"], snapshot["types"]) != (planned, column_types(key, planned)):
+        return None
+    if not all(c in snapshot["frame"].columns for c in _computed(key)):
+        return None
+    snapshot["frame"] = _normalize(key, snapshot["frame"])
+    snapshot["index"] = {}
+    return snapshot
+
+
+def _last_good(key: str) -> dict | None:
+    # versão em memória ou snapshot local, sem ir ao BigQuery: fallback dos
+    # caminhos remotos (recorte filtrado, opções) quando o job não pode rodar
+    store = _store()
+    if key not in store["frames"]:
+        with store["locks"][key]:
+            if key not in store["frames"]:
+                snapshot = _valid_snapshot(key)
+                if snapshot is not None:
+                    store["frames"][key] = snapshot
+    return store["frames"].get(key)
+
+
+def _load(key: str) -> dict:
+    store = _store()
+    background = start_refresher()
+    if key not in store["frames"]:
+        with store["locks"][key]:
+            if key not in store["frames"]:
+                snapshot = _valid_snapshot(key)
+                if snapshot is not None:
+                    store["frames"][key] = snapshot
+                    _revalidate_async(key)
+        if key in store["frames"]:
+            return store["frames"][key]
+    elif background:
+        # stale-while-revalidate: quem mantém a versão em dia é o refresher
+        entry = store["frames"][key]
+        if entry["checked_at"] >= refresh_requested_at():
+            return entry
+    return _refresh(key)
+
+
+def _refresh(key: str) -> dict:
+    store = _store()
+    current = store["frames"].get(key)
+    try:
+        info = table_info(key)
+    except Exception:
+        # sondagem falhou (rede/permissão): serve a última versão, se houver
+        if current is not None:
+            return current
+        raise
+    _remember(key, info)
+    if current is not None and current["version"] == info["version"]:
+        current["checked_at"] = time.time()
+        return current
+    # sessões que pedem a mesma versão ao mesmo tempo dividem o download
+    return single_flight(key, ("load", info["version"]), lambda: _reload(key, info))
+
+
+def _reload(key: str, info: dict) -> dict:
+    store = _store()
+    with store["locks"][key]:
+        current = store["frames"].get(key)
+        if current is not None and current["version"] == info["version"]:
+            current["checked_at"] = time.time()
+            return current
+        try:
+            frame, syncs = None, 0
+            if not _needs_full(key, current, info):
+                frame = _sync_delta(key, current, info)
+                columns, roles = current["columns"], current["roles"]
+                syncs = 0 if _verify_due(key, current, info) else current.get("syncs", 0) + 1
+            if frame is None:
+                columns, roles = plan_columns(key, info["schema"])
+                syncs = 0
+                frame = _fetch_full(key, columns)
+        except Exception as exc:
+            # prazo/retentativas esgotados (analyzer/jobs.py) ou orçamento
+            # estourado com budget_action="snapshot": fica na última versão
+            # boa (em memória ou a do snapshot servido no restart)
+            refused = isinstance(exc, BudgetExceeded) and not serves_snapshot(exc)
+            if refused or current is None:
+                raise
+            current["checked_at"] = time.time()
+            return current
+        now = time.time()
+        entry = {
+            "version": info["version"], "schema": info["schema"],
+            "columns": columns, "roles": roles, "types": column_types(key, columns), "frame": frame,
+            "fetched_at": now, "checked_at": now, "index": {},
+            "num_rows": info.get("num_rows"), "syncs": syncs,
+        }
+        store["frames"][key] = entry
+        retire_version(key, info["version"])
+        write_snapshot_async(key, entry)
+        return entry
+
+
+def _remember(key: str, info: dict) -> dict:
+    known = {**info, "checked_at": time.time()}
+    _store()["info"][key] = known
+    return known
+
+
+def known_info(key: str) -> dict:
+    # versão/num_rows da última sondagem: com o refresher ligado a sessão lê
+    # o que ele mantém, sem esperar um get_table a cada rerun. Sonda aqui só
+    # sem refresher (table_info tem o próprio cache), na primeira vez ou
+    # depois de um "Atualizar agora"
+    known = _store()["info"].get(key)
+    if known is not None and start_refresher() and known["checked_at"] >= refresh_requested_at():
+        return known
+    return _remember(key, table_info(key))
+
+
+# ========= Refresher em segundo plano =========
+@st.cache_resource(show_spinner=False)
+def _refresher() -> dict:
+    return {"lock": threading.Lock(), "thread": None}
+
+
+def _refresh_all() -> None:
+    for key in TABLES:
+        try:
+            if key not in _store()["frames"]:
+                if filter_mode(key) == "remote":
+                    # acima de remote_filter_rows e nenhuma página carregou a tabela
+                    # inteira: só a versão (recortes/opções/KPIs seguem por ela)
+                    _remember(key, table_info(key))
+                    continue
+                _load(key)   # snapshot local antes do BigQuery, se houver
+            _refresh(key)
+        except Exception:
+            # sem BigQuery: as sessões seguem com a última versão completa
+            pass
+
+
+def _refresh_loop(interval: float) -> None:
+    # roda sem contexto de sessão (nada de st.* aqui além dos caches)
+    while True:
+        _refresh_all()
+        time.sleep(interval)
+
+
+def start_refresher() -> bool:
+    interval = setting("refresh_interval", REFRESH_INTERVAL)
+    if not interval:
+        return False
+    state = _refresher()
+    with state["lock"]:
+        if state["thread"] is None or not state["thread"].is_alive():
+            thread = threading.Thread(target=_refresh_loop, args=(interval,), daemon=True, name="analyzer-refresher")
+            thread.start()
+            state["thread"] = thread
+    return True
+
+
+def fetched_at(key: str) -> pd.Timestamp:
+    # quando a versão em cache foi baixada do BigQuery (agora, se a tabela
+    # não está no store — ex.: filtros no BigQuery)
+    entry = _store()["frames"].get(key)
+    if entry is None or not entry.get("fetched_at"):
+        return pd.Timestamp.now(tz=TZ)
+    return pd.Timestamp(entry["fetched_at"], unit="s", tz="UTC").tz_convert(TZ)
+
+
+def project(frame: pd.DataFrame, columns=None, aliases=None) -> pd.DataFrame:
+    if columns is None:
+        out = frame.copy(deep=False)
+    else:
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise KeyError(f"Colunas fora do registro da tabela: {missing}")
+        out = frame[list(columns)]
+    # papel -> coluna real, exposta com o nome do papel (sem cópia com CoW)
+    for role, column in (aliases or {}).items():
+        out[role] = frame[column]
+    return out
+
+
+def sort_rows(frame: pd.DataFrame, key: str) -> pd.DataFrame:
+    # "col [DESC], ..." do registro; colunas fora da projeção são ignoradas
+    by, ascending = [], []
+    for part in (TABLES[key].get("order_by") or "").split(","):
+        if not part.strip():
+            continue
+        column, *direction = part.split()
+        if column in frame.columns:
+            by.append(column)
+            ascending.append(not direction or direction[0].upper() != "DESC")
+    return frame.sort_values(by, ascending=ascending, kind="stable") if by else frame
+
+
+def load_table(key: str, columns=None, roles=()) -> pd.DataFrame:
+    entry = _load(key)
+    aliases = {role: entry["roles"][role] for role in roles if role in entry["roles"]}
+    return project(entry["frame"], columns, aliases)
+
+
+# ========= Várias tabelas por página =========
+@st.cache_resource(show_spinner=False)
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=setting("load_workers", LOAD_WORKERS), thread_name_prefix="load")
+
+
+def iter_tables(requests: dict):
+    # requests: nome -> key | (key, columns) | (key, columns, roles)
+    # os jobs vão juntos para o BigQuery; rende (nome, frame) na ordem em que terminam
+    # as threads do pool servem todas as sessões: nada de contexto de sessão
+    # nelas, só a página de quem pediu (orçamento/telemetria)
+    page = current_page()
+
+    def run(spec):
+        with on_behalf_of(page):
+            key, *rest = (spec,) if isinstance(spec, str) else spec
+            return load_table(key, *rest)
+
+    futures = {_pool().submit(run, spec): name for name, spec in requests.items()}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def load_tables(requests: dict) -> dict:
+    return dict(iter_tables(requests))
+
+
+# ========= Filtros: local x BigQuery =========
+# Até remote_filter_rows linhas a tabela inteira fica em cache e o filtro
+# é aplicado no frame; acima disso o estado de filtro vai para o BigQuery
+# como parâmetros e só o recorte é baixado (cache por versão + filtro).
+def filter_mode(key: str) -> str:
+    limit = table_option(key, "remote_filter_rows", setting("remote_filter_rows", REMOTE_FILTER_ROWS))
+    try:
+        num_rows = known_info(key).get("num_rows") or 0
+    except Exception:
+        return "local"
+    return "remote" if limit and num_rows > limit else "local"
+
+
+def _remote_roles(key: str, roles) -> dict:
+    resolved = resolve_roles(key, known_info(key)["schema"])
+    return {role: resolved[role] for role in roles if role in resolved}
+
+
+def _remote_filtered(key: str, version: str, columns: tuple, roles: tuple, filters: tuple, month_col: str) -> pd.DataFrame:
+    aliases = _remote_roles(key, roles)
+    # calculadas no loader não existem no BigQuery: baixa as colunas de origem e calcula aqui
+    computed = _computed(key)
+    derived = [c for c in columns if c in computed]
+    base = [c for c in columns if c not in computed]
+    sources = [c for d in derived for c in computed[d] if c not in base]
+    roles_only = [role for role in aliases if role not in columns]
+    select = base + list(dict.fromkeys(sources)) + [
+        f"{aliases[role]} AS {role}" if aliases[role] != role else role for role in roles_only
+    ]
+    conditions, params = where_sql(dict(filters), month_col, aliases)
+    where = " AND ".join(conditions) or None
+    sql = select_sql(key, where, select)
+
+    def fetch():
+        frame = fetch_dataframe(sql, fetch_mode(key), params, table=key, kind="filtered")
+        frame = _derive(_normalize(key, frame), [c for c in derived if c in _DERIVED])
+        return frame[list(columns) + roles_only]
+
+    frame = versioned(
+        key, version, "filtered", (sql, filters, tuple(columns)),
+        lambda: single_flight(key, ("filtered", version, sql, filters), fetch),
+    )
+    return frame.copy(deep=False)
+
+
+def _index_of(entry: dict, aliases: dict, month_col: str):
+    # nome do filtro -> índice da versão (analyzer/selection.py), montado no
+    # 1º uso e descartado junto com a versão; None = coluna fora do frame
+    frame, indexes = entry["frame"], entry["index"]
+
+    def index_of(name):
+        column = MONTH_KEY if name == MONTH_KEY else aliases.get(name, name)
+        if column != MONTH_KEY and column not in frame.columns:
+            return None
+        slot = (column, month_col) if column == MONTH_KEY else column
+        if slot not in indexes:
+            with _store()["index_lock"]:
+                if slot not in indexes:
+                    indexes[slot] = local_index(frame, column, month_col)
+        return indexes[slot]
+
+    return index_of
+
+
+def _fallback(key: str, exc: Exception) -> dict:
+    # job remoto que não rodou: a última versão boa, se o erro permitir e houver uma
+    entry = _last_good(key) if fallback_ok(exc) else None
+    if entry is None:
+        raise exc
+    return entry
+
+
+def load_filtered(key: str, columns, filters: dict, roles=(), month_col: str = MONTH_COL) -> pd.DataFrame:
+    filters = active(filters)
+    if filter_mode(key) == "remote":
+        state = tuple(sorted((name, tuple(values)) for name, values in filters.items()))
+        try:
+            return _remote_filtered(key, known_info(key)["version"], tuple(columns), tuple(roles), state, month_col)
+        except Exception as exc:
+            return _filter_entry(_fallback(key, exc), columns, filters, roles, month_col)
+    return _filter_entry(_load(key), columns, filters, roles, month_col)
+
+
+def _filter_entry(entry: dict, columns, filters: dict, roles, month_col: str) -> pd.DataFrame:
+    # índice e take na MESMA entrada: as posições só valem para essa versão
+    aliases = {role: entry["roles"][role] for role in roles if role in entry["roles"]}
+    rows = local_rows(_index_of(entry, aliases, month_col), filters)
+    # um take só, nas colunas pedidas (sem filtro: projeção sem cópia)
+    frame = project(entry["frame"], columns, aliases)
+    return frame if rows is None else frame.take(rows)
+
+
+def _remote_options(key: str, version: str, dims: tuple, roles: tuple, month_col: str) -> dict:
+    aliases = _remote_roles(key, roles)
+    present = [d for d in dims if d not in roles or d in aliases]
+    sql = options_sql(source_sql(key), present, month_col, aliases)
+    rows = versioned(
+        key, version, "options", sql,
+        lambda: single_flight(
+            key, ("options", version, sql),
+            lambda: [(row.dim, row.v) for row in query_rows(sql, table=key, kind="options")],
+        ),
+    )
+    options = options_from_rows(rows, present)
+    return {**{d: None for d in dims}, **options}
+
+
+def filter_options(key: str, dims, roles=(), month_col: str = MONTH_COL) -> dict:
+    # {"rows": n, <dim>: [valores ordenados], "meses": [pd.Period]}
+    entry = None
+    if filter_mode(key) == "remote":
+        try:
+            return _remote_options(key, known_info(key)["version"], tuple(dims), tuple(roles), month_col)
+        except Exception as exc:
+            entry = _fallback(key, exc)
+    entry = entry or _load(key)
+    aliases = {role: entry["roles"][role] for role in roles if role in entry["roles"]}
+    # papel sem coluna resolvida no schema -> None (a página esconde o filtro)
+    index_of = _index_of(entry, aliases, month_col)
+    return local_options(lambda dim: None if dim in roles and dim not in aliases else index_of(dim), dims, len(entry["frame"]))
@@ -0,0 +1,326 @@
+# ============================================================
+# Analyzer – backend local (DuckDB sobre Parquet), sem rede
+# ============================================================
+# Com backend = "duckdb" (secrets [analyzer] ou ANALYZER_BACKEND) o
+# get_client() devolve um LocalClient no lugar do bigquery.Client. Ele
+# implementa só o que a camada de dados usa — query(sql, job_config) e
+# get_table(id) — e responde as mesmas queries que as páginas emitem a
+# partir de um Parquet por tabela em local_dir:
+#   <local_dir>/membros_2026_s.parquet   (ou uma pasta membros_2026_s/*.parquet)
+# Loader, versões, KPIs, filtros, orçamento e telemetria rodam sem mudar.
+#
+# O SQL do BigQuery é traduzido para DuckDB em to_duckdb(): funções de
+# data (DATETIME_SUB/TRUNC/DIFF, DATE_DIFF, FORMAT_DATETIME, DATETIME(ts, tz),
+# SAFE.PARSE_DATETIME), REGEXP_CONTAINS, SAFE_CAST,
+# COUNTIF, CURRENT_DATE("tz"), IN UNNEST(@p) e parâmetros @nome. GREATEST
+# vira bq_greatest: no BigQuery basta um argumento NULL para o resultado
+# ser NULL; o greatest do DuckDB ignora os NULLs.
+#
+# Dados para rodar offline:
+#   python -m analyzer.local generate --rows 50000   # sintéticos
+#   python -m analyzer.local export                  # cópia do BigQuery (com credenciais)
+import argparse
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core import exceptions as api_exceptions
+from google.cloud.bigquery import SchemaField
+from google.cloud.bigquery.table import Row
+
+from analyzer.config import LOCAL_DIR, TABLES, TZ, setting
+
+_MACROS = (
+    "CREATE MACRO datetime_sub(a, i) AS a - i",
+    "CREATE MACRO datetime_trunc(a, part) AS date_trunc(part, a)",
+    "CREATE MACRO datetime_diff(a, b, part) AS date_diff(part, b, a)",
+    "CREATE MACRO bq_date_diff(a, b, part) AS date_diff(part, b, a)",
+    "CREATE MACRO bq_date(a) AS CAST(a AS DATE)",
+    "CREATE MACRO div(a, b) AS a // b",   # inteiro truncado, como o DIV do BigQuery
+    "CREATE MACRO format_datetime(f, a) AS strftime(a, f)",
+    "CREATE MACRO bq_greatest(a, b) AS CASE WHEN a IS NULL OR b IS NULL THEN NULL ELSE greatest(a, b) END",
+    "CREATE MACRO bq_datetime(a, tz) AS timezone(tz, a)",          # TIMESTAMP (instante) -> hora local
+    "CREATE MACRO bq_parse_datetime(f, s) AS try_strptime(s, f)",
+)
+_PARTS = r"MICROSECOND|MILLISECOND|SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|QUARTER|YEAR"
+_TABLE_REF = re.compile(r"`(?:[^`]*\.)?([^`.]+)`")
+
+_FIELD_TYPES = (
+    (pa.types.is_string, "STRING"), (pa.types.is_large_string, "STRING"), (pa.types.is_integer, "INTEGER"),
+    (pa.types.is_floating, "FLOAT"), (pa.types.is_boolean, "BOOLEAN"), (pa.types.is_date, "DATE"),
+    (pa.types.is_decimal, "NUMERIC"),
+)
+
+
+def local_dir() -> Path:
+    path = Path(setting("local_dir", LOCAL_DIR))
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / path
+    return path
+
+
+def to_duckdb(sql: str) -> str:
+    sql = _TABLE_REF.sub(r'"\1"', sql)
+    sql = re.sub(r'CURRENT_DATE\("([^"]+)"\)', r"CAST(timezone('\1', now()) AS DATE)", sql)
+    sql = re.sub(r"\bSAFE_CAST\(", "TRY_CAST(", sql)
+    sql = re.sub(r"\bCOUNTIF\(", "count_if(", sql)
+    sql = re.sub(rf",\s*({_PARTS})\)", lambda m: f", '{m.group(1).lower()}')", sql)
+    sql = re.sub(r"\bDATE_DIFF\(", "bq_date_diff(", sql)
+    sql = re.sub(r"\bDATE\(", "bq_date(", sql)
+    sql = re.sub(r"\bGREATEST\(", "bq_greatest(", sql)
+    # TIMESTAMP do BigQuery é um instante (com fuso): TIMESTAMPTZ no DuckDB
+    sql = re.sub(r"\bAS TIMESTAMP\)", "AS TIMESTAMPTZ)", sql)
+    sql = re.sub(r"\bDATETIME\(", "bq_datetime(", sql)
+    sql = re.sub(r"\bSAFE\.PARSE_DATETIME\(", "bq_parse_datetime(", sql)
+    sql = re.sub(r"\bREGEXP_CONTAINS\(", "regexp_matches(", sql)
+    sql = re.sub(r"IN UNNEST\(@(\w+)\)", r"IN (SELECT UNNEST($\1))", sql)
+    return re.sub(r"@(\w+)", r"$\1", sql)
+
+
+def _params(job_config, sql: str) -> dict:
+    # o DuckDB recusa parâmetro que a query não usa
+    used = set(re.findall(r"\$(\w+)", sql))
+    params = {}
+    for param in getattr(job_config, "query_parameters", None) or []:
+        if param.name in used:
+            params[param.name] = list(param.values) if hasattr(param, "values") else param.value
+    return params
+
+
+def _field_type(arrow_type) -> str:
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP" if arrow_type.tz else "DATETIME"
+    return next((name for check, name in _FIELD_TYPES if check(arrow_type)), "STRING")
+
+
+class LocalRows:
+    # o que a camada de dados usa do RowIterator: iteração, to_dataframe, to_arrow
+    def __init__(self, table: pa.Table):
+        self._table = table
+        self.total_rows = table.num_rows
+
+    def __iter__(self):
+        index = {name: i for i, name in enumerate(self._table.column_names)}
+        for record in self._table.to_pylist():
+            yield Row(tuple(record.values()), index)
+
+    def to_dataframe(self, create_bqstorage_client=False, **kwargs) -> pd.DataFrame:
+        # mesmos dtypes do REST para inteiros e booleanos com NULL
+        mapping = {pa.int64(): pd.Int64Dtype(), pa.int32(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+        return self._table.to_pandas(types_mapper=mapping.get)
+
+    def to_arrow(self, bqstorage_client=None, **kwargs) -> pa.Table:
+        return self._table
+
+
+class LocalJob:
+    def __init__(self, table: pa.Table | None, scanned: int, created: datetime):
+        self.job_id = f"local_{uuid.uuid4().hex}"
+        self.cache_hit = False
+        self.total_bytes_processed = self.total_bytes_billed = scanned
+        self.slot_millis = 0
+        self.created = self.started = created
+        self.ended = datetime.now(timezone.utc)
+        self._table = table
+
+    def done(self, *args, **kwargs) -> bool:
+        return True
+
+    def result(self, *args, **kwargs) -> LocalRows:
+        return LocalRows(self._table if self._table is not None else pa.table({}))
+
+    def cancel(self, *args, **kwargs) -> bool:
+        return False
+
+
+class LocalClient:
+    def __init__(self, base: Path):
+        import duckdb   # só o modo offline precisa do DuckDB
+
+        self.base = base
+        self._duckdb = duckdb
+        self._con = duckdb.connect()
+        for macro in _MACROS:
+            self._con.execute(macro)
+        self._views = set()
+        self._lock = threading.Lock()
+
+    def _files(self, table: str) -> list:
+        folder = self.base / table
+        if folder.is_dir():
+            return sorted(folder.glob("*.parquet"))
+        path = self.base / f"{table}.parquet"
+        return [path] if path.exists() else []
+
+    def _view(self, table: str) -> None:
+        with self._lock:
+            if table in self._views:
+                return
+            files = self._files(table)
+            if not files:
+                raise api_exceptions.NotFound(f"Not found: Table {table} (sem Parquet em {self.base})")
+            paths = ", ".join(f"'{f.as_posix()}'" for f in files)
+            self._con.execute(f'CREATE OR REPLACE VIEW "{table}" AS SELECT * FROM read_parquet([{paths}])')
+            self._views.add(table)
+
+    def _scanned(self, sql: str, tables: list) -> int:
+        # bytes "processados": colunas citadas no SQL (todas com SELECT *),
+        # pelo tamanho descomprimido no Parquet — a mesma conta do BigQuery
+        words = set(re.findall(r"\w+", sql))
+        total = 0
+        for table in tables:
+            for path in self._files(table):
+                meta = pq.ParquetFile(path).metadata
+                for g in range(meta.num_row_groups):
+                    group = meta.row_group(g)
+                    for c in range(group.num_columns):
+                        column = group.column(c)
+                        if "*" in sql or column.path_in_schema.split(".")[0] in words:
+                            total += column.total_uncompressed_size
+        return total
+
+    def query(self, sql: str, job_config=None, **kwargs) -> LocalJob:
+        created = datetime.now(timezone.utc)
+        tables = sorted(set(_TABLE_REF.findall(sql)))
+        for table in tables:
+            self._view(table)
+        scanned = self._scanned(sql, tables)
+        if getattr(job_config, "dry_run", False):
+            return LocalJob(None, scanned, created)
+        duck_sql = to_duckdb(sql)
+        try:
+            # cursor por query: a conexão do DuckDB não é compartilhável entre threads
+            cursor = self._con.cursor().execute(duck_sql, _params(job_config, duck_sql))
+            # to_arrow_table nas versões novas (fetch_arrow_table ficou obsoleto na 1.5)
+            table = cursor.to_arrow_table() if hasattr(cursor, "to_arrow_table") else cursor.fetch_arrow_table()
+        except self._duckdb.Error as exc:
+            raise api_exceptions.BadRequest(f"{exc}\n{duck_sql}") from exc
+        return LocalJob(table, scanned, created)
+
+    def get_table(self, table_ref) -> SimpleNamespace:
+        table = str(table_ref).split(".")[-1]
+        files = self._files(table)
+        if not files:
+            raise api_exceptions.NotFound(f"Not found: Table {table_ref} (sem Parquet em {self.base})")
+        schema = pq.read_schema(files[0])
+        return SimpleNamespace(
+            table_id=table,
+            modified=datetime.fromtimestamp(max(f.stat().st_mtime for f in files), timezone.utc),
+            num_rows=sum(pq.ParquetFile(f).metadata.num_rows for f in files),
+            schema=[SchemaField(field.name, _field_type(field.type)) for field in schema],
+        )
+
+
+# ========= Dados para o modo offline =========
+def _write(frame: pd.DataFrame, key: str, base: Path) -> Path:
+    base.mkdir(parents=True, exist_ok=True)
+    path = base / f"{TABLES[key]['table']}.parquet"
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp)
+    tmp.replace(path)
+    return path
+
+
+def synthetic_frame(key: str, rows: int, seed: int = 0) -> pd.DataFrame:
+    # mesmo formato das tabelas de origem: datas como texto com sentinelas
+    # ("", "nan", NULL), ingestões repetidas por id e ingestion_time TIMESTAMP
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now(tz=TZ).tz_localize(None).normalize()
+    if key in ("metas", "metas_aldeia"):
+        days = pd.date_range(today - pd.Timedelta(days=rows - 1), today + pd.Timedelta(days=30), freq="D")
+        done = rng.integers(0, 40, len(days)).cumsum()
+        return pd.DataFrame({"Data": days.date, "FinalizadoAcumulado": done, "MetaAcumulado": (np.arange(len(days)) + 1) * 20})
+
+    def dates(p_null: float) -> np.ndarray:
+        values = (today - pd.to_timedelta(rng.integers(-45, 240, rows), unit="D")).strftime("%Y-%m-%d %H:%M:%S").to_numpy(object)
+        blank = rng.random(rows) < p_null
+        values[blank] = rng.choice(np.array(["", "nan", None], dtype=object), blank.sum())
+        return values
+
+    def pick(options, p=None):
+        return rng.choice(np.array(options, dtype=object), rows, p=p)
+
+    ingestion = pd.Timestamp("2026-01-01", tz="UTC") + pd.to_timedelta(np.sort(rng.integers(0, 200 * 86400, rows)), unit="s")
+    turmas = [f"T{i}" for i in range(1, 13)] + [" T3 ", None]
+    if key == "presenciais":
+        return pd.DataFrame({
+            "nome": [f"Pessoa {i}" for i in range(rows)],
+            "email": [f"p{i % max(rows * 9 // 10, 1)}@exemplo.com" for i in range(rows)],
+            "telefone": pick(["(11) 90000-0000", "21 98888-1111", "", None]),
+            "dias_na_aldeia": rng.integers(0, 120, rows),
+            "data_primeiro_contato": dates(0.05),
+            "turma": pick(turmas),
+            "conta_titular": pick(["SIM", "NÃO", None]),
+            "validacao_titular": pick(["OK", "PENDENTE", "", None]),
+            "mt5_titular": pick(["SIM", "NÃO", ""]),
+            "nome_adicional": pick(["Fulano", "", None]),
+            "finalizacao_1_etapa": dates(0.6),
+            "cancelamento": dates(0.95),
+            "broker": pick(["B1", "B2", "B3", None]),
+            "ingestion_time": ingestion,
+        })
+    # ids sorteados com reposição: boa parte com mais de uma ingestão (dedup)
+    ids = rng.integers(0, max(rows * 9 // 10, 1), rows)
+    frame = pd.DataFrame({
+        "id": [f"{key[0]}{i}" for i in ids],
+        "turma": pick(turmas),
+        "titularidade": pick(["Titular", "Adicional", "Beneficiário", None]),
+        "email": np.where(rng.random(rows) < 0.08, pick(["", "nan", None]), [f"u{i}@exemplo.com" for i in ids]),
+        "data_primeiro_contato": dates(0.05),
+        "target_sup": dates(0.15),
+        "finalizacao_primeira": dates(0.5),
+        "finalizado_final": dates(0.7),
+        "status_atraso": pick(["ok", "atrasado", "", None]),
+        "updated_at": ingestion,
+        "ingestion_time": ingestion,
+    })
+    if key == "membros":
+        frame["gestor"] = pick(["Ana", "Bruno", "Carla", " Diego", "#REF!", "", None])
+        frame["late_sup_atraso"] = pick(["0", "1"])
+    else:
+        frame["broker"] = pick(["B1", "B2", "B3", "B4", None])
+    return frame
+
+
+def generate(rows: int, base: Path, seed: int = 0) -> None:
+    for i, key in enumerate(TABLES):
+        n = 120 if key in ("metas", "metas_aldeia") else rows
+        print(_write(synthetic_frame(key, n, seed + i), key, base))
+
+
+def export(base: Path) -> None:
+    # cópia fiel do BigQuery (precisa das credenciais), tabela inteira
+    from analyzer.client import bigquery_client
+    from analyzer.config import table_fqn
+
+    for key in TABLES:
+        t0 = time.perf_counter()
+        frame = bigquery_client().query(f"SELECT * FROM {table_fqn(key)}").result().to_dataframe(create_bqstorage_client=False)
+        print(_write(frame, key, base), len(frame), f"{time.perf_counter() - t0:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["generate", "export"])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default=None, help=f"padrão: local_dir ({LOCAL_DIR})")
+    args = parser.parse_args()
+
+    base = Path(args.dir) if args.dir else local_dir()
+    if args.command == "generate":
+        generate(args.rows, base, args.seed)
+    else:
+        export(base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# ============================================================
+# Analyzer – planejamento de colunas pelo schema da tabela
+# ============================================================
+# "columns" do registro são obrigatórias. "roles" são colunas cujo nome
+# varia entre bases (ex.: equipe/broker/corretora): cada papel é
+# resolvido contra o schema (metadado do get_table) uma vez por versão,
+# pegando o primeiro candidato existente. Só as colunas resolvidas entram
+# no SELECT — nada de SELECT * para descobrir coluna depois.
+from analyzer.config import TABLES
+
+
+def resolve_roles(key: str, schema: dict) -> dict:
+    by_lower = {name.lower(): name for name in schema}
+    roles = {}
+    for role, candidates in TABLES[key].get("roles", {}).items():
+        found = next((by_lower[c.lower()] for c in candidates if c.lower() in by_lower), None)
+        if found:
+            roles[role] = found
+    return roles
+
+
+def plan_columns(key: str, schema: dict) -> tuple[list, dict]:
+    columns = list(TABLES[key]["columns"])
+    roles = resolve_roles(key, schema)
+    columns += [c for c in dict.fromkeys(roles.values()) if c not in columns]
+    return columns, roles
+
+
+def column_types(key: str, columns) -> dict:
+    # tipos aplicados no SELECT (entram na chave de validade do snapshot)
+    types = TABLES[key].get("types", {})
+    return {c: types[c] for c in columns if c in types}
@@ -0,0 +1,153 @@
+# ============================================================
+# Analyzer – pré-aquecimento (todas as tabelas + estado padrão)
+# ============================================================
+# Depois de um restart o primeiro visitante pagaria a carga de cada tabela,
+# página por página. prewarm() carrega em paralelo as tabelas do registro
+# e calcula o que as páginas pedem no estado padrão, sem filtros: opções
+# dos filtros e as entradas dos KPIs — o frame de que os cards saem
+# (load_filtered com as colunas da página) e, nas tabelas com kpi_pushdown
+# ligado, as contagens no BigQuery. As chamadas são as mesmas das páginas,
+# então caem nos mesmos caches. Tabela em filter_mode "remote" (acima de
+# remote_filter_rows) não é baixada inteira: as páginas só pedem recortes.
+#
+# O Streamlit não tem gancho de "servidor pronto". Para subir já quente, o
+# comando de start roda o aquecimento antes do servidor (grava os
+# snapshots locais, que o servidor serve no 1º acesso; ver .devcontainer):
+#   python -m analyzer.prewarm; streamlit run main.py
+# Sai com código 1 se alguma etapa falhou. Dentro do servidor,
+# start_prewarm() (chamado pelas páginas; uma vez por processo, em segundo
+# plano, sem contexto de sessão) aquece os caches em memória. Nada espera
+# por ele: prewarm_status()["ready"] e prewarm_caption() (barra lateral)
+# só informam o progresso.
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+from analyzer.config import LOAD_WORKERS, PREWARM, TABLES, setting
+from analyzer.kpis import kpi_pushdown, pushdown_counts
+from analyzer.loader import filter_mode, filter_options, load_filtered, load_table
+from analyzer.snapshots import flush_snapshots
+
+# estado padrão das páginas (mesmos argumentos das chamadas nelas)
+DEFAULT_OPTIONS = {
+    "membros": (["gestor", "turma"], ()),          # main.py
+    "aldeia": (["broker", "turma"], ["broker"]),   # analyzer-aldeia.py
+}
+# frame dos cards no estado padrão: load_filtered sem filtro, com as
+# COLUMNS da página (tests/test_prewarm.py confere contra as páginas)
+DEFAULT_FRAMES = {
+    "membros": ([   # main.py
+        "id", "gestor", "turma", "tipo_titularidade", "email_ok", "gestor_ok",
+        "dia_primeiro_contato", "target_sup", "finalizacao_primeira", "finalizado_final",
+    ], ()),
+    "aldeia": ([    # analyzer-aldeia.py
+        "id", "turma", "tipo_titularidade", "email_ok", "status_atraso",
+        "dia_primeiro_contato", "target_sup", "finalizacao_primeira", "finalizado_final",
+    ], ["broker"]),
+}
+# contagens no BigQuery: só com kpi_pushdown ligado na tabela (desligado por padrão)
+DEFAULT_KPIS = {"membros": ["funil", "geral", "atrasos"]}   # main, Analise, Atrasados
+
+
+def _steps() -> dict:
+    steps = {f"tabela:{key}": (load_table, key) for key in TABLES if filter_mode(key) == "local"}
+    for key, (dims, roles) in DEFAULT_OPTIONS.items():
+        steps[f"opções:{key}"] = (filter_options, key, dims, roles)
+    for key, (columns, roles) in DEFAULT_FRAMES.items():
+        steps[f"kpis:{key}"] = (load_filtered, key, columns, {}, roles)
+    for key, kpi_sets in DEFAULT_KPIS.items():
+        if kpi_pushdown(key):
+            for kpi_set in kpi_sets:
+                steps[f"kpis:{key}:{kpi_set}"] = (pushdown_counts, key, kpi_set)
+    return steps
+
+
+@st.cache_resource(show_spinner=False)
+def _state() -> dict:
+    return {"lock": threading.Lock(), "thread": None, "steps": {}, "errors": {}, "started_at": None, "finished_at": None}
+
+
+def prewarm() -> dict:
+    # roda todas as etapas (em paralelo) e devolve o status final; opções
+    # e KPIs pedem a tabela/versão que as etapas de tabela estão baixando
+    # e o single-flight junta os pedidos
+    state = _state()
+    with state["lock"]:
+        state.update(steps={}, errors={}, started_at=time.time(), finished_at=None)
+    steps = _steps()
+    with state["lock"]:
+        state["steps"] = {name: "pendente" for name in steps}
+    with ThreadPoolExecutor(max_workers=setting("load_workers", LOAD_WORKERS), thread_name_prefix="prewarm") as pool:
+        futures = {pool.submit(*call): name for name, call in steps.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                result = "ok"
+            except Exception as exc:
+                result = "erro"
+                with state["lock"]:
+                    state["errors"][name] = f"{type(exc).__name__}: {exc}"
+            with state["lock"]:
+                state["steps"][name] = result
+    with state["lock"]:
+        state["finished_at"] = time.time()
+    return prewarm_status()
+
+
+def start_prewarm() -> bool:
+    # idempotente: só a primeira chamada do processo dispara a thread (sem o
+    # contexto da sessão que chamou: ela pode acabar antes do aquecimento)
+    if not setting("prewarm", PREWARM):
+        return False
+    state = _state()
+    with state["lock"]:
+        if state["thread"] is None:
+            thread = threading.Thread(target=prewarm, daemon=True, name="analyzer-prewarm")
+            thread.start()
+            state["thread"] = thread
+    return True
+
+
+def prewarm_status() -> dict:
+    # {"ready", "done", "total", "steps": {etapa: "pendente"|"ok"|"erro"}, "errors", ...}
+    state = _state()
+    with state["lock"]:
+        steps = dict(state["steps"])
+        return {
+            "ready": state["finished_at"] is not None,
+            "done": sum(result != "pendente" for result in steps.values()),
+            "total": len(steps),
+            "steps": steps,
+            "errors": dict(state["errors"]),
+            "started_at": state["started_at"],
+            "finished_at": state["finished_at"],
+        }
+
+
+def prewarm_caption() -> str | None:
+    # linha da barra lateral (None = pré-aquecimento desligado)
+    if not setting("prewarm", PREWARM):
+        return None
+    status = prewarm_status()
+    if status["ready"] and status["errors"]:
+        return f"⚠️ Pré-aquecimento: {len(status['errors'])} de {status['total']} etapas com erro"
+    if status["ready"]:
+        return f"🔥 Cache aquecido ({status['total']} etapas)"
+    return f"⏳ Pré-aquecendo: {status['done']}/{status['total'] or '…'} etapas"
+
+
+def main() -> int:
+    status = prewarm()
+    flush_snapshots()
+    for name, result in status["steps"].items():
+        print(f"{name:<24} {result}" + (f"  {status['errors'][name]}" if name in status["errors"] else ""))
+    print(f"{status['done']}/{status['total']} etapas em {status['finished_at'] - status['started_at']:.1f}s")
+    return 1 if status["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# ============================================================
+# Analyzer – execução de queries
+# ============================================================
+# Todo job da camada de dados passa por aqui (fetch_dataframe/query_rows):
+# antes, pelo orçamento da página (analyzer/budget.py); depois, deixa seu
+# registro de custo e latência em analyzer/telemetry.py. A espera do job
+# (prazo, retentativas, hedge) fica em analyzer/jobs.py.
+import time
+
+import pandas as pd
+from google.cloud import bigquery
+
+from analyzer.budget import check_budget
+from analyzer.client import get_bqstorage_client
+from analyzer.flight import job_started
+from analyzer.jobs import bounded, job_policy, run_job
+from analyzer.telemetry import record_job
+
+
+def _to_frame_rest(rows) -> pd.DataFrame:
+    return rows.to_dataframe(create_bqstorage_client=False)
+
+
+def _to_frame_arrow(rows, bqstorage) -> pd.DataFrame:
+    # Storage Read API -> record batches Arrow -> DataFrame com dtypes Arrow
+    if bqstorage is None:
+        return _to_frame_rest(rows)
+    try:
+        table = rows.to_arrow(bqstorage_client=bqstorage)
+    except Exception:
+        # sem permissão de readsession / API desabilitada no projeto
+        return _to_frame_rest(rows)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _run(sql: str, params, table: str | None, kind: str):
+    guard = check_budget(sql, params, table, kind)
+    job_config = bigquery.QueryJobConfig(query_parameters=params) if params else None
+    # espera com prazo/retentativa/hedge: fila + execução ficam fora do tempo de download;
+    # o mesmo prazo segue para o download (bounded)
+    policy = job_policy(table, kind)
+    deadline = time.monotonic() + policy["deadline"]
+    job, rows, wait = run_job(sql, job_config, table, kind, policy=policy, deadline=deadline)
+    job_started()
+    return job, rows, deadline, {**guard, **wait}
+
+
+def fetch_dataframe(sql: str, mode: str = "rest", params=None, table: str | None = None, kind: str = "query") -> pd.DataFrame:
+    job, rows, deadline, extra = _run(sql, params, table, kind)
+    t0 = time.perf_counter()
+    if mode == "arrow":
+        bqstorage = get_bqstorage_client()
+        frame = bounded(lambda: _to_frame_arrow(rows, bqstorage), deadline)
+    else:
+        frame = bounded(lambda: _to_frame_rest(rows), deadline)
+    record_job(job, table, kind, len(frame), time.perf_counter() - t0, extra)
+    return frame
+
+
+def query_rows(sql: str, params=None, table: str | None = None, kind: str = "query") -> list:
+    # queries pequenas (contagens, opções, KPIs): linhas do REST, sem DataFrame
+    job, rows, deadline, extra = _run(sql, params, table, kind)
+    t0 = time.perf_counter()
+    out = bounded(lambda: list(rows), deadline)
+    record_job(job, table, kind, len(out), time.perf_counter() - t0, extra)
+    return out
@@ -0,0 +1,74 @@
+# ============================================================
+# Analyzer – índice de filtros: código -> linhas, por versão
+# ============================================================
+# Cada mudança de filtro refazia uma máscara booleana do tamanho da tabela
+# por dimensão (isin + &=) e copiava o frame. Aqui cada dimensão de filtro
+# ganha, uma vez por versão da tabela, um índice invertido:
+#   codes   -> código do rótulo em cada linha (-1 = NULL)
+#   order   -> posições das linhas agrupadas por código (crescentes dentro
+#              de cada código); offsets diz onde cada código começa
+# Uma seleção de filtros é OR dentro da dimensão (concatena as fatias dos
+# códigos escolhidos) e AND entre dimensões: parte da dimensão mais
+# seletiva (tamanhos saem dos offsets, sem varrer nada) e as demais só
+# conferem o código nas linhas que sobraram. O resultado são posições de
+# linha; quem chama decide quais colunas tirar delas (um take só).
+#
+# Comparação com as máscaras: python benchmarks/bench_selection.py
+import numpy as np
+import pandas as pd
+
+
+def build(values: pd.Series, label=str) -> dict:
+    # label: valor distinto -> texto com que a página filtra
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    # valores distintos com o mesmo rótulo viram um código só; rótulos em ordem
+    names, merged = np.unique(np.array([label(u) for u in uniques], dtype=object), return_inverse=True)
+    lookup = np.append(merged, -1).astype(np.int32)
+    codes = lookup[codes]
+    counts = np.bincount(codes + 1, minlength=len(names) + 1)
+    return {
+        "labels": {name: i for i, name in enumerate(names.tolist())},
+        "codes": codes,
+        "order": np.argsort(codes, kind="stable").astype(np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]),
+    }
+
+
+def _rows(index: dict, code: int) -> np.ndarray:
+    # posição 0 dos offsets é o NULL (código -1)
+    return index["order"][index["offsets"][code + 1]:index["offsets"][code + 2]]
+
+
+def select(parts) -> np.ndarray | None:
+    # parts: [(índice, valores escolhidos)]; devolve posições crescentes
+    # (None = nenhum filtro, todas as linhas)
+    if not parts:
+        return None
+    chosen = []
+    for index, values in parts:
+        codes = sorted({index["labels"][v] for v in map(str, values) if v in index["labels"]})
+        size = sum(len(_rows(index, c)) for c in codes)
+        chosen.append((size, index, codes))
+    chosen.sort(key=lambda item: item[0])
+    _, index, codes = chosen[0]
+    if not codes:
+        return np.empty(0, dtype=np.int32)
+    rows = np.concatenate([_rows(index, c) for c in codes])
+    if len(codes) > 1:
+        rows.sort()
+    for _, index, codes in chosen[1:]:
+        if not len(rows):
+            break
+        keep = np.zeros(len(index["labels"]) + 1, dtype=bool)
+        keep[np.array(codes, dtype=np.int64) + 1] = True
+        rows = rows[keep[index["codes"][rows] + 1]]
+    return rows
+
+
+def present(index: dict) -> list:
+    # rótulos com ao menos uma linha, ordenados
+    sizes = np.diff(index["offsets"])[1:]
+    return [name for name, code in index["labels"].items() if sizes[code]]
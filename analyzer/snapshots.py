@@ -0,0 +1,92 @@
+# ============================================================
+# Analyzer – snapshots locais das tabelas (restart quente)
+# ============================================================
+# Cada versão carregada é gravada como Arrow IPC (um arquivo por tabela)
+# em SNAPSHOT_DIR; versão, schema, colunas, papéis e tipos vão nos
+# metadados do próprio arquivo, então a troca é atômica (tmp +
+# os.replace). Depois de um deploy/restart o loader abre o snapshot via
+# memory-map e já serve as páginas, enquanto revalida contra o BigQuery
+# em segundo plano — com sync incremental, só o delta desde o snapshot é
+# baixado.
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from analyzer.config import SNAPSHOT_DIR, fetch_mode, setting
+
+_META_KEY = b"analyzer"
+
+
+def snapshot_dir() -> Path | None:
+    path = setting("snapshot_dir", SNAPSHOT_DIR)
+    if not path:
+        return None
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / path
+    return path
+
+
+def _path(key: str) -> Path | None:
+    base = snapshot_dir()
+    return base / f"{key}.arrow" if base else None
+
+
+def write_snapshot(key: str, entry: dict) -> None:
+    path = _path(key)
+    if path is None:
+        return
+    try:
+        table = pa.Table.from_pandas(entry["frame"], preserve_index=False)
+        meta = {
+            "version": entry["version"], "schema": entry["schema"],
+            "columns": entry["columns"], "roles": entry["roles"], "types": entry.get("types", {}),
+            "fetched_at": entry.get("fetched_at"), "saved_at": time.time(),
+        }
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    except Exception:
+        # snapshot é só aceleração: falha de disco/conversão não afeta as páginas
+        pass
+
+
+def write_snapshot_async(key: str, entry: dict) -> None:
+    threading.Thread(target=write_snapshot, args=(key, entry), daemon=True, name=f"snapshot-{key}").start()
+
+
+def flush_snapshots(timeout: float | None = None) -> None:
+    # espera as gravações em andamento (processo que vai sair logo depois)
+    for thread in threading.enumerate():
+        if thread.name.startswith("snapshot-"):
+            thread.join(timeout)
+
+
+def read_snapshot(key: str) -> dict | None:
+    path = _path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        # o mapeamento fica aberto enquanto houver buffers apontando para ele
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        meta = json.loads(table.schema.metadata[_META_KEY])
+        if fetch_mode(key) == "arrow":
+            frame = table.to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            frame = table.to_pandas()
+    except Exception:
+        return None
+    return {
+        "version": meta["version"], "schema": meta["schema"],
+        "columns": meta["columns"], "roles": meta["roles"], "types": meta.get("types", {}), "frame": frame,
+        "saved_at": meta["saved_at"], "from_snapshot": True,
+        "fetched_at": meta.get("fetched_at") or meta["saved_at"], "checked_at": meta["saved_at"],
+    }
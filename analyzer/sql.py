@@ -0,0 +1,65 @@
+# ============================================================
+# Analyzer – montagem do SQL das tabelas registradas
+# ============================================================
+from analyzer.config import TABLES, TZ, dedup_mode, table_fqn, table_option
+
+# Texto de data -> DATETIME, aceitando o que o pd.to_datetime(...,
+# errors="coerce") das páginas aceitava nas bases: o formato canônico
+# (aaaa-mm-dd[ hh:mm:ss], com "T" ou não), dd/mm/aaaa [hh:mm[:ss]] (dia
+# primeiro, como nas planilhas de origem) e ISO com Z/offset, convertido
+# para o horário de TZ. O resto vira NULL. Sem barra invertida nas regex:
+# o mesmo literal vale no BigQuery e no DuckDB (analyzer/local.py).
+_DAY_FIRST = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+_OFFSET = "[0-9]:[0-9]{2}(:[0-9]{2}([.][0-9]+)?)?[ ]*(Z|z|[+-][0-9]{2}(:?[0-9]{2})?)$"
+
+
+def _latest_sql(key: str) -> str:
+    # uma linha por upsert_key: a de maior watermark; chave nula não casa
+    # com nada e fica (mesma regra do upsert). O BigQuery só aceita QUALIFY
+    # junto de WHERE/GROUP BY/HAVING, daí o "WHERE TRUE".
+    key_col, wm_col = table_option(key, "upsert_key", "id"), table_option(key, "watermark")
+    where = TABLES[key].get("where") or "TRUE"
+    return (
+        f"(\n  SELECT * FROM {table_fqn(key)}\n  WHERE {where}\n"
+        f"  QUALIFY {key_col} IS NULL OR ROW_NUMBER() OVER (PARTITION BY {key_col} ORDER BY {wm_col} DESC) = 1\n)"
+    )
+
+
+def source_sql(key: str, latest: bool = True) -> str:
+    # FROM da tabela: com dedup ligado, a subquery já deduplicada (para
+    # filtros/contagens no BigQuery, que precisam deduplicar ANTES do WHERE)
+    if latest and dedup_mode(key) != "off" and table_option(key, "upsert_key", "id") not in TABLES[key].get("derived", []):
+        return _latest_sql(key)
+    return table_fqn(key)
+
+
+def datetime_sql(column: str) -> str:
+    text = f"TRIM(CAST({column} AS STRING))"
+    parsed = [f"SAFE_CAST({text} AS DATETIME)"] + [f"SAFE.PARSE_DATETIME('{f}', {text})" for f in _DAY_FIRST]
+    return (
+        f"CASE WHEN REGEXP_CONTAINS({text}, '{_OFFSET}') "
+        f"THEN DATETIME(SAFE_CAST({text} AS TIMESTAMP), '{TZ}') "
+        f"ELSE COALESCE({', '.join(parsed)}) END"
+    )
+
+
+def column_sql(key: str, column: str) -> str:
+    # coluna tipada no registro: o que não converte vira NULL (mesma regra
+    # do pd.to_datetime(..., errors="coerce")); datas passam por datetime_sql
+    target = TABLES[key].get("types", {}).get(column)
+    if target == "DATETIME":
+        return f"{datetime_sql(column)} AS {column}"
+    return f"SAFE_CAST({column} AS {target}) AS {column}" if target else column
+
+
+def select_sql(key: str, where: str | None = None, columns=None, latest: bool = True) -> str:
+    spec = TABLES[key]
+    cols = ",\n  ".join(column_sql(key, c) for c in columns or spec["columns"])
+    source = source_sql(key, latest)
+    sql = f"SELECT\n  {cols}\nFROM {source}"
+    # na subquery deduplicada o "where" do registro já foi aplicado
+    conditions = [c for c in (spec.get("where") if source == table_fqn(key) else None, where) if c]
+    if conditions:
+        sql += "\nWHERE " + " AND ".join(f"({c})" if len(conditions) > 1 else c for c in conditions)
+    # sem ORDER BY: a ordem só importa na exibição (loader.sort_rows)
+    return sql
@@ -0,0 +1,196 @@
+# ============================================================
+# Analyzer – telemetria dos jobs do BigQuery
+# ============================================================
+# Cada job disparado pela camada de dados (analyzer/query.py) vira um
+# registro: bytes processados/cobrados, slot-ms, acerto no cache de
+# resultados do BigQuery, tempo na fila e em execução, linhas devolvidas e
+# o tempo de download + desserialização no cliente. O registro leva a
+# página que pediu (ou "refresher"/"prewarm"/"revalidate" quando foi uma
+# thread de fundo), a tabela e o tipo do job ("full", "delta", "kpis"...),
+# além da estimativa do dry-run e do veredito do orçamento (budget.py);
+# job barrado pelo orçamento vira um registro com refused=True. A espera
+# total (wait_s), as tentativas e o hedge vêm de analyzer/jobs.py.
+#
+# Os registros vão (uma linha JSON cada) para telemetry_log e ficam em
+# memória pela janela telemetry_window, de onde job_stats() tira os
+# agregados por página/tabela. Para o log inteiro:
+#   python -m analyzer.telemetry --since 24 --by page,table
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from analyzer.config import TELEMETRY_LOG, TELEMETRY_WINDOW, setting
+
+# threads de fundo (pelo nome) -> etiqueta no lugar da página
+_BACKGROUND = {"analyzer-refresher": "refresher", "analyzer-prewarm": "prewarm", "prewarm": "prewarm", "revalidate-": "revalidate"}
+
+# página da sessão para quem trabalha por ela sem o contexto (pool do loader)
+_local = threading.local()
+
+_SUMS = ("bytes_processed", "bytes_billed", "estimated_bytes", "slot_ms", "rows", "queue_s", "exec_s", "wait_s", "fetch_s")
+
+
+def log_path() -> Path | None:
+    path = setting("telemetry_log", TELEMETRY_LOG)
+    if not path:
+        return None
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / path
+    return path
+
+
+@st.cache_resource(show_spinner=False)
+def _recent() -> dict:
+    return {"lock": threading.Lock(), "records": deque()}
+
+
+@contextmanager
+def on_behalf_of(page: str):
+    previous = getattr(_local, "page", None)
+    _local.page = page
+    try:
+        yield
+    finally:
+        _local.page = previous
+
+
+def current_page() -> str:
+    page = getattr(_local, "page", None)
+    if page:
+        return page
+    name = threading.current_thread().name
+    for prefix, tag in _BACKGROUND.items():
+        if name.startswith(prefix):
+            return tag
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return "cli"
+    try:
+        manager = ctx.pages_manager
+        page = manager.get_pages().get(manager.current_page_script_hash) or {}
+        return Path(page.get("script_path") or ctx.main_script_path).stem
+    except Exception:
+        return Path(ctx.main_script_path).stem
+
+
+def _seconds(start, end) -> float | None:
+    return (end - start).total_seconds() if start and end else None
+
+
+def record_job(job, table: str | None, kind: str, rows: int, fetch_s: float, extra: dict | None = None) -> None:
+    _append({
+        "ts": time.time(), "page": current_page(), "table": table or "-", "kind": kind,
+        "job_id": job.job_id, "cache_hit": bool(job.cache_hit),
+        "bytes_processed": job.total_bytes_processed or 0, "bytes_billed": job.total_bytes_billed or 0,
+        "slot_ms": job.slot_millis or 0,
+        "queue_s": _seconds(job.created, job.started), "exec_s": _seconds(job.started, job.ended),
+        "rows": rows, "fetch_s": round(fetch_s, 4), **(extra or {}),
+    })
+
+
+def record_refused(table: str | None, kind: str, estimate: int, action: str) -> None:
+    _append({
+        "ts": time.time(), "page": current_page(), "table": table or "-", "kind": kind,
+        "estimated_bytes": estimate, "over_budget": True, "refused": True, "action": action,
+    })
+
+
+def _append(record: dict) -> None:
+    state = _recent()
+    with state["lock"]:
+        state["records"].append(record)
+        cutoff = record["ts"] - setting("telemetry_window", TELEMETRY_WINDOW)
+        while state["records"] and state["records"][0]["ts"] < cutoff:
+            state["records"].popleft()
+        path = log_path()
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with path.open("a", encoding="utf-8") as log:
+                    log.write(json.dumps(record) + "\n")
+            except OSError:
+                # telemetria não pode derrubar a página
+                pass
+
+
+def aggregate(records, by=("page", "table")) -> dict:
+    # {(valores de "by"): {"jobs", "cache_hits", "over_budget", "refused", somas de _SUMS}}
+    out = {}
+    for record in records:
+        group = tuple(record.get(field, "-") for field in by)
+        stats = out.setdefault(group, {"jobs": 0, "cache_hits": 0, "over_budget": 0, "refused": 0, **{name: 0 for name in _SUMS}})
+        stats["jobs"] += not record.get("refused")
+        stats["cache_hits"] += bool(record.get("cache_hit"))
+        stats["over_budget"] += bool(record.get("over_budget"))
+        stats["refused"] += bool(record.get("refused"))
+        for name in _SUMS:
+            stats[name] += record.get(name) or 0
+    return out
+
+
+def job_stats(by=("page", "table")) -> dict:
+    # agregados da janela telemetry_window (só este processo)
+    state = _recent()
+    cutoff = time.time() - setting("telemetry_window", TELEMETRY_WINDOW)
+    with state["lock"]:
+        records = [r for r in state["records"] if r["ts"] >= cutoff]
+    return aggregate(records, by)
+
+
+def wait_quantile(table: str | None, kind: str, q: float, min_samples: int) -> float | None:
+    # quantil da espera dos jobs dessa tabela/tipo na janela (None com poucas amostras)
+    state = _recent()
+    with state["lock"]:
+        waits = sorted(
+            r["wait_s"] for r in state["records"]
+            if r.get("wait_s") is not None and r["table"] == (table or "-") and r["kind"] == kind
+        )
+    if len(waits) < min_samples:
+        return None
+    return waits[min(int(q * len(waits)), len(waits) - 1)]
+
+
+def read_log(since: float = 0.0) -> list:
+    path = log_path()
+    if path is None or not path.exists():
+        return []
+    records = []
+    with path.open(encoding="utf-8") as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # linha cortada por um processo que caiu no meio da escrita
+            if record["ts"] >= since:
+                records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since", type=float, default=24, help="horas para trás")
+    parser.add_argument("--by", default="page,table")
+    args = parser.parse_args()
+
+    by = tuple(args.by.split(","))
+    stats = aggregate(read_log(time.time() - args.since * 3600), by)
+    for group, s in sorted(stats.items(), key=lambda item: item[1]["bytes_billed"], reverse=True):
+        print(
+            f"{' / '.join(map(str, group)):<40} jobs={s['jobs']:>5} cache={s['cache_hits']:>4} "
+            f"billed={s['bytes_billed'] / 2**30:>8.2f}GiB est={s['estimated_bytes'] / 2**30:>8.2f}GiB "
+            f"acima={s['over_budget']:>3} barrados={s['refused']:>3} slot-ms={s['slot_ms']:>10} "
+            f"fila={s['queue_s']:>7.1f}s exec={s['exec_s']:>7.1f}s espera={s['wait_s']:>7.1f}s "
+            f"fetch={s['fetch_s']:>7.1f}s rows={s['rows']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# ============================================================
+# Analyzer – versão das tabelas (chave do cache)
+# ============================================================
+# Em vez de um contador por sessão, o cache é indexado pela versão real
+# da tabela: o "modified" + num_rows do metadado (get_table, sem custo de
+# query) ou, se configurado, o MAX(version_column). A sondagem é barata e
+# fica em cache por VERSION_TTL segundos; o botão "Atualizar agora" só
+# descarta essa sondagem — o download só acontece se a versão mudou.
+# Cliques simultâneos dentro de refresh_debounce segundos contam como um.
+#
+# O mesmo metadado traz o schema e o num_rows, usados pelo sync
+# incremental para decidir quando o delta não basta (ver loader.py).
+#
+# Resultados remotos que dependem da versão (recorte filtrado, opções de
+# filtro, KPIs do pushdown) ficam em versioned(): um holder por tabela que
+# guarda só a versão atual. Versão nova (vista na chamada ou trocada no
+# store do loader, via retire_version) descarta a anterior inteira.
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import streamlit as st
+
+from analyzer.client import get_client
+from analyzer.config import REFRESH_DEBOUNCE, TABLES, TZ, VERSION_TTL, setting, table_fqn, table_id, table_option
+from analyzer.flight import single_flight
+from analyzer.query import query_rows
+
+
+def _probe_bq(key: str) -> dict:
+    table = get_client().get_table(table_id(key))
+    info = {
+        "version": f"meta:{table.modified.isoformat()}|{table.num_rows}",
+        "schema": {f.name: f.field_type for f in table.schema},
+        "num_rows": table.num_rows,
+    }
+    column = table_option(key, "version_column")
+    if column:
+        sql = f"SELECT CAST(MAX({column}) AS STRING) AS v FROM {table_fqn(key)}"
+        row = query_rows(sql, table=key, kind="probe")[0]
+        info["version"] = f"max:{row.v}"
+    return info
+
+
+@st.cache_data(ttl=setting("version_ttl", VERSION_TTL), show_spinner=False)
+def _probe(key: str) -> dict:
+    return single_flight(key, ("probe",), lambda: _probe_bq(key))
+
+
+def table_info(key: str) -> dict:
+    info = dict(_probe(key))
+    if TABLES[key].get("daily"):
+        info["version"] += "|" + datetime.now(ZoneInfo(TZ)).date().isoformat()
+    return info
+
+
+def table_version(key: str) -> str:
+    return table_info(key)["version"]
+
+
+@st.cache_resource(show_spinner=False)
+def _last_refresh() -> dict:
+    return {"lock": threading.Lock(), "at": 0.0, "debounced": 0}
+
+
+def refresh_versions() -> None:
+    # vários "Atualizar agora" em sequência: o primeiro descarta as
+    # sondagens, os seguintes (dentro da janela) reaproveitam a nova
+    state = _last_refresh()
+    with state["lock"]:
+        if time.time() - state["at"] < setting("refresh_debounce", REFRESH_DEBOUNCE):
+            state["debounced"] += 1
+            return
+        state["at"] = time.time()
+    _probe.clear()
+
+
+def refresh_stats() -> dict:
+    # {"last_refresh": epoch do último efetivo, "debounced": cliques absorvidos pela janela}
+    state = _last_refresh()
+    with state["lock"]:
+        return {"last_refresh": state["at"], "debounced": state["debounced"]}
+
+
+def refresh_requested_at() -> float:
+    # epoch do último "Atualizar agora" efetivo (0 se nunca houve)
+    return _last_refresh()["at"]
+
+
+# ========= Resultados por versão =========
+# entradas por tabela e tipo dentro da versão atual (LRU)
+VERSIONED_ENTRIES = {"filtered": 128, "options": 32, "kpis": 256}
+
+
+@st.cache_resource(show_spinner=False)
+def _versioned() -> dict:
+    # key -> {"version", "slots": OrderedDict((tipo, args) -> resultado)}
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def _slots(state: dict, key: str, version: str) -> OrderedDict:
+    table = state["tables"].get(key)
+    if table is None or table["version"] != version:
+        table = state["tables"][key] = {"version": version, "slots": OrderedDict()}
+    return table["slots"]
+
+
+def versioned(key: str, version: str, kind: str, args, fn):
+    state = _versioned()
+    slot = (kind, args)
+    with state["lock"]:
+        slots = _slots(state, key, version)
+        if slot in slots:
+            slots.move_to_end(slot)
+            return slots[slot]
+    result = fn()
+    with state["lock"]:
+        table = state["tables"].get(key)
+        # a versão pode ter mudado enquanto o job rodava: aí o resultado não fica
+        if table is not None and table["version"] == version:
+            table["slots"][slot] = result
+            same = [s for s in table["slots"] if s[0] == kind]
+            for old in same[:-VERSIONED_ENTRIES[kind]]:
+                del table["slots"][old]
+    return result
+
+
+def retire_version(key: str, version: str) -> None:
+    # o loader trocou a versão da tabela no store: resultados das anteriores saem agora
+    state = _versioned()
+    with state["lock"]:
+        _slots(state, key, version)
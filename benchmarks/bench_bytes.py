@@ -0,0 +1,51 @@
+# ============================================================
+# Benchmark – bytes processados: SELECT * x projeção planejada
+# ============================================================
+# Uso (na raiz do repo, com os secrets do BigQuery configurados):
+#   python benchmarks/bench_bytes.py --table aldeia --table membros
+#
+# Usa dry run (sem custo, sem cache): o BigQuery devolve quantos bytes a
+# query leria. "antes" é o SELECT * que a página Atrasados-aldeia fazia;
+# "depois" é o SELECT com as colunas do registro + papéis resolvidos
+# pelo schema (analyzer/planner.py).
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def dry_run_bytes(sql: str) -> int:
+    from google.cloud import bigquery
+
+    from analyzer.client import get_client
+
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    return get_client().query(sql, job_config=job_config).total_bytes_processed
+
+
+def main():
+    from analyzer.config import TABLES, table_fqn
+    from analyzer.planner import plan_columns
+    from analyzer.sql import select_sql
+    from analyzer.versions import table_info
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", action="append", default=None)
+    args = parser.parse_args()
+
+    for key in args.table or ["aldeia"]:
+        columns, roles = plan_columns(key, table_info(key)["schema"])
+        order_by = TABLES[key].get("order_by")
+        before = f"SELECT * FROM {table_fqn(key)}" + (f" ORDER BY {order_by}" if order_by else "")
+        after = select_sql(key, columns=columns)
+        b, a = dry_run_bytes(before), dry_run_bytes(after)
+        print(
+            f"{key:<12} antes={b / 2**20:>9.2f}MB depois={a / 2**20:>9.2f}MB "
+            f"({100 * (1 - a / b) if b else 0:.1f}% a menos) colunas={len(columns)} papéis={roles}"
+        )
+
+
+if __name__ == "__main__":
+    main()
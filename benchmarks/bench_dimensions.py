@@ -0,0 +1,80 @@
+# ============================================================
+# Benchmark – colunas de dimensão: object x categórica
+# ============================================================
+# Uso (na raiz do repo; não precisa de BigQuery):
+#   python benchmarks/bench_dimensions.py --table membros --rows 2000000 --repeat 3
+#
+# Gera a tabela sintética (analyzer/local.py) e compara, para cada coluna
+# de dimensão da tabela, "antes" (object + .astype(str).str.strip() a cada
+# filtro/gráfico, como as páginas faziam) com "depois" (categórica do
+# loader, isin/groupby nos códigos): memória (deep), isin de um valor,
+# groupby/size e value_counts. O tempo de codificar (1x por versão) sai
+# em separado.
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    from analyzer import dimensions
+    from analyzer.loader import dimension_columns
+    from analyzer.local import synthetic_frame
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default="membros")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.table, args.rows, args.seed)
+    columns = [c for c in dimension_columns(args.table) if c in frame.columns]
+    print(f"{args.table}: {len(frame)} linhas, dimensões {columns}")
+    total_before = total_after = 0
+    for col in columns:
+        raw = frame[col]
+        t0 = time.perf_counter()
+        coded = dimensions.encode(raw)
+        encode_s = time.perf_counter() - t0
+        value = dimensions.present(coded)[0]
+
+        def old_text():
+            return raw.astype(str).str.strip()
+
+        before = {
+            "isin": best(lambda: old_text().isin([value]), args.repeat),
+            "groupby": best(lambda: frame.groupby(old_text(), dropna=False).size(), args.repeat),
+            "value_counts": best(lambda: old_text().value_counts(), args.repeat),
+        }
+        after = {
+            "isin": best(lambda: coded.isin([value]), args.repeat),
+            "groupby": best(lambda: frame.groupby(coded, observed=True).size(), args.repeat),
+            "value_counts": best(lambda: dimensions.dim_labels(coded, "—").value_counts(), args.repeat),
+        }
+        mem_before = raw.memory_usage(deep=True)
+        mem_after = coded.memory_usage(deep=True)
+        total_before += mem_before
+        total_after += mem_after
+        print(
+            f"  {col:<16} mem {mem_before / 2**20:>8.1f}MiB -> {mem_after / 2**20:>6.1f}MiB  "
+            + "  ".join(f"{name} {before[name] * 1000:>7.1f} -> {after[name] * 1000:>6.1f}ms" for name in before)
+            + f"  (encode {encode_s * 1000:.1f}ms)"
+        )
+    print(f"  {'total':<16} mem {total_before / 2**20:>8.1f}MiB -> {total_after / 2**20:>6.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
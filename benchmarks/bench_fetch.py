@@ -0,0 +1,80 @@
+# ============================================================
+# Benchmark – fetch REST (JSON paginado) x Storage Read API (Arrow)
+# ============================================================
+# Uso (na raiz do repo, com os secrets do BigQuery configurados):
+#   python benchmarks/bench_fetch.py --table membros --table aldeia --repeat 3
+#
+# Cada medição roda em um subprocesso novo para que o pico de memória
+# (ru_maxrss) de um modo não contamine o outro. A primeira execução de
+# cada tabela só aquece o cache de resultados do BigQuery, assim os dois
+# modos medem apenas download + desserialização.
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+MODES = ("rest", "arrow")
+
+
+def run_child(table: str, mode: str) -> dict:
+    from analyzer.config import table_fqn
+    from analyzer.query import fetch_dataframe
+
+    sql = f"SELECT * FROM {table_fqn(table)}"
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    df = fetch_dataframe(sql, mode)
+    elapsed = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "table": table,
+        "mode": mode,
+        "rows": len(df),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(len(df) / elapsed, 1) if elapsed else None,
+        "peak_mem_mb": round((rss_after - rss_before) / 1024, 1),
+        "frame_mem_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+    }
+
+
+def spawn(table: str, mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", table, mode],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", action="append", default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs=2, metavar=("TABLE", "MODE"))
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(*args.child)))
+        return
+
+    for table in args.table or ["membros", "aldeia"]:
+        spawn(table, "rest")  # aquece o cache de resultados
+        for mode in MODES:
+            runs = [spawn(table, mode) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r["seconds"])
+            print(
+                f"{table:<12} {mode:<5} rows={best['rows']:>8} "
+                f"t={best['seconds']:>7.3f}s rows/s={best['rows_per_sec']:>10} "
+                f"pico={max(r['peak_mem_mb'] for r in runs):>7.1f}MB "
+                f"frame={best['frame_mem_mb']:>7.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# ============================================================
+# Benchmark – fetch com ORDER BY x sem ORDER BY
+# ============================================================
+# Uso (na raiz do repo, com os secrets do BigQuery configurados):
+#   python benchmarks/bench_order.py --table membros --table presenciais --repeat 3
+#
+# "antes" é o SELECT planejado + o ORDER BY do registro (como o loader
+# fazia); "depois" é o mesmo SELECT sem ordenação. Cada execução desliga o
+# cache de resultados do BigQuery, então os dois lados pagam a query
+# inteira: duração do job (started -> ended), slot-ms consumidos e tempo
+# de download + desserialização no modo de fetch da tabela.
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def run(sql: str, mode: str) -> dict:
+    from google.cloud import bigquery
+
+    from analyzer.client import get_client
+    from analyzer.query import _to_frame_arrow, _to_frame_rest
+
+    job = get_client().query(sql, job_config=bigquery.QueryJobConfig(use_query_cache=False))
+    t0 = time.perf_counter()
+    job.result()
+    df = _to_frame_arrow(job) if mode == "arrow" else _to_frame_rest(job)
+    return {
+        "rows": len(df),
+        "job_s": (job.ended - job.started).total_seconds(),
+        "slot_ms": job.slot_millis or 0,
+        "total_s": time.perf_counter() - t0,
+    }
+
+
+def main():
+    from analyzer.config import TABLES, fetch_mode
+    from analyzer.planner import plan_columns
+    from analyzer.sql import select_sql
+    from analyzer.versions import table_info
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", action="append", default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for key in args.table or ["membros", "aldeia", "presenciais"]:
+        columns, _ = plan_columns(key, table_info(key)["schema"])
+        after = select_sql(key, columns=columns)
+        order_by = TABLES[key].get("order_by")
+        variants = {"antes": after + (f"\nORDER BY {order_by}" if order_by else ""), "depois": after}
+        for label, sql in variants.items():
+            runs = [run(sql, fetch_mode(key)) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r["total_s"])
+            print(
+                f"{key:<12} {label:<6} rows={best['rows']:>8} "
+                f"job={best['job_s']:>7.3f}s slot-ms={min(r['slot_ms'] for r in runs):>9} "
+                f"total={best['total_s']:>7.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# ============================================================
+# Benchmark – filtros: máscaras encadeadas x índice da versão
+# ============================================================
+# Uso (na raiz do repo; não precisa de BigQuery):
+#   python benchmarks/bench_selection.py --table membros --rows 2000000 --repeat 5
+#
+# Gera a tabela sintética (analyzer/local.py), passa pela normalização e
+# pelas derivadas do loader e aplica as mesmas combinações de filtro
+# (titularidade, gestor/equipe, turma, mês) de dois jeitos: "antes" é a
+# cadeia que as páginas faziam (astype(str).isin por dimensão, to_period
+# no mês e uma cópia do frame a cada passo); "depois" é local_rows no
+# índice da versão + um take das colunas da página. O tempo de montar os
+# índices (1x por versão) sai em separado.
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+COLUMNS = ["id", "turma", "tipo_titularidade", "email_ok", "dia_primeiro_contato", "target_sup", "finalizacao_primeira"]
+
+
+def best(fn, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def chained(frame, filters):
+    import pandas as pd
+
+    from analyzer.filters import MONTH_KEY
+
+    out = frame
+    for name, values in filters.items():
+        if name == MONTH_KEY:
+            months = pd.to_datetime(out["data_primeiro_contato"], errors="coerce").dt.to_period("M").astype(str)
+            out = out[months.isin(values)].copy()
+        else:
+            out = out[out[name].astype(str).isin(values)].copy()
+    return out[COLUMNS]
+
+
+def main():
+    from analyzer.config import TABLES
+    from analyzer.filters import MONTH_KEY, local_index, local_rows
+    from analyzer.loader import _derive, _normalize
+    from analyzer.local import synthetic_frame
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default="membros", choices=["membros", "aldeia"])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.table, args.rows, args.seed)
+    frame = _derive(_normalize(args.table, frame), TABLES[args.table].get("derived", []))
+    team = "gestor" if args.table == "membros" else "broker"
+    months = sorted(frame["mes_primeiro_contato"].dropna().dt.strftime("%Y-%m").unique())
+    teams = sorted(frame[team].dropna().unique())
+    cases = {
+        "titularidade": {"tipo_titularidade": ["Adicional"]},
+        "equipe": {team: teams[:1]},
+        "equipe+turma": {team: teams[:2], "turma": ["T1", "T3", "T7"]},
+        "mês": {MONTH_KEY: months[-2:]},
+        "tudo": {"tipo_titularidade": ["Pagante"], team: teams[:2], "turma": ["T1", "T3"], MONTH_KEY: months[-3:]},
+    }
+
+    indexes = {}
+    t0 = time.perf_counter()
+    for name in ["tipo_titularidade", team, "turma", MONTH_KEY]:
+        indexes[name] = local_index(frame, name)
+    print(f"{args.table}: {len(frame)} linhas, índices montados em {(time.perf_counter() - t0) * 1000:.0f}ms (1x por versão)")
+    for label, filters in cases.items():
+        before_s, before = best(lambda: chained(frame, filters), args.repeat)
+        after_s, after = best(lambda: frame[COLUMNS].take(local_rows(indexes.get, filters)), args.repeat)
+        same = len(before) == len(after) and (before.index == after.index).all()
+        print(f"  {label:<14} {len(after):>9} linhas  antes {before_s * 1000:>7.1f}ms  depois {after_s * 1000:>6.1f}ms  iguais={same}")
+
+
+if __name__ == "__main__":
+    main()
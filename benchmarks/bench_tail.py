@@ -0,0 +1,113 @@
+# ============================================================
+# Benchmark – cauda de latência: prazo, retentativas e hedge
+# ============================================================
+# Uso (na raiz do repo; não precisa de BigQuery):
+#   python benchmarks/bench_tail.py --jobs 300 --slow 0.03 --errors 0.05
+#
+# Um client falso devolve jobs com latência injetada (lognormal + uma
+# fração --slow de jobs 10x mais lentos) e uma fração --errors de falhas
+# transitórias (500 backendError). O mesmo fluxo de jobs passa por
+# analyzer.jobs.run_job em três políticas: sem retentativa nem hedge,
+# com retentativas e com retentativas + hedge no p95 medido na primeira.
+# Mostra p50/p95/p99 da espera, falhas e jobs extras (custo do hedge).
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+class FakeJob:
+    def __init__(self, latency: float, error: Exception | None):
+        self.finish_at = time.monotonic() + latency
+        self.error = error
+        self.cancelled = False
+
+    def done(self, *args, **kwargs) -> bool:
+        return self.cancelled or time.monotonic() >= self.finish_at
+
+    def result(self, *args, **kwargs):
+        if self.cancelled:
+            raise RuntimeError("job cancelado")
+        if self.error is not None:
+            raise self.error
+        return []
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+
+class FakeClient:
+    def __init__(self, median: float, slow: float, errors: float, seed: int):
+        self.median, self.slow, self.errors = median, slow, errors
+        self.rng = random.Random(seed)
+        self.jobs = 0
+
+    def query(self, sql, job_config=None, **kwargs):
+        from google.api_core import exceptions
+
+        self.jobs += 1
+        latency = self.median * self.rng.lognormvariate(0, 0.3)
+        if self.rng.random() < self.slow:
+            latency *= 10
+        error = None
+        if self.rng.random() < self.errors:
+            error = exceptions.InternalServerError("backendError", errors=[{"reason": "backendError"}])
+        return FakeJob(latency, error)
+
+
+def run(policy: dict, args) -> dict:
+    from analyzer.jobs import run_job
+
+    client = FakeClient(args.median, args.slow, args.errors, args.seed)
+
+    def one(_):
+        t0 = time.monotonic()
+        try:
+            run_job("SELECT 1", client=client, policy=policy)
+            return time.monotonic() - t0, None
+        except Exception as exc:
+            return time.monotonic() - t0, exc
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.jobs)))
+    waits = sorted(w for w, exc in results if exc is None)
+    pick = lambda q: waits[min(int(q * len(waits)), len(waits) - 1)] if waits else float("nan")
+    return {
+        "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+        "fails": sum(exc is not None for _, exc in results), "extra": client.jobs - args.jobs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--median", type=float, default=0.2, help="latência mediana (s) do job falso")
+    parser.add_argument("--slow", type=float, default=0.03)
+    parser.add_argument("--errors", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    base = {"deadline": args.deadline, "retries": 0, "backoff": 0.05, "hedge_after": None}
+    before = run(base, args)
+    policies = {
+        "sem retentativa": before,
+        "retentativas": run({**base, "retries": 2}, args),
+        "retent. + hedge": run({**base, "retries": 2, "hedge_after": before["p95"]}, args),
+    }
+    for label, r in policies.items():
+        print(
+            f"{label:<16} p50={r['p50']:>6.3f}s p95={r['p95']:>6.3f}s p99={r['p99']:>6.3f}s "
+            f"falhas={r['fails']:>4} jobs extras={r['extra']:>4}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,20 @@
 # ============================================================
 # Analyzer – Dashboard Streamlit (BigQuery + Altair + ECharts)
 # ========================== TRIBO ============================
-import os
 import math
 import pandas as pd
 import numpy as np
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 import altair as alt
 from streamlit_echarts import st_echarts
 import textwrap
 
+from analyzer import dim_labels, fetched_at, filter_options, get_auth_mode, get_client, load_filtered, prewarm_caption, refresh_versions, start_prewarm
+from analyzer.kpis import kpi_pushdown, pushdown_counts
+
 # ---------------------------
 # 1) CONFIG & STREAMLIT BASE
 # ---------------------------
-PROJECT_ID = "leads-ts"
-TABLE_FQN  = "`leads-ts.Analyzer.membros_2026_s`"   # base TRIBO
-
 st.set_page_config(page_title="Analyzer", layout="wide")
 
 # Paletas / estilos visuais
@@ -54,10 +51,8 @@ div[data-testid="stSidebarNavSearch"] { display: none !important; }
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
 # botão atualizar
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
 
 st.sidebar.divider()
 
@@ -76,68 +71,41 @@ st.sidebar.divider()
 
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 
 # ---------------------------
 # 2) AUTENTICAÇÃO BIGQUERY
 # ---------------------------
-auth_mode = "desconhecido"
 try:
-    if "gcp_service_account" in st.secrets:
-        PROJECT_ID = st.secrets.get("gcp_project_id", "leads-ts")
-        creds = service_account.Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-        bq = bigquery.Client(project=PROJECT_ID, credentials=creds)
-        auth_mode = "secrets"
-    else:
-        SA_PATH = r"C:\Users\mateu\StreamLit\OtavioPermissao.json"
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = SA_PATH
-        PROJECT_ID = "leads-ts"
-        bq = bigquery.Client(project=PROJECT_ID)
-        auth_mode = "arquivo local"
+    get_client()
 except Exception as e:
     st.error("Falha ao criar o client do BigQuery. Verifique os secrets/JSON.")
     st.exception(e)
     st.stop()
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
 
 # ---------------------------
 # 3) QUERY + CACHE
 # ---------------------------
-@st.cache_data(show_spinner=False)
-def run_query(sql: str) -> pd.DataFrame:
-    job = bq.query(sql)
-    return job.result().to_dataframe(create_bqstorage_client=False)
-
-cache_bust = f"{st.session_state.refresh_key}"
-
-sql = f"""
-SELECT
-  id,
-  target_sup,
-  late_sup_atraso,
-  status_atraso,
-  detalhamento,
-  data_ultima_acao,
-  dias_na_tribo,
-  data_primeiro_contato,
-  turma, titularidade, nome, email, telefone,
-  observacao, boas_vindas, grupos,
-  mt5, conta, validacao, corretora,
-  finalizacao_primeira, gestao_data, primeira_operacao, finalizado_final,
-  ativacao, cancelamento, gestor, empresa,
-  updated_at, ingestion_time
-FROM {TABLE_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+
+COLUMNS = [
+    "id", "gestor", "turma", "tipo_titularidade", "email_ok", "gestor_ok",
+    "dia_primeiro_contato", "target_sup", "finalizacao_primeira", "finalizado_final",
+]
 
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql)
+    # opções dos filtros (do frame em cache ou direto do BigQuery, pelo tamanho)
+    opts = filter_options("membros", ["gestor", "turma"])
 
-if df.empty:
+if opts["rows"] == 0:
     st.warning("Nenhum registro encontrado na tabela.")
     st.stop()
 
-last_updated_str = pd.Timestamp.now(tz='America/Sao_Paulo').strftime('%d/%m/%Y %H:%M:%S')
+last_updated_str = fetched_at("membros").strftime('%d/%m/%Y %H:%M:%S')
 _sb_last_placeholder.caption(f"🕒 Última atualização: {last_updated_str}")
 
 # ---------------------------
@@ -194,11 +162,7 @@ section.main div[data-testid="stHorizontalBlock"] .stToggle { transform: scale(.
 # ---------------------------
 st.markdown('<div class="top-controls">', unsafe_allow_html=True)
 
-_dt_all = pd.to_datetime(df["data_primeiro_contato"], errors="coerce")
-_periods = sorted(
-    _dt_all.dropna().dt.to_period("M").unique().tolist(),
-    key=lambda p: (p.year, p.month)
-)
+_periods = opts["meses"]
 
 MESES_PT = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
             "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
@@ -210,14 +174,14 @@ c1, c2, c3 = st.columns([2.2, 2.2, 2.2], gap="small")
 with c1:
     st.multiselect(
         "Gestor",
-        options=sorted(df["gestor"].dropna().astype(str).unique()),
+        options=opts["gestor"],
         key="flt_gestor_top",
         placeholder="Selecione os gestores",
     )
 with c2:
     st.multiselect(
         "Turma",
-        options=sorted(df["turma"].dropna().astype(str).unique()),
+        options=opts["turma"],
         key="flt_turma_top",
         placeholder="Selecione as turmas",
     )
@@ -239,30 +203,17 @@ meses_label_sel = st.session_state["flt_meses_top"]
 # ---------------------------
 # 5) FILTROS (Titularidade + Gestor/Turma + Mês)
 # ---------------------------
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str):
-        return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low:
-        return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low):
-        return "Pagante"
-    return "Pagante"
-
-df["tipo_titularidade"] = df["titularidade"].apply(classifica_tit)
+meses_sel = [str(label_to_period[l]) for l in meses_label_sel if l in label_to_period]
 
 tit_choice = st.session_state.get("tit_choice")
-fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
-
-if gestor_sel:
-    fdf = fdf[fdf["gestor"].astype(str).isin(gestor_sel)]
-if turma_sel:
-    fdf = fdf[fdf["turma"].astype(str).isin(turma_sel)]
+tit_sel = [tit_choice] if tit_choice in ("Pagante", "Adicional") else []
 
-if meses_label_sel:
-    _periodos_escolhidos = [label_to_period[l] for l in meses_label_sel if l in label_to_period]
-    dcol_period = pd.to_datetime(fdf["data_primeiro_contato"], errors="coerce").dt.to_period("M")
-    fdf = fdf[dcol_period.isin(_periodos_escolhidos)]
+# Titularidade/Gestor/Turma/Mês: local ou no BigQuery conforme o tamanho da tabela (analyzer/loader.py)
+with st.spinner("Consultando BigQuery…"):
+    fdf = load_filtered(
+        "membros", COLUMNS,
+        {"tipo_titularidade": tit_sel, "gestor": gestor_sel, "turma": turma_sel, "meses": meses_sel},
+    )
 
 if fdf.empty:
     st.info("Sem registros para os filtros atuais.")
@@ -271,58 +222,64 @@ if fdf.empty:
 # ---------------------------
 # 6) MÉTRICAS ✅ AJUSTADAS
 # ---------------------------
-base_df = fdf.copy()
-
-def is_filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    empty = s_low.isin(["", "nan", "none", "null", "nat"])
-    return ~empty
-
-def is_valid_gestor(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    bad = s_low.isin(["", "nan", "none", "null", "nat", "#ref!", "ref!"])
-    return ~bad
-
-# Base de contagem: email preenchido
-email_ok = is_filled(base_df["email"])
+base_df = fdf   # Copy-on-Write: alterações em base_df não voltam para fdf
+
+# contagens calculadas no BigQuery (analyzer/kpis.py, conjunto "funil");
+# None = pushdown desligado ou job que não rodou -> cálculo em pandas
+_kpi = pushdown_counts(
+    "membros", "funil", tit_choice=tit_choice, gestor=gestor_sel, turma=turma_sel,
+    meses=meses_sel,
+) if kpi_pushdown("membros") else None
+if _kpi is not None:
+    membros_total             = _kpi["membros_total"]
+    membros_com_gestor        = _kpi["membros_com_gestor"]
+    finalizados_primeira      = _kpi["finalizados_primeira"]
+    finalizados_geral         = _kpi["finalizados_geral"]
+    nao_finalizados_geral     = _kpi["nao_finalizados_geral"]
+    pendentes_primeira        = _kpi["pendentes_primeira"]
+    pendentes_primeira_janela = _kpi["pendentes_primeira_janela"]
+    atrasados_primeira        = _kpi["atrasados_primeira"]
+    pendentes_segunda         = _kpi["pendentes_segunda"]
+    atrasados_segunda         = _kpi["atrasados_segunda"]
+else:
+    # Base de contagem: email preenchido (flag calculada no loader, sentinelas -> NULL)
+    email_ok = base_df["email_ok"]
 
-# Datas base
-hoje = pd.Timestamp.now(tz="America/Sao_Paulo").tz_localize(None).normalize()
-target_sup_dt = pd.to_datetime(base_df["target_sup"], errors="coerce")
-finalizacao_primeira_dt = pd.to_datetime(base_df["finalizacao_primeira"], errors="coerce")
-finalizado_final_dt = pd.to_datetime(base_df["finalizado_final"], errors="coerce")
+    # Datas base (datetime64 desde o loader, sem pd.to_datetime por página)
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").tz_localize(None).normalize()
+    target_sup_dt = base_df["target_sup"]
+    finalizacao_primeira_dt = base_df["finalizacao_primeira"]
+    finalizado_final_dt = base_df["finalizado_final"]
 
-# Corte da 1ª etapa = target_sup - 5 dias
-cutoff_primeira = target_sup_dt - pd.Timedelta(days=5)
+    # Corte da 1ª etapa = target_sup - 5 dias
+    cutoff_primeira = target_sup_dt - pd.Timedelta(days=5)
 
-# Flags de conclusão
-fin1_filled = finalizacao_primeira_dt.notna()
-fin2_filled = finalizado_final_dt.notna()
+    # Flags de conclusão
+    fin1_filled = finalizacao_primeira_dt.notna()
+    fin2_filled = finalizado_final_dt.notna()
 
-# KPIs principais
-membros_total = int(email_ok.sum())
+    # KPIs principais
+    membros_total = int(email_ok.sum())
 
-gestor_ok = is_valid_gestor(base_df["gestor"])
-membros_com_gestor = int((email_ok & gestor_ok).sum())
+    gestor_ok = base_df["gestor_ok"]
+    membros_com_gestor = int((email_ok & gestor_ok).sum())
 
-finalizados_primeira = int((email_ok & fin1_filled).sum())
-finalizados_geral = int((email_ok & fin2_filled).sum())
-nao_finalizados_geral = int((email_ok & ~fin2_filled).sum())
+    finalizados_primeira = int((email_ok & fin1_filled).sum())
+    finalizados_geral = int((email_ok & fin2_filled).sum())
+    nao_finalizados_geral = int((email_ok & ~fin2_filled).sum())
 
-# 1ª etapa
-mask_base_primeira = email_ok & (~fin1_filled) & cutoff_primeira.notna()
+    # 1ª etapa
+    mask_base_primeira = email_ok & (~fin1_filled) & cutoff_primeira.notna()
 
-pendentes_primeira = int(mask_base_primeira.sum())
-pendentes_primeira_janela = int((mask_base_primeira & (cutoff_primeira >= hoje)).sum())
-atrasados_primeira = int((mask_base_primeira & (cutoff_primeira < hoje)).sum())
+    pendentes_primeira = int(mask_base_primeira.sum())
+    pendentes_primeira_janela = int((mask_base_primeira & (cutoff_primeira >= hoje)).sum())
+    atrasados_primeira = int((mask_base_primeira & (cutoff_primeira < hoje)).sum())
 
-# 2ª etapa
-mask_base_segunda = email_ok & fin1_filled & (~fin2_filled) & target_sup_dt.notna()
+    # 2ª etapa
+    mask_base_segunda = email_ok & fin1_filled & (~fin2_filled) & target_sup_dt.notna()
 
-pendentes_segunda = int((mask_base_segunda & (target_sup_dt >= hoje)).sum())
-atrasados_segunda = int((mask_base_segunda & (target_sup_dt < hoje)).sum())
+    pendentes_segunda = int((mask_base_segunda & (target_sup_dt >= hoje)).sum())
+    atrasados_segunda = int((mask_base_segunda & (target_sup_dt < hoje)).sum())
 
 # Se você usa isso em outras páginas/trechos
 st.session_state['kpi_membros_gestor'] = membros_com_gestor
@@ -444,8 +401,8 @@ base_kpi = base_df.copy()
 # Por gestor
 if not base_kpi.empty and "gestor" in base_kpi.columns:
     by_gestor = (
-        base_kpi.assign(gestor=base_kpi["gestor"].astype(str).str.strip().replace({"": "—"}))
-                .groupby("gestor", dropna=False)["id"].size()
+        base_kpi.assign(gestor=dim_labels(base_kpi["gestor"], "—"))
+                .groupby("gestor", observed=True)["id"].size()
                 .reset_index(name="membros")
                 .sort_values("membros", ascending=False)
     )
@@ -455,12 +412,14 @@ else:
 # Por turma (exclui adicionais "genéricos")
 EXCLUDE_TURMAS = {"adicional brasil / mundo", "adicional tribo", "adicional"}
 if not base_kpi.empty and "turma" in base_kpi.columns:
-    turma_series = base_kpi["turma"].astype(str).str.strip()
-    keep_mask = ~turma_series.str.lower().isin(EXCLUDE_TURMAS)
+    # categórica do loader: a regra roda nas categorias, o filtro nos códigos
+    turma_series = dim_labels(base_kpi["turma"], "—")
+    excluded = [t for t in turma_series.cat.categories if t.lower() in EXCLUDE_TURMAS]
+    keep_mask = ~turma_series.isin(excluded)
     by_turma = (
         base_kpi.loc[keep_mask]
-                .assign(turma=turma_series[keep_mask].replace({"": "—"}))
-                .groupby("turma", dropna=False)["id"].size()
+                .assign(turma=turma_series[keep_mask])
+                .groupby("turma", observed=True)["id"].size()
                 .reset_index(name="membros")
                 .sort_values("membros", ascending=False)
     )
@@ -471,8 +430,9 @@ else:
 # 10) Calendário estilizado
 # ---------------------------
 st.subheader("📅 Entradas por dia (Primeiro Contato)")
-if "data_primeiro_contato" in base_df.columns and base_df["data_primeiro_contato"].notna().any():
-    ts = pd.to_datetime(base_df["data_primeiro_contato"], errors="coerce").dropna()
+if "dia_primeiro_contato" in base_df.columns and base_df["dia_primeiro_contato"].notna().any():
+    # dia do primeiro contato já derivado no loader (uma vez por versão)
+    ts = base_df["dia_primeiro_contato"].dropna()
     if not ts.empty:
         hoje_cal = pd.Timestamp.today()
         c1, c2 = st.columns(2)
@@ -486,7 +446,7 @@ if "data_primeiro_contato" in base_df.columns and base_df["data_primeiro_contato
         end   = start + pd.offsets.MonthEnd(1)
         counts = (
             ts[(ts.dt.year == ano) & (ts.dt.month == mes)]
-              .dt.normalize().value_counts()
+              .value_counts()
               .rename_axis("date").reset_index(name="qtd")
         )
         cal = pd.DataFrame({"date": pd.date_range(start, end, freq="D")})
@@ -695,26 +655,17 @@ if base_df.empty:
     st.info("Sem registros na base atual para montar a tabela.")
 else:
     g = base_df.copy()
-    gestor_norm = (
-        g["gestor"].fillna("Sem gestor").astype(str).str.strip()
-         .replace({"": "Sem gestor", "nan": "Sem gestor", "None": "Sem gestor"})
-    )
-
-    def is_filled(series: pd.Series) -> pd.Series:
-        s = series.astype(str).str.strip()
-        s_low = s.str.lower()
-        empty = s_low.isin(["", "nan", "none", "null", "nat"])
-        return ~empty
+    gestor_norm = dim_labels(g["gestor"], "Sem gestor")
 
-    email_ok_tab = is_filled(g["email"])
+    email_ok_tab = g["email_ok"]
 
-    fin1_dt_tab = pd.to_datetime(g["finalizacao_primeira"], errors="coerce")
-    fin2_dt_tab = pd.to_datetime(g["finalizado_final"], errors="coerce")
+    fin1_dt_tab = g["finalizacao_primeira"]
+    fin2_dt_tab = g["finalizado_final"]
     fin1_filled_tab = fin1_dt_tab.notna()
     fin2_filled_tab = fin2_dt_tab.notna()
 
     hoje_tab = pd.Timestamp.now(tz="America/Sao_Paulo").tz_localize(None).normalize()
-    target_tab = pd.to_datetime(g["target_sup"], errors="coerce")
+    target_tab = g["target_sup"]
 
     pend2_mask = (
         email_ok_tab
@@ -743,7 +694,7 @@ else:
     })
 
     tabela_gestores = (
-        base_tab.groupby("Gestor", as_index=False)
+        base_tab.groupby("Gestor", as_index=False, observed=True)
                 .sum(numeric_only=True)
                 .sort_values(
                     ["Atrasados Geral", "Pendentes Geral", "Total de alunos"],
@@ -1,19 +1,15 @@
 # pages/Analise-aldeia.py
-import os
 from pathlib import Path
 import textwrap
 import pandas as pd
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 from streamlit_echarts import st_echarts
 
+from analyzer import dim_labels, fetched_at, get_auth_mode, get_client, load_tables, prewarm_caption, refresh_versions, sort_rows, start_prewarm
+
 # ========= Config =========
 st.set_page_config(page_title="Analyzer — Análise de Membros (Aldeia)", layout="wide")
 
-PROJECT_ID   = "leads-ts"
-MEMBROS_FQN  = "`leads-ts.Analyzer.aldeia_2026_s`"
-METAS_FQN    = "`leads-ts.Analyzer.metas_aldeia_forecast_finalizados`"
 TZ           = "America/Sao_Paulo"
 
 # ========= Paleta desta página =========
@@ -33,11 +29,9 @@ load_css("base.css", "sidebar.css", "dashboards.css")
 # ========= SIDEBAR =========
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now_analise_aldeia"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
     st.rerun()
 
 st.sidebar.divider()
@@ -63,13 +57,10 @@ st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.divider()
 st.sidebar.markdown('<div class="sb-grow"></div>', unsafe_allow_html=True)
 
-auth_mode = "secrets" if "gcp_service_account" in st.secrets else (
-    "arquivo local" if os.getenv("GOOGLE_APPLICATION_CREDENTIALS") else "desconhecido"
-)
 st.sidebar.markdown('<div class="sb-footer">', unsafe_allow_html=True)
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
@@ -115,78 +106,43 @@ with hdr_r:
 st.divider()
 
 # ========= BigQuery =========
-def get_bq_client():
-    try:
-        if "gcp_service_account" in st.secrets:
-            creds = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"]
-            )
-            return bigquery.Client(project=st.secrets.get("gcp_project_id", PROJECT_ID), credentials=creds)
-        return bigquery.Client(project=PROJECT_ID)
-    except Exception as e:
-        st.error("Falha ao criar o client do BigQuery.")
-        st.exception(e)
-        st.stop()
-
-@st.cache_data(show_spinner=False)
-def run_query(sql: str):
-    client = get_bq_client()
-    job = client.query(sql)
-    return job.result().to_dataframe(create_bqstorage_client=False)
-
-cache_bust = f"{st.session_state.refresh_key}"
+try:
+    get_client()
+except Exception as e:
+    st.error("Falha ao criar o client do BigQuery.")
+    st.exception(e)
+    st.stop()
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
+
 
 # ========= Dados (Aldeia) =========
-sql_membros = f"""
-SELECT
-  id, email, titularidade,
-  data_primeiro_contato, finalizacao_primeira, finalizado_final,
-  target_sup, status_atraso, late_sup_atraso,
-  updated_at, ingestion_time
-FROM {MEMBROS_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+COLUMNS = [
+    "id", "email_ok", "tipo_titularidade",
+    "data_primeiro_contato", "finalizacao_primeira", "finalizado_final",
+    "target_sup", "status_atraso",
+]
 
+# membros e metas são consultados em paralelo (a página espera o mais lento)
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql_membros)
+    frames = load_tables({"df": ("aldeia", COLUMNS), "dfm": "metas_aldeia"})
+df = frames["df"]
 
 if df.empty:
     st.info("Sem registros na tabela.")
     st.stop()
 
-last_updated_str = pd.Timestamp.now(tz=TZ).strftime('%d/%m/%Y %H:%M:%S')
+last_updated_str = fetched_at("aldeia").strftime('%d/%m/%Y %H:%M:%S')
 _sb_last_placeholder.caption(f"🕒 Última atualização: {last_updated_str}")
 
 # ========= Helpers =========
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str):
-        return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low:
-        return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low):
-        return "Pagante"
-    return "Pagante"
-
-def is_filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    empty = s_low.isin(["", "nan", "none", "null", "nat"])
-    return ~empty
-
 def parse_bq_date(series: pd.Series) -> pd.Series:
-    s = series.astype("string").str.strip()
-    s = s.replace({
-        "": pd.NA,
-        "nan": pd.NA,
-        "None": pd.NA,
-        "none": pd.NA,
-        "null": pd.NA,
-        "NaT": pd.NA,
-        "<NA>": pd.NA
-    })
-    return pd.to_datetime(s, errors="coerce").dt.normalize()
+    # colunas tipadas no SELECT (analyzer/config.py, "types") chegam do loader
+    # já como datetime64 (normalização por versão): só trunca no dia
+    return series.dt.normalize()
 
 def fmt_int(n) -> str:
     try:
@@ -200,14 +156,13 @@ def fmt_pct(n: int, den: int):
     return f"{(100 * float(n) / float(den)):.1f}%"
 
 # ========= Filtro por titularidade =========
-df["tipo_titularidade"] = df["titularidade"].apply(classifica_tit)
 tit_choice = st.session_state.get("tit_choice")
 fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
 
 # ========= KPIs =========
 base_df = fdf.copy()
 
-email_ok = is_filled(base_df["email"])
+email_ok = base_df["email_ok"]   # email preenchido (flag calculada no loader)
 target_sup_dt = parse_bq_date(base_df["target_sup"])
 fin1_dt = parse_bq_date(base_df["finalizacao_primeira"])
 fin2_dt = parse_bq_date(base_df["finalizado_final"])
@@ -270,14 +225,7 @@ st.divider()
 # ========= GRÁFICO DE METAS (FORECAST) =========
 st.subheader("🎯 Metas (Acumulado) — Forecast")
 
-sql_metas = f"""
-SELECT Data, FinalizadoAcumulado, MetaAcumulado
-FROM {METAS_FQN}
-WHERE Data <= CURRENT_DATE("{TZ}")
-ORDER BY Data
--- cache_bust:{cache_bust}
-"""
-dfm = run_query(sql_metas)
+dfm = sort_rows(frames["dfm"], "metas_aldeia")   # série em ordem de Data
 
 if dfm.empty:
     st.info("Sem dados na tabela de metas.")
@@ -464,13 +412,7 @@ with col_right:
     if not mask_atrasados.any():
         st.info("Sem atrasados para agrupar por status.")
     else:
-        status_series = (
-            fdf.loc[mask_atrasados, "status_atraso"]
-               .fillna("—")
-               .astype(str)
-               .str.strip()
-               .replace({"": "—", "nan": "—", "None": "—"})
-        )
+        status_series = dim_labels(fdf.loc[mask_atrasados, "status_atraso"], "—")
 
         g2 = status_series.value_counts().reset_index()
         g2.columns = ["status", "qtd"]
@@ -1,19 +1,16 @@
 # pages/Analise.py
-import os
 from pathlib import Path
 import textwrap
 import pandas as pd
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 from streamlit_echarts import st_echarts  # gráficos
 
+from analyzer import dim_labels, fetched_at, get_auth_mode, get_client, load_tables, prewarm_caption, refresh_versions, sort_rows, start_prewarm
+from analyzer.kpis import kpi_pushdown, pushdown_counts
+
 # ========= Config =========
 st.set_page_config(page_title="Analyzer — Análise de Membros", layout="wide")
 
-PROJECT_ID   = "leads-ts"
-MEMBROS_FQN  = "`leads-ts.Analyzer.membros_2026_s`"
-METAS_FQN    = "`leads-ts.Analyzer.metas_forecast_finalizados`"
 TZ           = "America/Sao_Paulo"
 
 # ========= Paleta desta página =========
@@ -33,10 +30,8 @@ load_css("base.css", "sidebar.css", "dashboards.css")
 # ========= SIDEBAR =========
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now_t2"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
 
 st.sidebar.divider()
 st.sidebar.markdown('<div class="sb-box">', unsafe_allow_html=True)
@@ -59,13 +54,10 @@ st.sidebar.divider()
 st.sidebar.markdown('<div class="sb-grow"></div>', unsafe_allow_html=True)
 
 # Rodapé da sidebar (auth + última atualização via placeholders)
-auth_mode = "secrets" if "gcp_service_account" in st.secrets else (
-    "arquivo local" if os.getenv("GOOGLE_APPLICATION_CREDENTIALS") else "desconhecido"
-)
 st.sidebar.markdown('<div class="sb-footer">', unsafe_allow_html=True)
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
@@ -108,111 +100,93 @@ with hdr_r:
 
 
 # ========= BigQuery =========
-def get_bq_client():
-    try:
-        if "gcp_service_account" in st.secrets:
-            creds = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"]
-            )
-            return bigquery.Client(project=st.secrets.get("gcp_project_id", PROJECT_ID), credentials=creds)
-        return bigquery.Client(project=PROJECT_ID)
-    except Exception as e:
-        st.error("Falha ao criar o client do BigQuery.")
-        st.exception(e)
-        st.stop()
-
-@st.cache_data(show_spinner=False)
-def run_query(sql: str):
-    client = get_bq_client()
-    job = client.query(sql)
-    return job.result().to_dataframe(create_bqstorage_client=False)
-
-cache_bust = f"{st.session_state.refresh_key}"
+try:
+    get_client()
+except Exception as e:
+    st.error("Falha ao criar o client do BigQuery.")
+    st.exception(e)
+    st.stop()
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
+
 
 # ========= Dados de membros =========
-sql_membros = f"""
-SELECT
-  id, gestor, email, titularidade,
-  data_primeiro_contato, finalizacao_primeira, finalizado_final,
-  target_sup, status_atraso, late_sup_atraso,  -- <<< IMPORTANTE
-  updated_at, ingestion_time
-FROM {MEMBROS_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+COLUMNS = [
+    "id", "gestor", "email", "tipo_titularidade",
+    "dia_primeiro_contato", "finalizacao_primeira", "finalizado_final",
+    "target_sup", "status_atraso", "late_sup_atraso",  # <<< IMPORTANTE
+]
 
+# membros e metas são consultados em paralelo (a página espera o mais lento)
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql_membros)
+    frames = load_tables({"df": ("membros", COLUMNS), "dfm": "metas"})
+df = frames["df"]
 
 if df.empty:
     st.info("Sem registros na tabela.")
     st.stop()
 
 # 👉 Atualiza o carimbo de tempo no rodapé da sidebar
-last_updated_str = pd.Timestamp.now(tz=TZ).strftime('%d/%m/%Y %H:%M:%S')
+last_updated_str = fetched_at("membros").strftime('%d/%m/%Y %H:%M:%S')
 _sb_last_placeholder.caption(f"🕒 Última atualização: {last_updated_str}")
 
 # ========= Filtro por titularidade =========
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str):
-        return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low:
-        return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low):
-        return "Pagante"
-    return "Pagante"
-
-df["tipo_titularidade"] = df["titularidade"].apply(classifica_tit)
 tit_choice = st.session_state.get("tit_choice")
 fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
 
 # ========= KPIs (alinhados ao main.py) =========
 # Base = TODAS as linhas após os filtros (contagem simples)
 base_df = fdf.copy()
-membros_com_gestor = int(len(base_df))
-
-
 fdf_dt = fdf.copy()
-fin1 = pd.to_datetime(fdf_dt["finalizacao_primeira"], errors="coerce")
-fin2 = pd.to_datetime(fdf_dt["finalizado_final"],    errors="coerce")
-d1   = pd.to_datetime(fdf_dt["data_primeiro_contato"], errors="coerce")
-
-# Mantemos target_sup para os gráficos abaixo
-target_tbl = pd.to_datetime(fdf_dt.get("target_sup"), errors="coerce")
-d1_norm    = d1.dt.tz_localize(None).dt.normalize()
-tsup_eff   = target_tbl.fillna(d1_norm + pd.Timedelta(days=7))
-today_naive = pd.Timestamp.now(tz=TZ).normalize().tz_localize(None)
-
-# ---- Lógica da 2ª etapa igual ao main.py (usa 'late_sup_atraso') ----
-late_str = fdf_dt.get("late_sup_atraso")
-if late_str is not None:
-    late_str = late_str.astype(str).str.strip()
+
+# contagens calculadas no BigQuery (analyzer/kpis.py, conjunto "geral");
+# None = pushdown desligado ou job que não rodou -> cálculo em pandas
+_kpi = pushdown_counts("membros", "geral", tit_choice=tit_choice) if kpi_pushdown("membros") else None
+if _kpi is not None:
+    membros_com_gestor = _kpi["membros_com_gestor"]
+    finalizados_geral  = _kpi["finalizados_geral"]
+    pendentes_segunda  = _kpi["pendentes_segunda"]
+    atrasados_segunda  = _kpi["atrasados_segunda"]
 else:
-    late_str = pd.Series("", index=fdf_dt.index)
+    membros_com_gestor = int(len(base_df))
 
-mask_f2_vazio = fin2.isna()
+    # datas já datetime64 e dia do 1º contato já derivado (normalização no loader)
+    fin1 = fdf_dt["finalizacao_primeira"]
+    fin2 = fdf_dt["finalizado_final"]
 
-# ---- Lógica da 2ª etapa (Geral) — baseada em data_primeiro_contato ----
-# Série de datas
-fin2 = pd.to_datetime(fdf_dt["finalizado_final"],    errors="coerce")
-d1   = pd.to_datetime(fdf_dt["data_primeiro_contato"], errors="coerce")
+    # Mantemos target_sup para os gráficos abaixo
+    target_tbl = fdf_dt["target_sup"]
+    d1_norm    = fdf_dt["dia_primeiro_contato"]
+    tsup_eff   = target_tbl.fillna(d1_norm + pd.Timedelta(days=7))
+    today_naive = pd.Timestamp.now(tz=TZ).normalize().tz_localize(None)
+
+    # ---- Lógica da 2ª etapa igual ao main.py (usa 'late_sup_atraso') ----
+    late_str = fdf_dt.get("late_sup_atraso")
+    if late_str is not None:
+        late_str = late_str.astype(str).str.strip()
+    else:
+        late_str = pd.Series("", index=fdf_dt.index)
 
-# Hoje sem timezone e só a data
-hoje_date = pd.Timestamp.now(tz=TZ).date()
+    mask_f2_vazio = fin2.isna()
 
-# Normaliza p/ data (naive) e calcula diferença em dias
-d1_norm    = pd.to_datetime(d1.dt.date, errors="coerce")
-dias_diff  = (pd.Timestamp(hoje_date) - d1_norm).dt.days
-dias_diff  = dias_diff.clip(lower=0)  # evita negativos se houver datas futuras
+    # ---- Lógica da 2ª etapa (Geral) — baseada em data_primeiro_contato ----
+    # Hoje sem timezone e só a data
+    hoje_date = pd.Timestamp.now(tz=TZ).date()
 
-# Regras: não finalizado + (<=7 dias = Pendente | >7 = Atrasado)
-mask_sem_final    = fin2.isna()
-pendentes_segunda = int((mask_sem_final & (dias_diff <= 7)).sum())
-atrasados_segunda = int((mask_sem_final & (dias_diff > 7)).sum())
+    # Diferença em dias até o dia do 1º contato
+    dias_diff  = (pd.Timestamp(hoje_date) - d1_norm).dt.days
+    dias_diff  = dias_diff.clip(lower=0)  # evita negativos se houver datas futuras
 
-# Finalizados (Geral)
-finalizados_geral = int(fin2.notna().sum())
+    # Regras: não finalizado + (<=7 dias = Pendente | >7 = Atrasado)
+    mask_sem_final    = fin2.isna()
+    pendentes_segunda = int((mask_sem_final & (dias_diff <= 7)).sum())
+    atrasados_segunda = int((mask_sem_final & (dias_diff > 7)).sum())
+
+    # Finalizados (Geral)
+    finalizados_geral = int(fin2.notna().sum())
 
 
 def fmt_int(n) -> str:
@@ -268,14 +242,7 @@ st.divider()
 # ========= GRÁFICO DE METAS (FORECAST) =========
 st.subheader("🎯 Metas (Acumulado) — Forecast")
 
-sql_metas = f"""
-SELECT Data, FinalizadoAcumulado, MetaAcumulado
-FROM {METAS_FQN}
-WHERE Data <= CURRENT_DATE("{TZ}")
-ORDER BY Data
--- cache_bust:{cache_bust}
-"""
-dfm = run_query(sql_metas)
+dfm = sort_rows(frames["dfm"], "metas")   # série em ordem de Data
 
 if dfm.empty:
     st.info("Sem dados na tabela de metas.")
@@ -371,11 +338,10 @@ col_left, col_right = st.columns(2, gap="large")
 # ----- Atrasados por dia (Target SUP) -----
 with col_left:
     st.subheader("⏰ Atrasados por dia (Target SUP)")
-    fin1_dt = pd.to_datetime(fdf_dt["finalizacao_primeira"], errors="coerce")
-    fin2_dt = pd.to_datetime(fdf_dt["finalizado_final"],    errors="coerce")
-    target_tbl = pd.to_datetime(fdf_dt.get("target_sup"), errors="coerce")
-    d1   = pd.to_datetime(fdf_dt["data_primeiro_contato"], errors="coerce")
-    d1_norm = d1.dt.tz_localize(None).dt.normalize()
+    fin1_dt = fdf_dt["finalizacao_primeira"]
+    fin2_dt = fdf_dt["finalizado_final"]
+    target_tbl = fdf_dt["target_sup"]
+    d1_norm = fdf_dt["dia_primeiro_contato"]
     tsup_eff = target_tbl.fillna(d1_norm + pd.Timedelta(days=7))
     today_naive = pd.Timestamp.now(tz=TZ).normalize().tz_localize(None)
 
@@ -452,11 +418,10 @@ with col_left:
 # ----- Atrasados por status -----
 with col_right:
     st.subheader("🚩 Atrasados por status")
-    fin1_dt = pd.to_datetime(fdf_dt["finalizacao_primeira"], errors="coerce")
-    fin2_dt = pd.to_datetime(fdf_dt["finalizado_final"],    errors="coerce")
-    target_tbl = pd.to_datetime(fdf_dt.get("target_sup"), errors="coerce")
-    d1   = pd.to_datetime(fdf_dt["data_primeiro_contato"], errors="coerce")
-    d1_norm = d1.dt.tz_localize(None).dt.normalize()
+    fin1_dt = fdf_dt["finalizacao_primeira"]
+    fin2_dt = fdf_dt["finalizado_final"]
+    target_tbl = fdf_dt["target_sup"]
+    d1_norm = fdf_dt["dia_primeiro_contato"]
     tsup_eff = target_tbl.fillna(d1_norm + pd.Timedelta(days=7))
     today_naive = pd.Timestamp.now(tz=TZ).normalize().tz_localize(None)
 
@@ -464,11 +429,7 @@ with col_right:
     if not mask_atrasados.any():
         st.info("Sem atrasados para agrupar por status.")
     else:
-        status_series = (
-            fdf_dt.loc[mask_atrasados, "status_atraso"]
-                 .astype(str).str.strip().replace({"": "—"})
-                 .fillna("—")
-        )
+        status_series = dim_labels(fdf_dt.loc[mask_atrasados, "status_atraso"], "—")
         g2 = status_series.value_counts().reset_index()
         g2.columns = ["status", "qtd"]
 
@@ -1,17 +1,14 @@
 # pages/Atrasados-aldeia.py
-import os
 from pathlib import Path
 import pandas as pd
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 from streamlit_echarts import st_echarts
 
+from analyzer import dim_labels, fetched_at, get_auth_mode, get_client, load_table, prewarm_caption, refresh_versions, start_prewarm
+
 # ========= Config =========
 st.set_page_config(page_title="Analyzer — Atrasados (Aldeia)", layout="wide")
 
-PROJECT_ID   = "leads-ts"
-MEMBROS_FQN  = "`leads-ts.Analyzer.aldeia_2026_s`"
 TZ           = "America/Sao_Paulo"
 
 # ========= Paleta =========
@@ -30,15 +27,10 @@ load_css("base.css", "sidebar.css", "dashboards.css")
 # ========= SIDEBAR =========
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
-
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now_atr"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
     st.rerun()
 
-cache_bust = f"{st.session_state.refresh_key}"
-
 st.sidebar.divider()
 st.sidebar.markdown('<div class="sb-box">', unsafe_allow_html=True)
 
@@ -54,15 +46,11 @@ if st.sidebar.button("🎟️ Presenciais", use_container_width=True, key="nav_p
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.divider()
 
-auth_mode = "secrets" if "gcp_service_account" in st.secrets else (
-    "arquivo local" if os.getenv("GOOGLE_APPLICATION_CREDENTIALS") else "desconhecido"
-)
-
 st.sidebar.markdown('<div class="sb-grow"></div>', unsafe_allow_html=True)
 st.sidebar.markdown('<div class="sb-footer">', unsafe_allow_html=True)
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
@@ -152,88 +140,48 @@ section.main div[data-testid="stHorizontalBlock"] .stToggle { transform: scale(.
 """, unsafe_allow_html=True)
 
 # ========= BigQuery =========
-def get_bq_client():
-    try:
-        if "gcp_service_account" in st.secrets:
-            creds = service_account.Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-            return bigquery.Client(project=st.secrets.get("gcp_project_id", PROJECT_ID), credentials=creds)
-        return bigquery.Client(project=PROJECT_ID)
-    except Exception as e:
-        st.error("Falha ao criar o client do BigQuery.")
-        st.exception(e)
-        st.stop()
-
-@st.cache_data(show_spinner=False)
-def run_query(sql: str):
-    client = get_bq_client()
-    return client.query(sql).result().to_dataframe(create_bqstorage_client=False)
-
-def find_col(dataframe: pd.DataFrame, candidates):
-    cols_lower = {c.lower(): c for c in dataframe.columns}
-    for cand in candidates:
-        if cand.lower() in cols_lower:
-            return cols_lower[cand.lower()]
-    return None
+try:
+    get_client()
+except Exception as e:
+    st.error("Falha ao criar o client do BigQuery.")
+    st.exception(e)
+    st.stop()
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
 
 # ========= Dados base =========
-sql_membros = f"""
-SELECT *
-FROM {MEMBROS_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+# "equipe" é resolvida pelo schema entre equipe/broker/brokers/corretora/
+# empresa/gestor (analyzer/planner.py) e chega com esse nome
+COLUMNS = ["email_ok", "tipo_titularidade", "target_sup", "finalizacao_primeira", "finalizado_final"]
+
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql_membros)
+    df = load_table("aldeia", COLUMNS, roles=["equipe"])
 
 if df.empty:
     st.info("Sem registros na tabela.")
     st.stop()
 
 _sb_last_placeholder.caption(
-    f"🕒 Última atualização: {pd.Timestamp.now(tz=TZ).strftime('%d/%m/%Y %H:%M:%S')}"
+    f"🕒 Última atualização: {fetched_at('aldeia').strftime('%d/%m/%Y %H:%M:%S')}"
 )
 
-BROKER_COL = find_col(df, ["equipe", "broker", "brokers", "corretora", "empresa"])
-if BROKER_COL is None and "gestor" in df.columns:
-    BROKER_COL = "gestor"
+BROKER_COL = "equipe" if "equipe" in df.columns else None
 
 # ========= Helpers =========
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str):
-        return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low:
-        return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low):
-        return "Pagante"
-    return "Pagante"
-
-def is_filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    empty = s_low.isin(["", "nan", "none", "null", "nat"])
-    return ~empty
-
 def parse_bq_date(series: pd.Series) -> pd.Series:
-    s = series.astype("string").str.strip()
-    s = s.replace({
-        "": pd.NA,
-        "nan": pd.NA,
-        "None": pd.NA,
-        "none": pd.NA,
-        "null": pd.NA,
-        "NaT": pd.NA,
-        "<NA>": pd.NA
-    })
-    return pd.to_datetime(s, errors="coerce").dt.normalize()
+    # colunas tipadas no SELECT (analyzer/config.py, "types") chegam do loader
+    # já como datetime64 (normalização por versão): só trunca no dia
+    return series.dt.normalize()
 
 # ========= Filtro por titularidade =========
-df["tipo_titularidade"] = df.get("titularidade", "").apply(classifica_tit) if "titularidade" in df.columns else "Pagante"
 tit_choice = st.session_state.get("tit_choice")
 fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
 
 # ========= Métricas base =========
-email_ok = is_filled(fdf["email"]) if "email" in fdf.columns else pd.Series([False] * len(fdf), index=fdf.index)
+email_ok = fdf["email_ok"] if "email_ok" in fdf.columns else pd.Series([False] * len(fdf), index=fdf.index)
 
 target_sup_dt = parse_bq_date(fdf["target_sup"]) if "target_sup" in fdf.columns else pd.Series([pd.NaT] * len(fdf), index=fdf.index)
 fin1_dt = parse_bq_date(fdf["finalizacao_primeira"]) if "finalizacao_primeira" in fdf.columns else pd.Series([pd.NaT] * len(fdf), index=fdf.index)
@@ -380,11 +328,7 @@ st.markdown('<div class="panel" style="margin-top:12px;">', unsafe_allow_html=Tr
 st.markdown('<div class="chart-title">Atrasados Geral por Equipe</div>', unsafe_allow_html=True)
 
 if BROKER_COL:
-    serie_equipe = (
-        fdf.loc[atrasados_segunda_mask, BROKER_COL]
-            .fillna("Sem equipe").astype(str).str.strip()
-            .replace({"": "Sem equipe", "nan": "Sem equipe", "None": "Sem equipe"})
-    )
+    serie_equipe = dim_labels(fdf.loc[atrasados_segunda_mask, BROKER_COL], "Sem equipe")
     counts = (
         serie_equipe.value_counts(dropna=False)
                     .rename_axis("Equipe").reset_index(name="Quantidade")
@@ -405,10 +349,7 @@ st.markdown('</div>', unsafe_allow_html=True)
 st.markdown('<div class="panel" style="margin-top:12px;">', unsafe_allow_html=True)
 
 if BROKER_COL:
-    equipe_norm = (
-        fdf[BROKER_COL].fillna("Sem equipe").astype(str).str.strip()
-           .replace({"": "Sem equipe", "nan": "Sem equipe", "None": "Sem equipe"})
-    )
+    equipe_norm = dim_labels(fdf[BROKER_COL], "Sem equipe")
 
     mask1 = atrasados_primeira_mask
     mask2 = atrasados_segunda_mask
@@ -434,7 +375,7 @@ if BROKER_COL:
     })
 
     tabela = (
-        base.groupby("Equipe", dropna=False, as_index=False).sum(numeric_only=True)
+        base.groupby("Equipe", dropna=False, as_index=False, observed=True).sum(numeric_only=True)
             .sort_values(["Atrasados 2º Target", "Atrasados 1º Target"], ascending=[False, False])
     )
 
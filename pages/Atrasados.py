@@ -1,18 +1,16 @@
 # pages/Atrasados.py
-import os
 from pathlib import Path
 import pandas as pd
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 import altair as alt  # ainda útil se quiser
 from streamlit_echarts import st_echarts
 
+from analyzer import dim_labels, fetched_at, get_auth_mode, get_client, load_table, prewarm_caption, refresh_versions, start_prewarm
+from analyzer.kpis import kpi_pushdown, pushdown_counts
+
 # ========= Config =========
 st.set_page_config(page_title="Analyzer — Atrasados", layout="wide")
 
-PROJECT_ID   = "leads-ts"
-MEMBROS_FQN  = "`leads-ts.Analyzer.membros_2026_s`"
 TZ           = "America/Sao_Paulo"
 
 # ========= CSS externo =========
@@ -27,11 +25,8 @@ load_css("base.css", "sidebar.css", "dashboards.css")
 # ========= SIDEBAR =========
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now_atr"):
-    st.session_state.refresh_key += 1
-cache_bust = f"{st.session_state.refresh_key}"
+    refresh_versions()
 
 st.sidebar.divider()
 st.sidebar.markdown('<div class="sb-box">', unsafe_allow_html=True)
@@ -44,16 +39,12 @@ st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
 st.sidebar.divider()
 
-auth_mode = "secrets" if "gcp_service_account" in st.secrets else (
-    "arquivo local" if os.getenv("GOOGLE_APPLICATION_CREDENTIALS") else "desconhecido"
-)
-
 # espaço flexível + rodapé fixo
 st.sidebar.markdown('<div class="sb-grow"></div>', unsafe_allow_html=True)
 st.sidebar.markdown('<div class="sb-footer">', unsafe_allow_html=True)
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
@@ -143,35 +134,25 @@ section.main div[data-testid="stHorizontalBlock"] .stToggle { transform: scale(.
 """, unsafe_allow_html=True)
 
 # ========= BigQuery =========
-def get_bq_client():
-    try:
-        if "gcp_service_account" in st.secrets:
-            creds = service_account.Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-            return bigquery.Client(project=st.secrets.get("gcp_project_id", PROJECT_ID), credentials=creds)
-        return bigquery.Client(project=PROJECT_ID)
-    except Exception as e:
-        st.error("Falha ao criar o client do BigQuery.")
-        st.exception(e)
-        st.stop()
-
-@st.cache_data(show_spinner=False)
-def run_query(sql: str):
-    client = get_bq_client()
-    return client.query(sql).result().to_dataframe(create_bqstorage_client=False)
+try:
+    get_client()
+except Exception as e:
+    st.error("Falha ao criar o client do BigQuery.")
+    st.exception(e)
+    st.stop()
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
 
 # ========= Dados base =========
-sql_membros = f"""
-SELECT
-  id, gestor, email, telefone, titularidade,
-  data_primeiro_contato, finalizacao_primeira, finalizado_final,
-  target_sup, status_atraso, updated_at, ingestion_time,
-  late_sup_atraso
-FROM {MEMBROS_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+COLUMNS = [
+    "id", "gestor", "email_ok", "tipo_titularidade",
+    "finalizacao_primeira", "finalizado_final", "target_sup",
+]
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql_membros)
+    df = load_table("membros", COLUMNS)
 
 if df.empty:
     st.info("Sem registros na tabela.")
@@ -179,39 +160,24 @@ if df.empty:
 
 # 👉 Atualiza carimbo de tempo no rodapé da sidebar
 _sb_last_placeholder.caption(
-    f"🕒 Última atualização: {pd.Timestamp.now(tz=TZ).strftime('%d/%m/%Y %H:%M:%S')}"
+    f"🕒 Última atualização: {fetched_at('membros').strftime('%d/%m/%Y %H:%M:%S')}"
 )
 
 # ========= Filtro por titularidade =========
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str): return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low: return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low): return "Pagante"
-    return "Pagante"
-
-df["tipo_titularidade"] = df["titularidade"].apply(classifica_tit)
 tit_choice = st.session_state.get("tit_choice")
 fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
 
 # ========= Métricas base (ALINHADAS COM main.py) =========
 
-def is_filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    empty = s_low.isin(["", "nan", "none", "null", "nat"])
-    return ~empty
+email_ok = fdf["email_ok"]   # email preenchido (flag calculada no loader)
 
-email_ok = is_filled(fdf["email"])
+# datas tipadas no SELECT e normalizadas no loader (datetime64): preenchida = data válida
+fin1_dt = fdf["finalizacao_primeira"]
+fin2_dt = fdf["finalizado_final"]
+fin1_filled = fin1_dt.notna()
+fin2_filled = fin2_dt.notna()
 
-fin1_raw = fdf["finalizacao_primeira"]
-fin2_raw = fdf["finalizado_final"]
-target_raw = fdf["target_sup"]
-
-fin1_filled = is_filled(fin1_raw)
-fin2_filled = is_filled(fin2_raw)
-
-target_dt = pd.to_datetime(target_raw, errors="coerce")
+target_dt = fdf["target_sup"]
 today = pd.Timestamp.now(tz=TZ).tz_localize(None).normalize()
 
 # corte da 1ª etapa = target_sup - 5 dias
@@ -229,7 +195,6 @@ atrasados_primeira = int(atrasados_primeira_mask.sum())
 
 # resolvidos com atraso 1ª etapa:
 # finalizou a 1ª etapa, mas finalizou depois do corte da 1ª etapa
-fin1_dt = pd.to_datetime(fin1_raw, errors="coerce")
 fin1_norm = fin1_dt.dt.tz_localize(None).dt.normalize()
 
 resolvidos_atraso_1 = int(
@@ -259,7 +224,6 @@ atrasados_segunda = int(atrasados_segunda_mask.sum())
 
 # resolvidos com atraso 2ª etapa:
 # finalizado_final preenchido, mas depois do target_sup
-fin2_dt = pd.to_datetime(fin2_raw, errors="coerce")
 fin2_norm = fin2_dt.dt.tz_localize(None).dt.normalize()
 
 resolvidos_atraso_2 = int(
@@ -280,6 +244,20 @@ ate7_2    = int((atrasados_segunda_mask & over2_days.between(1, 7)).sum())
 de8a14_2  = int((atrasados_segunda_mask & over2_days.between(8, 14)).sum())
 acima15_2 = int((atrasados_segunda_mask & (over2_days >= 15)).sum())
 
+# Cards no BigQuery (analyzer/kpis.py, conjunto "atrasos"); as máscaras
+# acima continuam alimentando os gráficos e a tabela por gestor
+_kpi = pushdown_counts("membros", "atrasos", tit_choice=tit_choice) if kpi_pushdown("membros") else None
+if _kpi is not None:
+    membros_com_gestor  = _kpi["membros_com_gestor"]
+    atrasados_primeira  = _kpi["atrasados_primeira"]
+    resolvidos_atraso_1 = _kpi["resolvidos_atraso_1"]
+    ate7_1, de8a14_1, acima15_1 = _kpi["ate7_1"], _kpi["de8a14_1"], _kpi["acima15_1"]
+    atrasados_segunda   = _kpi["atrasados_segunda"]
+    resolvidos_atraso_2 = _kpi["resolvidos_atraso_2"]
+    ate7_2, de8a14_2, acima15_2 = _kpi["ate7_2"], _kpi["de8a14_2"], _kpi["acima15_2"]
+    total_atrasados_1 = resolvidos_atraso_1 + atrasados_primeira
+    total_atrasados_2 = resolvidos_atraso_2 + atrasados_segunda
+
 # ========= Helpers de UI =========
 def fmt_num(n:int) -> str:
     try: return f"{int(n):,}".replace(",", ".")
@@ -381,11 +359,7 @@ st.markdown('<div class="panel" style="margin-top:12px;">', unsafe_allow_html=Tr
 st.markdown('<div class="chart-title">Atrasados Geral por Gestor</div>', unsafe_allow_html=True)
 
 if "gestor" in fdf.columns:
-    serie_gestor = (
-        fdf.loc[atrasados_segunda_mask, "gestor"]
-           .fillna("Sem gestor").astype(str).str.strip()
-           .replace({"": "Sem gestor", "nan": "Sem gestor", "None": "Sem gestor"})
-    )
+    serie_gestor = dim_labels(fdf.loc[atrasados_segunda_mask, "gestor"], "Sem gestor")
     counts = (
         serie_gestor.value_counts(dropna=False)
                     .rename_axis("Gestor").reset_index(name="Quantidade")
@@ -406,10 +380,7 @@ st.markdown('</div>', unsafe_allow_html=True)
 st.markdown('<div class="panel" style="margin-top:12px;">', unsafe_allow_html=True)
 
 if "gestor" in fdf.columns:
-    gestor_norm = (
-        fdf["gestor"].fillna("Sem gestor").astype(str).str.strip()
-           .replace({"": "Sem gestor", "nan": "Sem gestor", "None": "Sem gestor"})
-    )
+    gestor_norm = dim_labels(fdf["gestor"], "Sem gestor")
 
     mask1 = atrasados_primeira_mask
     mask2 = atrasados_segunda_mask
@@ -435,7 +406,7 @@ if "gestor" in fdf.columns:
     })
 
     tabela = (
-        base.groupby("Gestor", dropna=False, as_index=False).sum(numeric_only=True)
+        base.groupby("Gestor", dropna=False, as_index=False, observed=True).sum(numeric_only=True)
             .sort_values("Atrasados 2º Target", ascending=False)
     )
 
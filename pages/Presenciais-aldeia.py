@@ -2,21 +2,16 @@
 # Analyzer – Presenciais (ALDEIA) | Streamlit (BigQuery + ECharts)
 # ============================================================
 
-import os
-import hashlib
 import pandas as pd
 import streamlit as st
 from streamlit_echarts import st_echarts
-from google.cloud import bigquery
-from google.oauth2 import service_account
+
+from analyzer import dim_labels, fetched_at, get_auth_mode, get_client, load_table, prewarm_caption, refresh_versions, sort_rows, start_prewarm
 
 
 # ---------------------------
 # 1) CONFIG
 # ---------------------------
-PROJECT_ID = "leads-ts"
-TABLE_FQN  = "`leads-ts.Analyzer.aldeia_presenciais_s`"
-
 st.set_page_config(page_title="Analyzer – Presenciais (ALDEIA)", layout="wide")
 
 ACCENT_GREEN = "#C9E34F"
@@ -87,10 +82,8 @@ div[data-testid="stSidebarNavSearch"] { display:none !important; }
 st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 
 # refresh
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now_pres"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
     st.rerun()
 
 st.sidebar.divider()
@@ -115,95 +108,45 @@ with st.sidebar.container():
 st.sidebar.divider()
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 
 
 # ---------------------------
 # 3) AUTENTICAÇÃO BIGQUERY
 # ---------------------------
-auth_mode = "desconhecido"
 try:
-    if "gcp_service_account" in st.secrets:
-        PROJECT_ID = st.secrets.get("gcp_project_id", "leads-ts")
-        creds = service_account.Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-        bq = bigquery.Client(project=PROJECT_ID, credentials=creds)
-        auth_mode = "secrets"
-    else:
-        SA_PATH = r"C:\Users\mateu\StreamLit\OtavioPermissao.json"
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = SA_PATH
-        bq = bigquery.Client(project=PROJECT_ID)
-        auth_mode = "arquivo local"
+    get_client()
 except Exception as e:
     st.error("Falha ao criar o client do BigQuery. Verifique os secrets/JSON.")
     st.exception(e)
     st.stop()
 
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
 
 
 # ---------------------------
 # 4) QUERY + CACHE
 # ---------------------------
-@st.cache_data(show_spinner=False)
-def run_query(sql: str) -> pd.DataFrame:
-    job = bq.query(sql)
-    return job.result().to_dataframe(create_bqstorage_client=False)
-
-cache_bust = f"{st.session_state.refresh_key}"
-
-sql = f"""
-SELECT
-  status_atraso,
-  detalhamento_prox_passos,
-  data_ultima_att,
-  dias_na_aldeia,
-  data_primeiro_contato,
-  turma,
-  titularidade,
-  nome,
-  email,
-  telefone,
-  observacao,
-  conta_titular,
-  validacao_titular,
-  mt5_titular,
-  id_titular,
-  contrato_data_titular,
-  bonus_titular,
-  nome_adicional,
-  email_adicional,
-  telefone_adicional,
-  id_adicional,
-  bonus_adicional,
-  finalizacao_1_etapa,
-  cancelamento,
-  broker,
-  ingestion_time
-FROM {TABLE_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
-
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql)
+    df = load_table("presenciais")
 
 if df.empty:
     st.warning("Nenhum registro encontrado na tabela de Presenciais.")
     st.stop()
 
-last_updated_str = pd.Timestamp.now(tz="America/Sao_Paulo").strftime("%d/%m/%Y %H:%M:%S")
+last_updated_str = fetched_at("presenciais").strftime("%d/%m/%Y %H:%M:%S")
 _sb_last_placeholder.caption(f"🕒 Última atualização: {last_updated_str}")
 
 
 # ---------------------------
 # 5) HASH LOCAL
 # ---------------------------
-def make_hash(email, phone):
-    e = str(email or "").strip().lower()
-    p = "".join([c for c in str(phone or "") if c.isdigit()])
-    raw = f"{e}_{p}"
-    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:12] if raw != "_" else None
-
-df["hash_id"] = [make_hash(e, p) for e, p in zip(df.get("email"), df.get("telefone"))]
+# hash_id (email + telefone) já vem calculado pelo loader: é a chave do
+# sync incremental da tabela (ver analyzer/loader.py)
 
 
 # ---------------------------
@@ -222,16 +165,16 @@ st.divider()
 # ---------------------------
 # Helpers
 # ---------------------------
-def filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip().str.lower()
-    return ~s.isin(["", "nan", "none", "null", "nat"])
+def filled(df_: pd.DataFrame, col: str) -> pd.Series:
+    # "<col>_ok" vem do loader (sentinelas "", "nan", "none"... já viraram NULL)
+    flag = f"{col}_ok"
+    return df_[flag] if flag in df_.columns else pd.Series(False, index=df_.index)
 
 def uniq_opts(df_: pd.DataFrame, col: str):
     if col not in df_.columns:
         return []
-    s = df_[col].astype(str).str.strip()
-    s = s[~s.str.lower().isin(["", "nan", "none", "null", "nat"])]
-    return sorted(s.unique().tolist())
+    # categórica do loader: já sem espaços nas pontas e sentinelas como NULL
+    return sorted(df_[col].dropna().unique().tolist())
 
 def fmt_int(n: int) -> str:
     return f"{int(n):,}".replace(",", ".")
@@ -361,15 +304,15 @@ with c5:
 fdf = df.copy()
 
 if turma_sel and "turma" in fdf.columns:
-    fdf = fdf[fdf["turma"].astype(str).str.strip().isin(turma_sel)]
+    fdf = fdf[fdf["turma"].isin(turma_sel)]
 if conta_sel and "conta_titular" in fdf.columns:
-    fdf = fdf[fdf["conta_titular"].astype(str).str.strip().isin(conta_sel)]
+    fdf = fdf[fdf["conta_titular"].isin(conta_sel)]
 if valid_sel and "validacao_titular" in fdf.columns:
-    fdf = fdf[fdf["validacao_titular"].astype(str).str.strip().isin(valid_sel)]
+    fdf = fdf[fdf["validacao_titular"].isin(valid_sel)]
 if mt5_sel and "mt5_titular" in fdf.columns:
-    fdf = fdf[fdf["mt5_titular"].astype(str).str.strip().isin(mt5_sel)]
+    fdf = fdf[fdf["mt5_titular"].isin(mt5_sel)]
 if broker_sel and "broker" in fdf.columns:
-    fdf = fdf[fdf["broker"].astype(str).str.strip().isin(broker_sel)]
+    fdf = fdf[fdf["broker"].isin(broker_sel)]
 
 if fdf.empty:
     st.info("Sem registros para os filtros atuais.")
@@ -379,10 +322,10 @@ if fdf.empty:
 # ---------------------------
 # 8) KPIs (agora em GRID HTML com gap pequeno)
 # ---------------------------
-has_tel    = filled(fdf["telefone"]) if "telefone" in fdf.columns else pd.Series(False, index=fdf.index)
-has_broker = filled(fdf["broker"])   if "broker" in fdf.columns else pd.Series(False, index=fdf.index)
-has_fin1   = filled(fdf["finalizacao_1_etapa"]) if "finalizacao_1_etapa" in fdf.columns else pd.Series(False, index=fdf.index)
-has_add    = filled(fdf["nome_adicional"]) if "nome_adicional" in fdf.columns else pd.Series(False, index=fdf.index)
+has_tel    = filled(fdf, "telefone")
+has_broker = filled(fdf, "broker")
+has_fin1   = filled(fdf, "finalizacao_1_etapa")
+has_add    = filled(fdf, "nome_adicional")
 
 base_tel_broker = has_tel & has_broker
 total_base = int(base_tel_broker.sum())
@@ -409,10 +352,11 @@ st.divider()   # ✅ fica SÓ a linha (sem wrapper que gerava a “forma solta
 # ---------------------------
 st.subheader("📊 Entradas por dia (Data de 1º contato)")
 
-if "data_primeiro_contato" not in fdf.columns:
+if "dia_primeiro_contato" not in fdf.columns:
     st.info("Coluna data_primeiro_contato não encontrada.")
 else:
-    d = pd.to_datetime(fdf["data_primeiro_contato"], errors="coerce").dt.normalize()
+    # dia do primeiro contato já derivado no loader (uma vez por versão)
+    d = fdf["dia_primeiro_contato"]
 
     tmp_day = fdf.copy()
     tmp_day["_dia"] = d
@@ -456,11 +400,11 @@ st.divider()
 st.subheader("📊 Resumo por equipe (Broker)")
 
 tmp = fdf.copy()
-tmp["_broker_norm"] = tmp["broker"].astype(str).str.strip().replace({"": "—"}) if "broker" in tmp.columns else "—"
-tmp["_has_tel"] = filled(tmp["telefone"]) if "telefone" in tmp.columns else False
-tmp["_has_broker"] = filled(tmp["broker"]) if "broker" in tmp.columns else False
+tmp["_broker_norm"] = dim_labels(tmp["broker"], "—") if "broker" in tmp.columns else "—"
+tmp["_has_tel"] = filled(tmp, "telefone")
+tmp["_has_broker"] = filled(tmp, "broker")
 tmp["_base"] = tmp["_has_tel"] & tmp["_has_broker"]
-tmp["_fin1"] = filled(tmp["finalizacao_1_etapa"]) if "finalizacao_1_etapa" in tmp.columns else False
+tmp["_fin1"] = filled(tmp, "finalizacao_1_etapa")
 
 base_rows = tmp[tmp["_base"]].copy()
 
@@ -469,7 +413,7 @@ if base_rows.empty:
 else:
     resumo = (
         base_rows
-        .groupby("_broker_norm", dropna=False)
+        .groupby("_broker_norm", observed=True)
         .agg(
             registros=("telefone", "size"),
             finalizados_1_etapa=("_fin1", "sum"),
@@ -497,11 +441,12 @@ st.divider()
 # ---------------------------
 st.subheader("📋 Base (espelho do Google Sheets)")
 
-base = fdf.copy()
+# mais recentes primeiro (o fetch vem sem ORDER BY)
+base = sort_rows(fdf, "presenciais").copy()
 
-has_add_tbl = filled(base["nome_adicional"]) if "nome_adicional" in base.columns else pd.Series(False, index=base.index)
-has_fin1_tbl = filled(base["finalizacao_1_etapa"]) if "finalizacao_1_etapa" in base.columns else pd.Series(False, index=base.index)
-has_cancel_tbl = filled(base["cancelamento"]) if "cancelamento" in base.columns else pd.Series(False, index=base.index)
+has_add_tbl = filled(base, "nome_adicional")
+has_fin1_tbl = filled(base, "finalizacao_1_etapa")
+has_cancel_tbl = filled(base, "cancelamento")
 
 base["adicional_flag"] = has_add_tbl.map(lambda x: "SIM" if x else "NÃO")
 base["status_1_etapa"] = has_fin1_tbl.map(lambda x: "REALIZADO" if x else "PENDENTE")
@@ -2,23 +2,19 @@
 # Analyzer – Dashboard Streamlit (BigQuery + Altair + ECharts)
 # ============================================================
 
-import os
 import math
 import pandas as pd
 import numpy as np
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
 import altair as alt
 from streamlit_echarts import st_echarts
 import textwrap
 
+from analyzer import dim_labels, fetched_at, filter_options, get_auth_mode, get_client, load_filtered, prewarm_caption, refresh_versions, start_prewarm
+
 # ---------------------------
 # 1) CONFIG & STREAMLIT BASE
 # ---------------------------
-PROJECT_ID = "leads-ts"
-TABLE_FQN  = "`leads-ts.Analyzer.aldeia_2026_s`"
-
 st.set_page_config(page_title="Analyzer (ALDEIA)", layout="wide")
 
 # === PALETAS ===
@@ -72,11 +68,9 @@ st.sidebar.markdown('<div class="sb-wrap">', unsafe_allow_html=True)
 # ---------------------------
 # BOTÃO DE ATUALIZAR
 # ---------------------------
-if "refresh_key" not in st.session_state:
-    st.session_state.refresh_key = 0
 
 if st.sidebar.button("🔄 Atualizar agora", use_container_width=True, key="btn_refresh_now"):
-    st.session_state.refresh_key += 1
+    refresh_versions()
     st.rerun()
 
 st.sidebar.divider()
@@ -100,86 +94,49 @@ st.sidebar.divider()
 
 _sb_auth_placeholder = st.sidebar.empty()
 _sb_last_placeholder = st.sidebar.empty()
+_sb_prewarm_placeholder = st.sidebar.empty()   # progresso do pré-aquecimento
 
 # ---------------------------
 # 2) AUTENTICAÇÃO BIGQUERY
 # ---------------------------
-auth_mode = "desconhecido"
 try:
-    if "gcp_service_account" in st.secrets:
-        PROJECT_ID = st.secrets.get("gcp_project_id", "leads-ts")
-        creds = service_account.Credentials.from_service_account_info(st.secrets["gcp_service_account"])
-        bq = bigquery.Client(project=PROJECT_ID, credentials=creds)
-        auth_mode = "secrets"
-    else:
-        SA_PATH = r"C:\Users\mateu\StreamLit\OtavioPermissao.json"
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = SA_PATH
-        PROJECT_ID = "leads-ts"
-        bq = bigquery.Client(project=PROJECT_ID)
-        auth_mode = "arquivo local"
+    get_client()
 except Exception as e:
     st.error("Falha ao criar o client do BigQuery. Verifique os secrets/JSON.")
     st.exception(e)
     st.stop()
 
-_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {auth_mode}")
+_sb_auth_placeholder.caption(f"🔐 Modo de autenticação: {get_auth_mode()}")
+start_prewarm()   # 1ª página do processo: aquece as demais em segundo plano
+_sb_prewarm = prewarm_caption()
+if _sb_prewarm:
+    _sb_prewarm_placeholder.caption(_sb_prewarm)
+
 
 # ---------------------------
 # 3) QUERY + CACHE
 # ---------------------------
-@st.cache_data(show_spinner=False)
-def run_query(sql: str) -> pd.DataFrame:
-    job = bq.query(sql)
-    return job.result().to_dataframe(create_bqstorage_client=False)
-
-cache_bust = f"{st.session_state.refresh_key}"
-
-sql = f"""
-SELECT
-  id,
-  target_sup,
-  late_sup_atraso,
-  status_atraso,
-  detalhamento,
-  data_ultima_acao,
-  dias_na_tribo,
-  data_primeiro_contato,
-  turma, titularidade, nome, email, telefone,
-  observacao, boas_vindas, grupos,
-  mt5, conta, validacao, corretora,
-  finalizacao_primeira, gestao_data, primeira_operacao, finalizado_final,
-  ativacao, cancelamento,
-  broker,
-  empresa,
-  updated_at, ingestion_time
-FROM {TABLE_FQN}
-ORDER BY ingestion_time DESC
--- cache_bust:{cache_bust}
-"""
+
+COLUMNS = [
+    "id", "turma", "tipo_titularidade", "email_ok", "status_atraso",
+    "dia_primeiro_contato", "target_sup", "finalizacao_primeira", "finalizado_final",
+]
 
 with st.spinner("Consultando BigQuery…"):
-    df = run_query(sql)
+    # "broker" é papel: broker/brokers/corretora/empresa, o que existir no schema
+    opts = filter_options("aldeia", ["broker", "turma"], roles=["broker"])
 
-if df.empty:
+if opts["rows"] == 0:
     st.warning("Nenhum registro encontrado na tabela.")
     st.stop()
 
-last_updated_str = pd.Timestamp.now(tz='America/Sao_Paulo').strftime('%d/%m/%Y %H:%M:%S')
+last_updated_str = fetched_at("aldeia").strftime('%d/%m/%Y %H:%M:%S')
 _sb_last_placeholder.caption(f"🕒 Última atualização: {last_updated_str}")
 
-# acha a coluna de broker caso venha com outro nome
-def find_col(dataframe: pd.DataFrame, candidates):
-    cols_lower = {c.lower(): c for c in dataframe.columns}
-    for cand in candidates:
-        if cand.lower() in cols_lower:
-            return cols_lower[cand.lower()]
-    return None
-
-BROKER_COL = find_col(df, ["broker", "brokers", "corretora", "empresa"])
+BROKER_COL = "broker" if opts["broker"] is not None else None
 
-status_opts = sorted(df["status_atraso"].dropna().astype(str).unique()) if "status_atraso" in df.columns else []
-turma_opts  = sorted(df["turma"].dropna().astype(str).unique()) if "turma" in df.columns else []
-broker_opts = sorted(df[BROKER_COL].dropna().astype(str).unique()) if BROKER_COL else []
+turma_opts  = opts["turma"] or []
+broker_opts = opts["broker"] or []
 
 # ---------------------------
 # ESTADO
@@ -233,11 +190,7 @@ section.main div[data-testid="stHorizontalBlock"] .stToggle { transform: scale(.
 # ---------------------------
 st.markdown('<div class="top-controls">', unsafe_allow_html=True)
 
-_dt_all = pd.to_datetime(df["data_primeiro_contato"], errors="coerce") if "data_primeiro_contato" in df.columns else pd.Series([], dtype="datetime64[ns]")
-_periods = sorted(
-    _dt_all.dropna().dt.to_period("M").unique().tolist(),
-    key=lambda p: (p.year, p.month)
-)
+_periods = opts["meses"]
 
 MESES_PT = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
             "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
@@ -280,34 +233,23 @@ st.markdown('</div>', unsafe_allow_html=True)
 # ---------------------------
 # 5) FILTROS
 # ---------------------------
-def classifica_tit(s: str) -> str:
-    if not isinstance(s, str):
-        return "Pagante"
-    s_low = s.strip().lower()
-    if "adicional" in s_low:
-        return "Adicional"
-    if ("benef" in s_low) or ("titular" in s_low):
-        return "Pagante"
-    return "Pagante"
-
-df["tipo_titularidade"] = df["titularidade"].apply(classifica_tit) if "titularidade" in df.columns else "Pagante"
-
-tit_choice = st.session_state.get("tit_choice")
-fdf = df[df["tipo_titularidade"] == tit_choice].copy() if tit_choice in ("Pagante", "Adicional") else df.copy()
-
 broker_sel = [b for b in st.session_state.get("broker", []) if b in broker_opts]
 turma_sel  = [t for t in st.session_state.get("turma", []) if t in turma_opts]
 meses_sel  = [m for m in st.session_state.get("meses_label_sel", []) if m in labels]
 
-if BROKER_COL and broker_sel:
-    fdf = fdf[fdf[BROKER_COL].astype(str).isin(broker_sel)]
-if turma_sel:
-    fdf = fdf[fdf["turma"].astype(str).isin(turma_sel)]
+tit_choice = st.session_state.get("tit_choice")
+tit_sel = [tit_choice] if tit_choice in ("Pagante", "Adicional") else []
 
-if meses_sel:
-    _periodos_escolhidos = [label_to_period[l] for l in meses_sel if l in label_to_period]
-    dcol_period = pd.to_datetime(fdf["data_primeiro_contato"], errors="coerce").dt.to_period("M")
-    fdf = fdf[dcol_period.isin(_periodos_escolhidos)]
+# Titularidade/Equipe/Turma/Mês: local ou no BigQuery conforme o tamanho da tabela (analyzer/loader.py)
+with st.spinner("Consultando BigQuery…"):
+    fdf = load_filtered(
+        "aldeia", COLUMNS,
+        {
+            "tipo_titularidade": tit_sel, "broker": broker_sel, "turma": turma_sel,
+            "meses": [str(label_to_period[l]) for l in meses_sel],
+        },
+        roles=["broker"],
+    )
 
 if fdf.empty:
     st.info("Sem registros para os filtros atuais.")
@@ -316,30 +258,16 @@ if fdf.empty:
 # ---------------------------
 # 6) MÉTRICAS (ALINHADAS AO MAIN.PY)
 # ---------------------------
-base_df = fdf.copy()
-
-def is_filled(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip()
-    s_low = s.str.lower()
-    empty = s_low.isin(["", "nan", "none", "null", "nat"])
-    return ~empty
+base_df = fdf   # Copy-on-Write: alterações em base_df não voltam para fdf
 
 def parse_bq_date(series: pd.Series) -> pd.Series:
-    s = series.astype("string").str.strip()
-    s = s.replace({
-        "": pd.NA,
-        "nan": pd.NA,
-        "None": pd.NA,
-        "none": pd.NA,
-        "null": pd.NA,
-        "NaT": pd.NA,
-        "<NA>": pd.NA
-    })
-    return pd.to_datetime(s, errors="coerce").dt.normalize()
+    # colunas tipadas no SELECT (analyzer/config.py, "types") chegam do loader
+    # já como datetime64 (normalização por versão): só trunca no dia
+    return series.dt.normalize()
 
 email_ok = (
-    is_filled(base_df["email"])
-    if "email" in base_df.columns
+    base_df["email_ok"]
+    if "email_ok" in base_df.columns
     else pd.Series([False] * len(base_df), index=base_df.index)
 )
 
@@ -505,8 +433,8 @@ base_kpi = base_df.copy()
 if BROKER_COL and not base_kpi.empty:
     by_broker = (
         base_kpi
-        .assign(_broker=base_kpi[BROKER_COL].astype(str).str.strip().replace({"": "—"}))
-        .groupby("_broker", dropna=False)["id"].size()
+        .assign(_broker=dim_labels(base_kpi[BROKER_COL], "—"))
+        .groupby("_broker", observed=True)["id"].size()
         .reset_index(name="membros")
         .rename(columns={"_broker": "broker"})
         .sort_values("membros", ascending=False)
@@ -519,12 +447,14 @@ EXCLUDE_TURMAS = {
     "aldeia adicional", "adicional aldeia"
 }
 if not base_kpi.empty and "turma" in base_kpi.columns:
-    turma_series = base_kpi["turma"].astype(str).str.strip()
-    keep_mask = ~turma_series.str.lower().isin(EXCLUDE_TURMAS)
+    # categórica do loader: a regra roda nas categorias, o filtro nos códigos
+    turma_series = dim_labels(base_kpi["turma"], "—")
+    excluded = [t for t in turma_series.cat.categories if t.lower() in EXCLUDE_TURMAS]
+    keep_mask = ~turma_series.isin(excluded)
     by_turma = (
         base_kpi.loc[keep_mask]
-                .assign(turma=turma_series[keep_mask].replace({"": "—"}))
-                .groupby("turma", dropna=False)["id"].size()
+                .assign(turma=turma_series[keep_mask])
+                .groupby("turma", observed=True)["id"].size()
                 .reset_index(name="membros")
                 .sort_values("membros", ascending=False)
     )
@@ -535,8 +465,9 @@ else:
 # 10) Calendário estilizado
 # ---------------------------
 st.subheader("📅 Entradas por dia (Primeiro Contato)")
-if "data_primeiro_contato" in base_df.columns and base_df["data_primeiro_contato"].notna().any():
-    ts = pd.to_datetime(base_df["data_primeiro_contato"], errors="coerce").dropna()
+if "dia_primeiro_contato" in base_df.columns and base_df["dia_primeiro_contato"].notna().any():
+    # dia do primeiro contato já derivado no loader (uma vez por versão)
+    ts = base_df["dia_primeiro_contato"].dropna()
     if not ts.empty:
         hoje_cal = pd.Timestamp.today()
         c1, c2 = st.columns(2)
@@ -550,7 +481,7 @@ if "data_primeiro_contato" in base_df.columns and base_df["data_primeiro_contato
         end   = start + pd.offsets.MonthEnd(1)
         counts = (
             ts[(ts.dt.year == ano) & (ts.dt.month == mes)]
-              .dt.normalize().value_counts()
+              .value_counts()
               .rename_axis("date").reset_index(name="qtd")
         )
         cal = pd.DataFrame({"date": pd.date_range(start, end, freq="D")})
@@ -722,23 +653,15 @@ if base_df.empty or not BROKER_COL:
     st.info("Sem registros ou coluna de Equipe ausente para montar a tabela.")
 else:
     g = base_df.copy()
-    equipe_norm = (
-        g[BROKER_COL].fillna("Sem equipe").astype(str).str.strip()
-         .replace({"": "Sem equipe", "nan": "Sem equipe", "None": "Sem equipe"})
-    )
-
-    def is_filled(series: pd.Series) -> pd.Series:
-        s = series.astype(str).str.strip()
-        s_low = s.str.lower()
-        empty = s_low.isin(["", "nan", "none", "null", "nat"])
-        return ~empty
+    equipe_norm = dim_labels(g[BROKER_COL], "Sem equipe")
 
-    email_ok_tab = is_filled(g["email"])
-    fin1_filled_tab = is_filled(g["finalizacao_primeira"])
-    fin2_filled_tab = is_filled(g["finalizado_final"])
+    email_ok_tab = g["email_ok"]
+    # datas tipadas no SELECT: preenchida = data válida (como no main.py)
+    fin1_filled_tab = g["finalizacao_primeira"].notna()
+    fin2_filled_tab = g["finalizado_final"].notna()
 
     hoje_tab = pd.Timestamp.now(tz="America/Sao_Paulo").tz_localize(None).normalize()
-    target_tab = pd.to_datetime(g["target_sup"], errors="coerce")
+    target_tab = g["target_sup"]
 
     pend2_mask = (
         email_ok_tab
@@ -767,7 +690,7 @@ else:
     })
 
     tabela_brokers = (
-        base_tab.groupby("Equipe", as_index=False)
+        base_tab.groupby("Equipe", as_index=False, observed=True)
                 .sum(numeric_only=True)
                 .sort_values(
                     ["Atrasados Geral", "Pendentes Geral", "Total de alunos"],
@@ -0,0 +1,15 @@
+import pytest
+
+from analyzer import client, config
+
+# testes nunca leem o .streamlit/secrets.toml do repo: [analyzer] vem daqui
+BASE_SETTINGS = {"backend": "duckdb", "refresh_interval": 0, "prewarm": False, "snapshot_dir": "", "telemetry_log": ""}
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch) -> dict:
+    values = dict(BASE_SETTINGS)
+    fake = lambda name, default=None: {"analyzer": values}.get(name, default)
+    monkeypatch.setattr(config, "secrets_get", fake)
+    monkeypatch.setattr(client, "secrets_get", fake)
+    return values
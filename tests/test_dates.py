@@ -0,0 +1,54 @@
+# Datas de texto tipadas no SELECT (sql.datetime_sql) x o pd.to_datetime(...,
+# errors="coerce") que as páginas faziam valor a valor, no backend DuckDB.
+import warnings
+
+import pandas as pd
+import pytest
+
+from analyzer.config import TZ
+from analyzer.local import LocalClient, _write
+from analyzer.sql import select_sql
+
+# formatos que o pandas aceitava e que a base pode ter
+SAMPLES = [
+    "2026-01-02", "2026-01-02 10:30:00", "2026-01-02T10:30:00", "2026-01-02 10:30:00.250",
+    " 2026-01-02 10:30:00 ", "13/01/2026", "25/12/2025 08:15", "31/03/2026 23:59:59",
+    "2026-01-02T10:30:00Z", "2026-01-02T10:30:00+00:00", "2026-01-02 10:30:00-03:00", "2026-01-02T22:30:00-0300",
+    "", "nan", "None", "#REF!", "sem data", "32/01/2026", None,
+]
+
+
+def _pandas(value) -> pd.Timestamp:
+    # regra antiga, elemento a elemento; com fuso, o mesmo instante no horário de TZ
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        parsed = pd.to_datetime(value, errors="coerce")
+    if parsed is not pd.NaT and parsed.tzinfo is not None:
+        parsed = parsed.tz_convert(TZ).tz_localize(None)
+    return parsed
+
+
+@pytest.fixture(scope="module")
+def parsed(tmp_path_factory):
+    base = tmp_path_factory.mktemp("datas")
+    values = SAMPLES + ["01/02/2026"]
+    frame = pd.DataFrame({
+        "id": [f"m{i}" for i in range(len(values))],
+        "ingestion_time": pd.Timestamp("2026-01-01", tz="UTC"),
+        "data_primeiro_contato": values,
+    })
+    _write(frame, "membros", base)
+    sql = select_sql("membros", columns=["id", "data_primeiro_contato"])
+    out = LocalClient(base).query(sql).result().to_dataframe()
+    return dict(zip(out["id"], out["data_primeiro_contato"]))
+
+
+def test_matches_pandas(parsed):
+    for i, value in enumerate(SAMPLES):
+        got, expected = parsed[f"m{i}"], _pandas(value)
+        assert (pd.isna(got) and pd.isna(expected)) or got == expected, value
+
+
+def test_ambiguous_is_day_first(parsed):
+    # dd/mm das planilhas: o pandas lia mês primeiro aqui; o SELECT lê dia primeiro
+    assert parsed[f"m{len(SAMPLES)}"] == pd.Timestamp("2026-02-01")
@@ -0,0 +1,38 @@
+import pandas as pd
+import pyarrow as pa
+
+from analyzer import dimensions
+
+
+def _multi_batch(values_a, values_b, type_=pa.string()) -> pd.Series:
+    # como o modo arrow / snapshot: coluna ArrowDtype em mais de um lote
+    table = pa.Table.from_batches([
+        pa.record_batch({"c": pa.array(values_a, type=type_)}),
+        pa.record_batch({"c": pa.array(values_b, type=type_)}),
+    ])
+    return table.to_pandas(types_mapper=pd.ArrowDtype)["c"]
+
+
+def test_encode_multi_batch_arrow():
+    values = _multi_batch(["T1", " T3 ", None], ["nan", "T1", ""])
+    encoded = dimensions.encode(values)
+    assert isinstance(encoded.dtype, pd.CategoricalDtype)
+    assert list(encoded.cat.categories) == ["T1", "T3"]
+    assert encoded.tolist()[:2] == ["T1", "T3"]
+    assert encoded.isna().tolist() == [False, False, True, True, False, True]
+
+
+def test_encode_multi_batch_dictionary():
+    values = _multi_batch(["B1", "B2"], ["B2", None], pa.dictionary(pa.int32(), pa.string()))
+    assert dimensions.encode(values).tolist()[:3] == ["B1", "B2", "B2"]
+
+
+def test_sentinel_mask_multi_batch():
+    values = _multi_batch(["a", " #REF! "], ["None", "b"])
+    assert dimensions.sentinel_mask(values).tolist() == [False, True, True, False]
+
+
+def test_dim_labels_missing():
+    labels = dimensions.dim_labels(pd.Series(["b", " a", "", None]), "—")
+    assert labels.tolist() == ["b", "a", "—", "—"]
+    assert list(labels.cat.categories) == ["a", "b", "—"]
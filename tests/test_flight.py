@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from analyzer import flight
+
+
+def test_counts_only_started_jobs():
+    flight.single_flight("t_noop", ("probe",), lambda: "em dia")
+    flight.single_flight("t_job", ("probe",), flight.job_started)
+    stats = flight.flight_stats()
+    assert "t_noop" not in stats
+    assert stats["t_job"]["jobs"] == 1 and stats["t_job"]["last_job"] is not None
+
+
+def test_nested_job_counts_inner_only():
+    def outer():
+        flight.single_flight("t_inner", ("probe",), flight.job_started)
+
+    flight.single_flight("t_outer", ("load",), outer)
+    stats = flight.flight_stats()
+    assert "t_outer" not in stats
+    assert stats["t_inner"]["jobs"] == 1
+
+
+def _shared(table, run_job) -> list:
+    # um líder segura a chave; três seguidores chegam enquanto ele roda
+    started, release = threading.Event(), threading.Event()
+
+    def leader():
+        started.set()
+        release.wait()
+        if run_job:
+            flight.job_started()
+        return 42
+
+    results = []
+
+    def call():
+        results.append(flight.single_flight(table, ("k",), leader))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_followers_avoided():
+    assert _shared("t_shared", run_job=True) == [42] * 4
+    assert flight.flight_stats()["t_shared"] == {"jobs": 1, "avoided": 3, "last_job": pytest.approx(time.time(), abs=5)}
+
+
+def test_followers_without_job():
+    assert _shared("t_shared_noop", run_job=False) == [42] * 4
+    assert "t_shared_noop" not in flight.flight_stats()
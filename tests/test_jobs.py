@@ -0,0 +1,152 @@
+# Prazo, retentativas e hedge de analyzer/jobs.py contra um client falso
+# (latência e erros injetados), e o fallback do loader para a última versão boa.
+import time
+
+import pytest
+from google.api_core import exceptions
+
+from analyzer import jobs, loader, query, versions
+from analyzer.local import LocalClient, _write, synthetic_frame
+from analyzer.versions import _probe_bq
+
+POLICY = {"deadline": 2.0, "retries": 2, "backoff": 0.01, "hedge_after": None}
+
+
+def _backend_error():
+    return exceptions.InternalServerError("backendError", errors=[{"reason": "backendError"}])
+
+
+class FakeJob:
+    def __init__(self, latency: float, error: Exception | None = None, done_error: Exception | None = None):
+        self.finish_at = time.monotonic() + latency
+        self.error, self.done_error = error, done_error
+        self.cancelled = False
+        self.rows = ["linha"]
+
+    def done(self, *args, **kwargs) -> bool:
+        if self.done_error is not None:
+            raise self.done_error
+        return self.cancelled or time.monotonic() >= self.finish_at
+
+    def result(self, *args, **kwargs):
+        if self.error is not None:
+            raise self.error
+        return self.rows
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+
+class FakeClient:
+    # cada query() consome o próximo job da lista (latência, erro)
+    def __init__(self, *specs):
+        self.specs = list(specs)
+        self.jobs = []
+
+    def query(self, sql, job_config=None, **kwargs):
+        latency, error, *done_error = self.specs.pop(0) if self.specs else (0.0, None)
+        job = FakeJob(latency, error, *done_error)
+        self.jobs.append(job)
+        return job
+
+
+def test_deadline_cancels_pending():
+    client = FakeClient((10.0, None), (10.0, None))
+    policy = {**POLICY, "deadline": 0.4, "hedge_after": 0.1}
+    t0 = time.monotonic()
+    with pytest.raises(jobs.DeadlineExceeded):
+        jobs.run_job("SELECT 1", client=client, policy=policy)
+    assert time.monotonic() - t0 < 1.5
+    assert len(client.jobs) == 2
+    assert all(job.cancelled for job in client.jobs)
+
+
+def test_done_error_cancels_pending():
+    # done() do hedge falha com erro de rede: o job original não pode ficar rodando
+    client = FakeClient((10.0, None), (10.0, None, _backend_error()), (0.0, None))
+    policy = {**POLICY, "retries": 1, "hedge_after": 0.05}
+    job, rows, info = jobs.run_job("SELECT 1", client=client, policy=policy)
+    assert job is client.jobs[2] and info["attempts"] == 2
+    assert client.jobs[0].cancelled and client.jobs[1].cancelled
+
+
+def test_transient_retried_up_to_retries():
+    client = FakeClient((0.0, _backend_error()), (0.0, _backend_error()), (0.0, None))
+    job, rows, info = jobs.run_job("SELECT 1", client=client, policy=POLICY)
+    assert rows == ["linha"] and info["attempts"] == 3
+
+    client = FakeClient(*[(0.0, _backend_error())] * 5)
+    with pytest.raises(exceptions.InternalServerError):
+        jobs.run_job("SELECT 1", client=client, policy=POLICY)
+    assert len(client.jobs) == POLICY["retries"] + 1
+
+
+def test_non_transient_raised_first_attempt():
+    client = FakeClient((0.0, exceptions.BadRequest("sintaxe")), (0.0, None))
+    with pytest.raises(exceptions.BadRequest):
+        jobs.run_job("SELECT 1", client=client, policy=POLICY)
+    assert len(client.jobs) == 1
+
+
+def test_hedge_fastest_wins():
+    client = FakeClient((5.0, None), (0.05, None))
+    t0 = time.monotonic()
+    job, rows, info = jobs.run_job("SELECT 1", client=client, policy={**POLICY, "hedge_after": 0.2})
+    assert 0.2 <= time.monotonic() - t0 < 1.0
+    assert info["hedged"] and job is client.jobs[1]
+    assert client.jobs[0].cancelled and not client.jobs[1].cancelled
+
+
+def test_bounded_download():
+    with pytest.raises(jobs.DeadlineExceeded):
+        jobs.bounded(lambda: time.sleep(1), time.monotonic() + 0.1)
+    assert jobs.bounded(lambda: 42, time.monotonic() + 1) == 42
+
+
+# ========= Fallback do loader =========
+@pytest.fixture
+def membros(tmp_path, settings, monkeypatch):
+    _write(synthetic_frame("membros", 2000, seed=1), "membros", tmp_path)
+    settings["local_dir"] = str(tmp_path)
+    local = LocalClient(tmp_path)
+    monkeypatch.setattr(jobs, "get_client", lambda: local)
+    monkeypatch.setattr(loader, "table_info", lambda key: {**info, "version": state["version"]})
+    monkeypatch.setattr(query, "check_budget", lambda *args: {})
+    loader._store.clear()
+    versions._versioned.clear()
+    monkeypatch.setattr("analyzer.versions.get_client", lambda: local)
+    info = _probe_bq("membros")
+    state = {"version": "v1"}
+    entry = loader._load("membros")
+    yield entry, state
+    loader._store.clear()
+    versions._versioned.clear()
+
+
+def _hanging(monkeypatch, error=None) -> FakeClient:
+    client = FakeClient(*[(10.0, error)] * 5)
+    monkeypatch.setattr(jobs, "get_client", lambda: client)
+    monkeypatch.setattr(query, "job_policy", lambda table, kind: {**POLICY, "deadline": 0.3})
+    return client
+
+
+@pytest.mark.parametrize("error", [None, _backend_error()])
+def test_reload_keeps_last_good(membros, monkeypatch, error):
+    entry, state = membros
+    client = _hanging(monkeypatch, error)
+    state["version"] = "v2"
+    assert loader._refresh("membros") is entry
+    assert loader._store()["frames"]["membros"]["version"] == "v1"
+    assert all(job.cancelled for job in client.jobs)
+
+
+@pytest.mark.parametrize("error", [None, _backend_error()])
+def test_load_filtered_falls_back(membros, monkeypatch, settings, error):
+    entry, state = membros
+    _hanging(monkeypatch, error)
+    settings["remote_filter_rows"] = 100
+    filters = {"turma": ["T1"]}
+    frame = loader.load_filtered("membros", ["id", "turma"], filters)
+    expected = entry["frame"].loc[entry["frame"]["turma"] == "T1", "id"]
+    assert sorted(frame["id"]) == sorted(expected)
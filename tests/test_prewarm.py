@@ -0,0 +1,33 @@
+import ast
+from pathlib import Path
+
+from analyzer import prewarm
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _page_columns(page: str) -> list:
+    tree = ast.parse((ROOT / page).read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "COLUMNS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise AssertionError(f"{page} sem COLUMNS")
+
+
+def test_default_frames_match_pages():
+    # o recorte aquecido só serve se a chave (colunas) for a mesma da página
+    assert prewarm.DEFAULT_FRAMES["membros"][0] == _page_columns("main.py")
+    assert prewarm.DEFAULT_FRAMES["aldeia"][0] == _page_columns("pages/analyzer-aldeia.py")
+
+
+def test_steps(monkeypatch):
+    monkeypatch.setattr(prewarm, "filter_mode", lambda key: "remote" if key == "membros" else "local")
+    monkeypatch.setattr(prewarm, "kpi_pushdown", lambda key: False)
+    steps = prewarm._steps()
+    # tabela remota não é baixada inteira; o frame dos KPIs entra mesmo sem pushdown
+    assert "tabela:membros" not in steps and "tabela:aldeia" in steps
+    assert {"kpis:membros", "kpis:aldeia"} <= set(steps)
+    assert not any(name.startswith("kpis:membros:") for name in steps)
+
+    monkeypatch.setattr(prewarm, "kpi_pushdown", lambda key: True)
+    assert {"kpis:membros:funil", "kpis:membros:geral", "kpis:membros:atrasos"} <= set(prewarm._steps())
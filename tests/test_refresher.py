@@ -0,0 +1,61 @@
+import threading
+
+from analyzer import loader, telemetry
+from analyzer.config import TABLES
+
+
+def test_refresh_all_skips_remote_tables(monkeypatch):
+    loader._store.clear()
+    calls = []
+    monkeypatch.setattr(loader, "filter_mode", lambda key: "remote" if key == "membros" else "local")
+    monkeypatch.setattr(loader, "table_info", lambda key: calls.append(("info", key)) or {"version": "v1", "num_rows": 1})
+    monkeypatch.setattr(loader, "_load", lambda key: calls.append(("load", key)))
+    monkeypatch.setattr(loader, "_refresh", lambda key: calls.append(("refresh", key)))
+    loader._refresh_all()
+    # tabela remota fora do store: só a versão; as demais carregam e atualizam
+    assert ("info", "membros") in calls
+    assert not any(call[1] == "membros" for call in calls if call[0] != "info")
+    assert {key for kind, key in calls if kind == "load"} == set(TABLES) - {"membros"}
+
+    # uma página carregou a tabela inteira: o refresher mantém a entrada em dia
+    loader._store()["frames"]["membros"] = {}
+    calls.clear()
+    loader._refresh_all()
+    assert ("refresh", "membros") in calls and ("load", "membros") not in calls
+    loader._store.clear()
+
+
+def test_filter_mode_reads_refresher_info(monkeypatch, settings):
+    loader._store.clear()
+    settings["remote_filter_rows"] = 100
+    probes, state = [], {"refresher": True, "requested": 0.0}
+    monkeypatch.setattr(loader, "table_info", lambda key: probes.append(key) or {"version": "v1", "num_rows": 1000})
+    monkeypatch.setattr(loader, "start_refresher", lambda: state["refresher"])
+    monkeypatch.setattr(loader, "refresh_requested_at", lambda: state["requested"])
+    # primeira vez sonda; os reruns seguintes leem o store
+    assert [loader.filter_mode("membros") for _ in range(3)] == ["remote"] * 3
+    assert probes == ["membros"]
+    # o refresher viu a tabela encolher: a sessão segue sem sondar
+    loader._remember("membros", {"version": "v2", "num_rows": 10})
+    assert loader.filter_mode("membros") == "local" and probes == ["membros"]
+    # "Atualizar agora" depois da última sondagem, ou sem refresher: sonda
+    state["requested"] = loader._store()["info"]["membros"]["checked_at"] + 1
+    assert loader.filter_mode("membros") == "remote" and len(probes) == 2
+    state["refresher"] = False
+    loader.filter_mode("membros")
+    assert len(probes) == 3
+    loader._store.clear()
+
+
+def test_pool_threads_carry_page_not_context():
+    seen = []
+
+    def work():
+        with telemetry.on_behalf_of("Analise"):
+            seen.append(telemetry.current_page())
+        seen.append(telemetry.current_page())
+
+    thread = threading.Thread(target=work, name="load_0")
+    thread.start()
+    thread.join()
+    assert seen == ["Analise", "cli"]
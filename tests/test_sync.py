@@ -0,0 +1,78 @@
+# Sync incremental com dedup (membros: upsert pela id, watermark ingestion_time)
+# contra o backend DuckDB: o delta tem de dar o mesmo frame que a carga completa.
+import pandas as pd
+import pytest
+
+from analyzer import jobs, loader, versions
+from analyzer.local import LocalClient, _write, synthetic_frame
+
+
+def _ids(frame) -> list:
+    return sorted(frame["id"].astype(object).fillna("-"))
+
+
+def test_upsert_null_keys_at_boundary():
+    wm = pd.Timestamp("2026-01-02")
+    base = pd.DataFrame({"id": ["a", None, None, "b"], "ingestion_time": [wm, wm, pd.Timestamp("2026-01-01"), wm]})
+    # o delta (>= wm) relê as linhas sem chave da fatia do watermark
+    delta = pd.DataFrame({"id": [None, "a", "c"], "ingestion_time": [wm, wm, wm]})
+    merged = loader.upsert(base, delta, "id", "ingestion_time", wm)
+    assert _ids(merged) == ["-", "-", "a", "b", "c"]
+
+
+@pytest.fixture
+def membros(tmp_path, settings, monkeypatch):
+    frame = synthetic_frame("membros", 1500, seed=2).drop_duplicates(["id", "ingestion_time"])
+    # linhas sem chave, inclusive no maior watermark (fatia que o delta relê)
+    frame.loc[frame.index[-1], "id"] = None
+    frame.loc[frame.index[::97], "id"] = None
+    _write(frame, "membros", tmp_path)
+    local = LocalClient(tmp_path)
+    monkeypatch.setattr(jobs, "get_client", lambda: local)
+    monkeypatch.setattr(versions, "get_client", lambda: local)
+    monkeypatch.setattr(loader, "table_info", versions._probe_bq)
+    counts = []
+    query_rows = loader.query_rows
+
+    def recorded(sql, *args, kind="query", **kwargs):
+        counts.append(kind)
+        return query_rows(sql, *args, kind=kind, **kwargs)
+
+    monkeypatch.setattr(loader, "query_rows", recorded)
+    loader._store.clear()
+    loader._load("membros")
+    yield tmp_path, frame, counts
+    loader._store.clear()
+
+
+def _append(tmp_path, frame, seed: int) -> pd.DataFrame:
+    at = frame["ingestion_time"].max() + pd.Timedelta(hours=1)
+    new = frame.sample(30, random_state=seed).copy()
+    new["ingestion_time"] = at
+    new.loc[new.index[:10], "id"] = [f"novo{seed}-{i}" for i in range(10)]
+    new.loc[new.index[10:13], "id"] = None
+    frame = pd.concat([frame, new], ignore_index=True)
+    _write(frame, "membros", tmp_path)
+    return frame
+
+
+def test_delta_matches_full_and_verifies_every_n(membros, settings):
+    tmp_path, frame, counts = membros
+    settings["delta_verify_every"] = 2
+    for step in range(3):
+        frame = _append(tmp_path, frame, step)
+        entry = loader._refresh("membros")
+        full = loader._fetch_full("membros", entry["columns"])
+        assert _ids(entry["frame"]) == _ids(full), step
+    # 1º delta sem contagem, 2º confere (a cada 2), 3º sem de novo
+    assert counts == ["count"]
+    assert entry["syncs"] == 1
+
+
+def test_shrinking_table_verifies(membros, settings):
+    tmp_path, frame, counts = membros
+    _write(frame.iloc[:-200], "membros", tmp_path)
+    entry = loader._refresh("membros")
+    # num_rows encolheu: conferência roda, não bate e a carga é completa
+    assert counts == ["count"]
+    assert _ids(entry["frame"]) == _ids(loader._fetch_full("membros", entry["columns"]))
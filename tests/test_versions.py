@@ -0,0 +1,32 @@
+from analyzer import versions
+
+
+def test_versioned_keeps_only_current_version(monkeypatch):
+    versions._versioned.clear()
+    calls = []
+
+    def run(value):
+        calls.append(value)
+        return value
+
+    assert versions.versioned("membros", "v1", "kpis", ("a",), lambda: run(1)) == 1
+    assert versions.versioned("membros", "v1", "kpis", ("a",), lambda: run(2)) == 1
+    versions.versioned("aldeia", "v1", "kpis", ("a",), lambda: run(3))
+    # versão nova da tabela: resultados da anterior saem inteiros, as outras tabelas ficam
+    assert versions.versioned("membros", "v2", "kpis", ("a",), lambda: run(4)) == 4
+    tables = versions._versioned()["tables"]
+    assert tables["membros"]["version"] == "v2" and len(tables["membros"]["slots"]) == 1
+    assert tables["aldeia"]["version"] == "v1"
+    versions.retire_version("aldeia", "v2")
+    assert not tables["aldeia"]["slots"]
+    assert calls == [1, 3, 4]
+
+
+def test_versioned_lru_per_kind(monkeypatch):
+    versions._versioned.clear()
+    monkeypatch.setitem(versions.VERSIONED_ENTRIES, "filtered", 2)
+    for i in range(4):
+        versions.versioned("membros", "v1", "filtered", i, lambda: i)
+    versions.versioned("membros", "v1", "options", "sql", lambda: "opções")
+    slots = versions._versioned()["tables"]["membros"]["slots"]
+    assert list(slots) == [("filtered", 2), ("filtered", 3), ("options", "sql")]